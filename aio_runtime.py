@@ -0,0 +1,45 @@
+import asyncio
+import concurrent.futures
+import threading
+
+
+class AsyncRuntime:
+    """1 event loop asyncio trong 1 thread nền, dùng chung cho đọc serial và broadcast.
+
+    Thread đọc/HTTP chỉ gọi call()/spawn() (thread-safe); mọi coroutine,
+    asyncio.Queue và reader fd đều sống trong loop này.
+    """
+
+    def __init__(self, name="aio-runtime"):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, daemon=True, name=name)
+        self.thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def in_loop(self) -> bool:
+        return threading.current_thread() is self.thread
+
+    def call(self, fn, *args):
+        """Chạy fn(*args) trong loop (không chờ)."""
+        self.loop.call_soon_threadsafe(fn, *args)
+
+    def call_sync(self, fn, *args, timeout=1.0):
+        """Chạy fn(*args) trong loop và chờ kết quả (gọi thẳng nếu đang ở trong loop)."""
+        if self.in_loop():
+            return fn(*args)
+        fut = concurrent.futures.Future()
+
+        def run():
+            try:
+                fut.set_result(fn(*args))
+            except Exception as e:
+                fut.set_exception(e)
+
+        self.loop.call_soon_threadsafe(run)
+        return fut.result(timeout)
+
+    def spawn(self, coro) -> concurrent.futures.Future:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
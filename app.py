@@ -6,18 +6,18 @@ from pathlib import Path
 from threading import Lock, Timer
 
 from dotenv import load_dotenv
-from flask import flash, jsonify, redirect, render_template_string, request, url_for
+from flask import flash, jsonify, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
 import database
 import webgiaodien
+from asgi_server import serve
 
 
 BASE_DIR = Path(__file__).resolve().parent
 load_dotenv(BASE_DIR / ".env")
 
 app = webgiaodien.app
-socketio = webgiaodien.socketio
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", "CHANGE_ME")
 
 def env_path(name: str, default: str | None = None) -> Path | None:
@@ -30,37 +30,6 @@ def env_path(name: str, default: str | None = None) -> Path | None:
         path = BASE_DIR / path
     return path
 
-webgiaodien.EMG_CHART_HTML = webgiaodien.EMG_CHART_HTML.replace(
-    "const emg_env_raw = {{ (emg_env or []) | tojson }};\n\n/*",
-    """const emg_env_raw = {{ (emg_env or []) | tojson }};
-
-let t_ms     = (t_ms_raw    || []).slice();
-let hipArr   = (hip_raw     || []).slice();
-let kneeArr  = (knee_raw    || []).slice();
-let ankleArr = (ankle_raw   || []).slice();
-let emgArr    = (emg_raw     || []).slice();
-let emgRmsArr = (emg_rms_raw || []).slice();
-let emgEnvArr = (emg_env_raw || []).slice();
-
-/*""",
-)
-webgiaodien.EMG_CHART_HTML = webgiaodien.EMG_CHART_HTML.replace(
-    "rms_len: emgRms.length,",
-    "rms_len: emgRmsArr.length,",
-)
-webgiaodien.EMG_CHART_HTML = webgiaodien.EMG_CHART_HTML.replace(
-    "env_len: emgEnv.length,",
-    "env_len: emgEnvArr.length,",
-)
-webgiaodien.EMG_CHART_HTML = webgiaodien.EMG_CHART_HTML.replace(
-    "if (emgRms && emgRms.length) datasets.push({ label:\"rms\", data: emgRms, borderWidth:2, tension:0.15 });",
-    "if (emgRmsArr && emgRmsArr.length) datasets.push({ label:\"rms\", data: emgRmsArr, borderWidth:2, tension:0.15 });",
-)
-webgiaodien.EMG_CHART_HTML = webgiaodien.EMG_CHART_HTML.replace(
-    "if (emgEnv && emgEnv.length) datasets.push({ label:\"env\", data: emgEnv, borderWidth:2, tension:0.15 });",
-    "if (emgEnvArr && emgEnvArr.length) datasets.push({ label:\"env\", data: emgEnvArr, borderWidth:2, tension:0.15 });",
-)
-
 AI_LOCK = Lock()
 AI_STATE = {"qa_chain": None, "error": None}
 AI_DEPENDENCIES = {
@@ -145,51 +114,27 @@ def init_ai_chain():
             return None
 
 
-def latest_session_series() -> dict[str, list[float]]:
-    rows = list(webgiaodien.LAST_SESSION)
-    rows.sort(key=lambda row: row["t_ms"])
-
-    if not rows:
-        return {
-            "t_ms": [],
-            "hip": [],
-            "knee": [],
-            "ankle": [],
-            "emg": [],
-            "emg_rms": [],
-            "emg_env": [],
-        }
-
-    t0 = rows[0]["t_ms"]
-    return {
-        "t_ms": [round((row["t_ms"] - t0) / 1000.0, 3) for row in rows],
-        "hip": [row.get("hip", 0.0) for row in rows],
-        "knee": [row.get("knee", 0.0) for row in rows],
-        "ankle": [row.get("ankle", 0.0) for row in rows],
-        "emg": [row.get("emg", 0.0) or 0.0 for row in rows],
-        "emg_rms": [row.get("emg_rms", 0.0) or 0.0 for row in rows],
-        "emg_env": [row.get("emg_env", 0.0) or 0.0 for row in rows],
-    }
+EMG_CHART_WINDOW_S = float(os.environ.get("EMG_CHART_WINDOW_S", "15"))
 
 
 @login_required
 def session_start():
-    webgiaodien.data_buffer = []
-    webgiaodien.reset_max_angles()
-
-    if webgiaodien.SERIAL_ENABLED:
-        port = (
-            os.environ.get("SERIAL_PORT")
-            or webgiaodien.auto_detect_port()
-            or ("COM3" if os.name == "nt" else "/dev/ttyUSB0")
-        )
-        baud = int(os.environ.get("SERIAL_BAUD", "115200"))
-        ok = webgiaodien.start_serial_reader(port=port, baud=baud)
-        if not ok:
-            return jsonify(ok=False, msg=f"Không mở được cổng serial (port={port})"), 500
-        return jsonify(ok=True, mode="serial", port=port, baud=baud)
+    sess = webgiaodien.current_session()
+    data = request.get_json(silent=True) or {}
+    port = (
+        data.get("port")
+        or os.environ.get("SERIAL_PORT")
+        or webgiaodien.auto_detect_port()
+        or ("COM3" if os.name == "nt" else "/dev/ttyUSB0")
+    )
+    baud = int(os.environ.get("SERIAL_BAUD", "115200"))
 
-    return jsonify(ok=True, mode="noserial")
+    ok, status, mode = webgiaodien.start_measurement(sess, port=port, baud=baud)
+    if not ok:
+        return jsonify(ok=False, msg=mode), status
+    if mode == "serial":
+        return jsonify(ok=True, mode=mode, port=port, baud=baud, rig=sess.key)
+    return jsonify(ok=True, mode=mode, rig=sess.key)
 
 
 app.view_functions["session_start"] = session_start
@@ -198,7 +143,7 @@ app.view_functions["session_start"] = session_start
 @app.route("/patients/manage")
 @login_required
 def patients_manage():
-    return render_template_string(webgiaodien.PATIENTS_MANAGE_HTML, username=current_user.id)
+    return render_template("patients_manage.html", username=current_user.id)
 
 
 @app.route("/patients/new", methods=["GET", "POST"])
@@ -208,11 +153,10 @@ def patients_new():
         full_name = request.form.get("full_name", "").strip()
         if not full_name:
             flash("Thiếu họ tên", "danger")
-            return render_template_string(webgiaodien.PATIENT_NEW_HTML)
+            return render_template("patient_new.html")
 
-        _, raw = database.load_patients_rows()
         patient_code = database.gen_patient_code(full_name)
-        raw[patient_code] = {
+        database.upsert_patient(patient_code, {
             "DateOfBirth": request.form.get("dob", "").strip(),
             "Gender": request.form.get("sex", "").strip(),
             "Height": request.form.get("height", "").strip(),
@@ -220,12 +164,11 @@ def patients_new():
             "PatientCode": patient_code,
             "Weight": request.form.get("weight", "").strip(),
             "name": full_name,
-        }
-        database.save_patients_data(raw)
+        })
         flash(f"Đã lưu bệnh nhân {patient_code}", "success")
         return redirect(url_for("patients_manage"))
 
-    return render_template_string(webgiaodien.PATIENT_NEW_HTML)
+    return render_template("patient_new.html")
 
 
 @app.route("/patients")
@@ -237,19 +180,15 @@ def patients_review():
 @app.delete("/api/patients/<code>")
 @login_required
 def api_patients_delete(code: str):
-    _, raw = database.load_patients_rows()
-    if code not in raw:
+    if not database.delete_patient(code):
         return jsonify(ok=False, msg="Không tìm thấy bệnh nhân"), 404
-
-    raw.pop(code, None)
-    database.save_patients_data(raw)
     return jsonify(ok=True)
 
 
 @app.delete("/api/patients")
 @login_required
 def api_patients_delete_all():
-    database.save_patients_data({})
+    database.delete_all_patients()
     return jsonify(ok=True)
 
 
@@ -261,7 +200,6 @@ def api_patients_save():
     if not full_name:
         return jsonify(ok=False, msg="Thiếu họ tên"), 400
 
-    _, raw = database.load_patients_rows()
     if not patient_code:
         patient_code = database.gen_patient_code(full_name)
 
@@ -271,7 +209,7 @@ def api_patients_save():
     elif gender.lower().startswith("f"):
         gender = "Female"
 
-    raw[patient_code] = {
+    database.upsert_patient(patient_code, {
         "DateOfBirth": data.get("dob", ""),
         "Gender": gender,
         "Height": data.get("height", ""),
@@ -279,8 +217,7 @@ def api_patients_save():
         "PatientCode": patient_code,
         "Weight": data.get("weight", ""),
         "name": full_name,
-    }
-    database.save_patients_data(raw)
+    })
     return jsonify(ok=True, patient_code=patient_code)
 
 
@@ -290,10 +227,15 @@ app.view_functions["api_patients_save"] = api_patients_save
 @app.route("/charts_emg")
 @login_required
 def charts_emg():
-    return render_template_string(
-        webgiaodien.EMG_CHART_HTML,
+    return render_template(
+        "charts_emg.html",
         username=current_user.id,
-        **latest_session_series(),
+        # Trang EMG chỉ vẽ vài giây cuối phiên -> chỉ tải phần đuôi;
+        # ?rms_window=<ms> tính lại emg_rms/emg_env với cửa sổ khác
+        **webgiaodien.series_page_args(
+            request.args.get("session", "").strip(), tail=EMG_CHART_WINDOW_S,
+            rms_window=request.args.get("rms_window") or None,
+        ),
     )
 
 
@@ -324,4 +266,4 @@ if __name__ == "__main__":
         Timer(1.5, lambda: webbrowser.open_new(f"http://127.0.0.1:{port}")).start()
 
     print(f"Server listening on port {port}.")
-    socketio.run(app, host="0.0.0.0", port=port, debug=False, allow_unsafe_werkzeug=True)
+    serve(webgiaodien.asgi_app, webgiaodien.RUNTIME, host="0.0.0.0", port=port)
@@ -0,0 +1,57 @@
+"""Chạy web app dạng ASGI trên event loop của AsyncRuntime: python asgi_server.py
+
+Socket.IO (python-socketio AsyncServer) và WebSocket/long-poll sống trong
+loop asyncio nên số kết nối không tốn thread; view Flask (WSGI) chạy trong
+thread pool của a2wsgi. uvicorn phải chạy trên đúng loop của RUNTIME (nơi
+broadcaster emit), vì vậy không dùng `uvicorn module:app` từ CLI.
+"""
+import asyncio
+import concurrent.futures
+import os
+import signal
+import threading
+
+import socketio
+import uvicorn
+from a2wsgi import WSGIMiddleware
+
+
+def build_asgi(flask_app, sio, runtime, workers=32):
+    """socketio.ASGIApp: /socket.io/ -> sio, còn lại -> Flask qua WSGIMiddleware."""
+
+    def check_loop():
+        if asyncio.get_running_loop() is not runtime.loop:
+            raise RuntimeError("ASGI app phải chạy trên loop của AsyncRuntime (asgi_server.serve)")
+
+    return socketio.ASGIApp(
+        sio,
+        other_asgi_app=WSGIMiddleware(flask_app, workers=workers),
+        on_startup=check_loop,
+    )
+
+
+def serve(asgi_app, runtime, host="0.0.0.0", port=8080, log_level="info"):
+    """Chạy uvicorn trong loop của runtime; thread chính chờ và xử lý Ctrl-C/SIGTERM."""
+    server = uvicorn.Server(uvicorn.Config(asgi_app, host=host, port=port, log_level=log_level))
+    done = runtime.spawn(server.serve())
+
+    def stop(*_):
+        server.should_exit = True
+
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, stop)
+    while True:
+        try:
+            done.result(timeout=0.5)
+            return
+        except KeyboardInterrupt:
+            stop()
+        except concurrent.futures.TimeoutError:
+            continue
+
+
+if __name__ == "__main__":
+    import webgiaodien
+
+    serve(webgiaodien.asgi_app, webgiaodien.RUNTIME,
+          host=os.environ.get("HOST", "0.0.0.0"), port=int(os.environ.get("PORT", "8080")))
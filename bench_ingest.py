@@ -0,0 +1,65 @@
+"""Benchmark pipeline ingest: python bench_ingest.py [giây_dữ_liệu] [binary|ascii]
+
+Đẩy luồng byte giả lập (4 IMU @ 100 Hz + EMG @ 1 kHz) qua IngestPipeline theo
+chunk cỡ đọc serial thực tế, in thời gian từng stage và tổng throughput cho
+từng solver / có-không fusion.
+"""
+import sys
+import time
+
+import numpy as np
+
+from imu_ingest import SOLVERS, ClockSync, FusionStage, IngestPipeline
+from imu_ingest.parser import REC_EMG, REC_IMU, encode_frame
+
+IMU_HZ = 100
+EMG_HZ = 1000
+N_SENSORS = 4
+CHUNK = 512
+
+
+def byte_stream(seconds, binary=True, seed=0):
+    """Luồng byte thiết bị: mỗi 10 ms 4 record IMU + 10 record EMG."""
+    rng = np.random.default_rng(seed)
+    roll = rng.uniform(-90, 90, N_SENSORS)
+    out = bytearray()
+    for i in range(int(seconds * IMU_HZ)):
+        ts = i * 1000 // IMU_HZ
+        roll += rng.normal(0, 1.0, N_SENSORS)
+        imu = [(sid, ts, 0.0, float(roll[sid - 1]), 90.0) for sid in range(1, N_SENSORS + 1)]
+        us0 = ts * 1000
+        emg = [(5, us0 + k * (1_000_000 // EMG_HZ),
+                float(100 * np.sin(2 * np.pi * 50 * (us0 / 1e6 + k / EMG_HZ))))
+               for k in range(EMG_HZ // IMU_HZ)]
+        if binary:
+            out += encode_frame(REC_IMU, imu) + encode_frame(REC_EMG, emg)
+        else:
+            out += "".join(f"IMU,{sid},{t},{y:.2f},{r:.2f},{p:.2f}\n" for sid, t, y, r, p in imu).encode()
+            out += "".join(f"EMG,{sid},{t},{v:.2f}\n" for sid, t, v in emg).encode()
+    return bytes(out)
+
+
+def run(data, **kw):
+    rows = []
+    pipe = IngestPipeline(clock=ClockSync(), sink=rows.append, **kw)
+    t0 = time.perf_counter()
+    now = 0.0
+    for i in range(0, len(data), CHUNK):
+        now += 0.005
+        pipe.feed(data[i:i + CHUNK], now)
+    return time.perf_counter() - t0, pipe.stats()
+
+
+def main(seconds=60.0, fmt="binary"):
+    data = byte_stream(seconds, binary=(fmt == "binary"))
+    print(f"{seconds:.0f} s dữ liệu, {fmt}, {len(data)} byte, chunk {CHUNK}")
+    for name, solver in SOLVERS.items():
+        for fused in (False, True):
+            fusion = (lambda sink: FusionStage(sink, IMU_HZ)) if fused else None
+            dt, st = run(data, solver=solver, fusion=fusion)
+            print(f"  {name:<5} fusion={'on ' if fused else 'off'} {dt * 1e3:8.1f} ms "
+                  f"{st['records'] / dt / 1e3:8.1f} k record/s  x{seconds / dt:7.0f} realtime  {st['stage_ms']}")
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 60.0, sys.argv[2] if len(sys.argv) > 2 else "binary")
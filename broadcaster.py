@@ -0,0 +1,165 @@
+import asyncio
+
+
+async def emit_async(server, event, payload, to=None, skip_sid=None):
+    """emit trên socketio.AsyncServer (await) hoặc server có emit đồng bộ."""
+    if skip_sid:
+        result = server.emit(event, payload, to=to, skip_sid=skip_sid)
+    else:
+        result = server.emit(event, payload, to=to)
+    if asyncio.iscoroutine(result):
+        await result
+
+
+def slow_clients(server, room=None, max_backlog=16, namespace="/"):
+    """sid các client trong `room` còn >= max_backlog gói engine.io chưa gửi (socket chậm).
+
+    Hàng gói của từng client trong python-socketio không giới hạn: client
+    không đọc kịp thì bỏ qua client đó ở frame này thay vì xếp thêm.
+    Server không phải socketio.AsyncServer -> [].
+    """
+    manager = getattr(server, "manager", None)
+    sockets = getattr(getattr(server, "eio", None), "sockets", None)
+    if manager is None or sockets is None:
+        return []
+    slow = []
+    for sid, eio_sid in manager.get_participants(namespace, room):
+        sock = sockets.get(eio_sid)
+        if sock is not None and sock.queue.qsize() >= max_backlog:
+            slow.append(sid)
+    return slow
+
+
+class ImuBroadcaster:
+    """Gom mẫu góc giữa 2 frame và emit 'imu_data' tối đa `rate_hz` frame/giây.
+
+    Thread đọc serial chỉ gọi push() (không block): mẫu được đưa vào một
+    asyncio.Queue trong AsyncRuntime, coroutine _run chờ trên queue và emit
+    ngay khi có dữ liệu (không ngủ cố định giữa các frame). Queue có giới
+    hạn `max_pending` (mỗi item tính bằng số mẫu, ít nhất 1): khi emit chậm,
+    item cũ nhất bị bỏ và đếm vào `dropped`; mode "latest" chỉ giữ frame mới
+    nhất. Client có hơn `max_client_backlog` gói chưa gửi bị bỏ qua ở frame đó.
+    """
+
+    def __init__(self, socketio, runtime, event="imu_data", rate_hz=30.0, mode="packed",
+                 max_pending=2000, room=None, max_client_backlog=16):
+        self.socketio = socketio
+        self.runtime = runtime
+        self.event = event
+        self.room = room        # None -> mọi client
+        self.interval = 1.0 / max(float(rate_hz), 1.0)
+        self.mode = mode if mode in ("packed", "latest") else "packed"
+        self.max_pending = max(int(max_pending), 1)
+        self.max_client_backlog = max(int(max_client_backlog), 1)
+
+        # chỉ truy cập trong loop của runtime
+        self._queue = None
+        self._queued = 0        # tổng cost các item trong queue
+        self._dropped = 0
+
+        self.frames_sent = 0
+        self.frames_coalesced = 0
+        self.samples_dropped = 0
+        self.client_frames_skipped = 0
+
+    def push(self, latest: dict, samples=None):
+        """Ghi góc mới nhất (+ list [t,hip,knee,ankle]) cho frame kế tiếp."""
+        if self.mode != "packed":
+            samples = None
+        self.runtime.call(self._put, latest, samples or [])
+
+    def _put(self, latest, samples):
+        q = self._queue
+        if q is None:
+            q = self._queue = asyncio.Queue()
+            self.runtime.loop.create_task(self._run())
+
+        if self.mode == "latest":
+            # chỉ góc mới nhất có nghĩa: thay frame đang chờ thay vì xếp hàng
+            while not q.empty():
+                q.get_nowait()
+                self._queued -= 1
+                self.frames_coalesced += 1
+        cost = _cost(samples)
+        while self._queued + cost > self.max_pending and not q.empty():
+            _, old = q.get_nowait()
+            self._queued -= _cost(old)
+            self._dropped += len(old)
+        q.put_nowait((latest, samples))
+        self._queued += cost
+
+    def _take_frame(self, first):
+        items = [first]
+        while not self._queue.empty():
+            items.append(self._queue.get_nowait())
+        self._queued -= sum(_cost(block) for _, block in items)
+
+        payload = dict(items[-1][0])
+        if self.mode == "packed":
+            samples = [s for _, block in items for s in block]
+            payload["samples"] = samples[-self.max_pending:]
+            self._dropped += len(samples) - len(payload["samples"])
+            if self._dropped:
+                payload["dropped"] = self._dropped
+                self.samples_dropped += self._dropped
+                self._dropped = 0
+        return payload
+
+    async def _run(self):
+        loop = self.runtime.loop
+        next_at = 0.0
+        while True:
+            first = await self._queue.get()
+            delay = next_at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)    # giữ tối đa rate_hz frame/giây
+            payload = self._take_frame(first)
+            try:
+                skip = slow_clients(self.socketio, self.room, self.max_client_backlog)
+                self.client_frames_skipped += len(skip)
+                await emit_async(self.socketio, self.event, payload, self.room, skip_sid=skip)
+                self.frames_sent += 1
+            except Exception as e:
+                print("[BROADCAST] emit error:", e)
+            next_at = loop.time() + self.interval
+
+
+def _cost(samples):
+    """Chỗ 1 item chiếm trong queue: số mẫu, frame không kèm mẫu tính 1."""
+    return len(samples) or 1
+
+
+class SocketEmitter:
+    """emit() thread-safe cho code ngoài loop (view Flask trong thread pool).
+
+    Sự kiện được đưa vào asyncio.Queue trong AsyncRuntime; 1 coroutine lần
+    lượt await sio.emit. Queue đầy (client chậm) -> bỏ sự kiện cũ nhất.
+    """
+
+    def __init__(self, sio, runtime, max_pending=1000):
+        self.sio = sio
+        self.runtime = runtime
+        self.max_pending = max(int(max_pending), 1)
+        self._queue = None      # chỉ truy cập trong loop của runtime
+        self.dropped = 0
+
+    def emit(self, event, payload, to=None):
+        self.runtime.call(self._put, (event, payload, to))
+
+    def _put(self, item):
+        q = self._queue
+        if q is None:
+            q = self._queue = asyncio.Queue()
+            self.runtime.loop.create_task(self._run())
+        if q.qsize() >= self.max_pending:
+            q.get_nowait()
+            self.dropped += 1
+        q.put_nowait(item)
+
+    async def _run(self):
+        while True:
+            event, payload, to = await self._queue.get()
+            try:
+                await emit_async(self.sio, event, payload, to)
+            except Exception as e:
+                print("[SOCKET] emit error:", e)
@@ -1,65 +1,645 @@
 import json, os, time
+import bisect
+import hashlib
+import sqlite3
 import threading
+from collections import OrderedDict
+from uuid import uuid4
 from datetime import datetime, timezone, timedelta
 
 VN_TZ = timezone(timedelta(hours=7))
 
 PATIENTS_FILE = "sample.json"
+DB_FILE = "imu_web.db"
 RECORD_FILE  = "records.json"
-VAS_FILE = "vas.json"
+RECORD_JOURNAL = "records.jsonl"
+VAS_FILE = "vas.jsonl"
 EXPORT_DIR = "exports"
 
 os.makedirs(EXPORT_DIR, exist_ok=True)
 
-RECORD_LOCK = threading.Lock()
-VAS_LOCK  = threading.Lock()
+# =========================
+#   SQLITE (WAL)
+# =========================
+_DB_LOCAL = threading.local()
+_DB_INIT_LOCK = threading.Lock()
+_DB_READY = False
 
-RECORD_STORE = []
-VAS_STORE = []
+PATIENT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta(
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS patients(
+    code        TEXT PRIMARY KEY,
+    name        TEXT NOT NULL DEFAULT '',
+    name_key    TEXT NOT NULL DEFAULT '',
+    national_id TEXT NOT NULL DEFAULT '',
+    dob         TEXT NOT NULL DEFAULT '',
+    gender      TEXT NOT NULL DEFAULT '',
+    data        TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_patients_name_key ON patients(name_key);
+CREATE INDEX IF NOT EXISTS idx_patients_national_id ON patients(national_id);
+CREATE TABLE IF NOT EXISTS vas_latest(
+    patient_code TEXT NOT NULL,
+    kind         TEXT NOT NULL,   -- 'name' (tên bài tập) | 'region'
+    key          TEXT NOT NULL,
+    phase        TEXT NOT NULL,
+    seq          INTEGER NOT NULL,
+    rec          TEXT NOT NULL,
+    PRIMARY KEY(patient_code, kind, key, phase)
+);
+CREATE INDEX IF NOT EXISTS idx_vas_latest_key ON vas_latest(kind, key, phase, seq);
+"""
 
-def _ensure_patients_file():
-    if not os.path.exists(PATIENTS_FILE):
-        with open(PATIENTS_FILE, "w", encoding="utf-8") as f:
-            json.dump({}, f, ensure_ascii=False, indent=2)
+def _new_connection():
+    conn = sqlite3.connect(DB_FILE, timeout=10, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA case_sensitive_like=ON")  # cho phép LIKE 'abc%' dùng index
+    return conn
 
-def load_patients_rows():
-    _ensure_patients_file()
-    with open(PATIENTS_FILE, "r", encoding="utf-8") as f:
-        data = json.load(f)
+def get_db():
+    """Connection SQLite riêng cho từng thread; lần đầu tạo schema + migrate JSON."""
+    conn = getattr(_DB_LOCAL, "conn", None)
+    if conn is None:
+        conn = _DB_LOCAL.conn = _new_connection()
+    if not _DB_READY:
+        _init_db(conn)
+    return conn
+
+def _init_db(conn):
+    global _DB_READY
+    with _DB_INIT_LOCK:
+        if _DB_READY:
+            return
+        conn.executescript(PATIENT_SCHEMA)
+        _migrate_patients_json(conn)
+        _DB_READY = True
+
+def _migrate_patients_json(conn):
+    """Import sample.json 1 lần duy nhất (file JSON giữ nguyên làm bản sao lưu)."""
+    done = conn.execute("SELECT value FROM meta WHERE key='patients_migrated'").fetchone()
+    if done:
+        return
+
+    data = {}
+    if os.path.exists(PATIENTS_FILE):
+        try:
+            with open(PATIENTS_FILE, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            print("[WARN] cannot read patients file for migration:", e)
+            return
     if not isinstance(data, dict):
         data = {}
-    rows = []
-    for code, rec in data.items():
-        rows.append({
-            "code": code,
-            "full_name": rec.get("name", ""),
-            "dob": rec.get("DateOfBirth", ""),
-            "national_id": rec.get("ID", ""),
-            "sex": rec.get("Gender", ""),
-        })
-    rows = sorted(rows, key=lambda r: (r["full_name"] or "").lower())
-    return rows, data
-
-def save_patients_data(data):
-    with open(PATIENTS_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-
-def load_records_from_file():
-    global RECORD_STORE
+
+    conn.execute("BEGIN IMMEDIATE")
     try:
-        with open(RECORD_FILE, "r", encoding="utf-8") as f:
-            RECORD_STORE = json.load(f)
-            if not isinstance(RECORD_STORE, list):
-                RECORD_STORE = []
-    except FileNotFoundError:
-        RECORD_STORE = []
-
-def save_records_to_file():
+        for code, rec in data.items():
+            if isinstance(rec, dict):
+                _write_patient(conn, code, rec)
+        conn.execute(
+            "INSERT OR REPLACE INTO meta(key, value) VALUES('patients_migrated', ?)",
+            (str(time.time()),),
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    if data:
+        print(f"[DB] migrated {len(data)} patients from {PATIENTS_FILE}")
+
+
+# =========================
+#   PATIENTS
+# =========================
+def _patient_row(code, rec):
+    return {
+        "code": code,
+        "full_name": rec.get("name", ""),
+        "dob": rec.get("DateOfBirth", ""),
+        "national_id": rec.get("ID", ""),
+        "sex": rec.get("Gender", ""),
+    }
+
+def _write_patient(conn, code, rec):
+    name = rec.get("name", "") or ""
+    conn.execute(
+        """INSERT INTO patients(code, name, name_key, national_id, dob, gender, data)
+           VALUES(?, ?, ?, ?, ?, ?, ?)
+           ON CONFLICT(code) DO UPDATE SET
+               name=excluded.name, name_key=excluded.name_key,
+               national_id=excluded.national_id, dob=excluded.dob,
+               gender=excluded.gender, data=excluded.data""",
+        (
+            code, name, name.lower(),
+            str(rec.get("ID", "") or ""),
+            str(rec.get("DateOfBirth", "") or ""),
+            str(rec.get("Gender", "") or ""),
+            json.dumps(rec, ensure_ascii=False),
+        ),
+    )
+
+def load_patients_rows(q: str = "", limit: int = None, offset: int = 0):
+    """(rows sắp theo tên, raw {code: record}); q lọc theo tiền tố mã/tên/CCCD."""
+    sql = "SELECT code, data FROM patients"
+    args = []
+    if q:
+        sql += " WHERE code LIKE ? OR name_key LIKE ? OR national_id LIKE ?"
+        like = q.replace("%", "").replace("_", "") + "%"
+        args += [like, like.lower(), like]
+    sql += " ORDER BY name_key, code"
+    if limit is not None:
+        sql += " LIMIT ? OFFSET ?"
+        args += [int(limit), int(offset)]
+
+    rows, raw = [], {}
+    for r in get_db().execute(sql, args):
+        rec = json.loads(r["data"])
+        raw[r["code"]] = rec
+        rows.append(_patient_row(r["code"], rec))
+    return rows, raw
+
+def get_patient(code: str):
+    r = get_db().execute("SELECT data FROM patients WHERE code=?", (code,)).fetchone()
+    return json.loads(r["data"]) if r else None
+
+def upsert_patient(code: str, fields: dict) -> dict:
+    """Ghi 1 bệnh nhân; các khoá không có trong fields (vd. Exercise) được giữ nguyên."""
+    conn = get_db()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        r = conn.execute("SELECT data FROM patients WHERE code=?", (code,)).fetchone()
+        rec = json.loads(r["data"]) if r else {}
+        rec.update(fields)
+        _write_patient(conn, code, rec)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return rec
+
+def add_patient_exercise(code: str, key: str, entry: dict) -> bool:
+    """Thêm 1 mục vào Exercise của bệnh nhân; False nếu không có bệnh nhân."""
+    conn = get_db()
+    conn.execute("BEGIN IMMEDIATE")
     try:
-        with open(RECORD_FILE, "w", encoding="utf-8") as f:
-            json.dump(RECORD_STORE, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        print("[WARN] save_records_to_file error:", e)
+        r = conn.execute("SELECT data FROM patients WHERE code=?", (code,)).fetchone()
+        if r is None:
+            conn.execute("ROLLBACK")
+            return False
+        rec = json.loads(r["data"])
+        rec.setdefault("Exercise", {})[key] = entry
+        _write_patient(conn, code, rec)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return True
+
+def delete_patient(code: str) -> bool:
+    cur = get_db().execute("DELETE FROM patients WHERE code=?", (code,))
+    return cur.rowcount > 0
+
+def delete_all_patients():
+    get_db().execute("DELETE FROM patients")
+
+# =========================
+#   RECORDS (JSONL journal)
+# =========================
+class RecordJournal:
+    """Bệnh án lưu dạng append-only: mỗi dòng records.jsonl là 1 bản ghi
+    hoặc 1 tombstone {"id": ..., "deleted": true}.
+
+    Ghi/xoá = 1 dòng (O(1)). RAM chỉ giữ index (created_at_ts, id) đã sắp
+    (toàn bộ, theo patient_code, theo bài tập) + vị trí byte của từng bản
+    ghi; nội dung đọc từ file khi cần (mỗi trang chỉ đọc đúng số dòng của
+    trang). Khi số dòng chết vượt ngưỡng, file được viết lại (compact) chỉ
+    với các bản ghi còn sống.
+    """
+
+    def __init__(self, path=RECORD_JOURNAL, legacy_path=RECORD_FILE, compact_min_dead=500):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.compact_min_dead = compact_min_dead
+        self.lock = threading.Lock()
+
+        self._by_id = {}        # id -> (offset, length, key, patient_code, bài tập (lower))
+        self._order = []        # [(created_at_ts, id)] tăng dần
+        self._by_patient = {}   # patient_code -> [(created_at_ts, id)]
+        self._by_exercise = {}  # tên bài tập (lower) -> [(created_at_ts, id)]
+        self._dead = 0
+        self._fh = None         # append (bytes)
+        self._rfh = None        # đọc theo offset
+
+        with self.lock:
+            self._load()
+
+    # ---- load / migrate
+    def _load(self):
+        if not os.path.exists(self.path) and os.path.exists(self.legacy_path):
+            self._migrate_legacy()
+
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                offset = 0
+                for raw in f:
+                    start, offset = offset, offset + len(raw)
+                    line = raw.strip()
+                    if not line:
+                        continue
+                    try:
+                        rec = json.loads(line)
+                    except Exception:
+                        self._dead += 1  # dòng hỏng (vd. ghi dở khi mất điện)
+                        continue
+                    if "id" not in rec:
+                        # dòng cũ thiếu id: id suy từ nội dung (compact chép nguyên bytes) nên
+                        # giống nhau mọi lần load -> tombstone của nó vẫn có hiệu lực sau restart
+                        rec["id"] = self._line_id(line)
+                    if self._index_remove(rec["id"]):
+                        self._dead += 1
+                    if rec.get("deleted"):
+                        self._dead += 1
+                    else:
+                        self._index_add(rec, start, len(raw))
+
+        self._open()
+
+    def _open(self):
+        self._fh = open(self.path, "ab")
+        self._rfh = open(self.path, "rb")
+
+    def _migrate_legacy(self):
+        """records.json (list, ghi đè toàn file) -> records.jsonl, 1 lần."""
+        try:
+            with open(self.legacy_path, "r", encoding="utf-8") as f:
+                rows = json.load(f)
+        except Exception as e:
+            print("[WARN] cannot read legacy records file:", e)
+            return
+        if not isinstance(rows, list):
+            rows = []
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            for rec in rows:
+                if isinstance(rec, dict):
+                    rec.setdefault("id", uuid4().hex)
+                    f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        os.replace(self.path + ".tmp", self.path)
+        print(f"[DB] migrated {len(rows)} records from {self.legacy_path}")
+
+    # ---- index
+    @staticmethod
+    def _line_id(line):
+        return "line-" + hashlib.sha1(line).hexdigest()[:20]
+
+    @staticmethod
+    def _key(rec):
+        return (float(rec.get("created_at_ts") or 0), rec["id"])
+
+    @staticmethod
+    def _exercises(rec):
+        return frozenset(str(ex).strip().lower() for ex in (rec.get("exercise_scores") or {}))
+
+    def _index_lists(self, patient_code, exercises):
+        yield self._order
+        yield self._by_patient.setdefault(patient_code, [])
+        for ex in exercises:
+            yield self._by_exercise.setdefault(ex, [])
+
+    def _index_add(self, rec, offset, length):
+        key = self._key(rec)
+        patient_code = rec.get("patient_code") or ""
+        exercises = self._exercises(rec)
+        self._by_id[rec["id"]] = (offset, length, key, patient_code, exercises)
+        for keys in self._index_lists(patient_code, exercises):
+            bisect.insort(keys, key)
+
+    def _index_remove(self, rec_id):
+        entry = self._by_id.pop(rec_id, None)
+        if entry is None:
+            return False
+        _, _, key, patient_code, exercises = entry
+        for keys in self._index_lists(patient_code, exercises):
+            i = bisect.bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                del keys[i]
+        return True
+
+    def _read(self, rec_id):
+        offset, length = self._by_id[rec_id][:2]
+        self._rfh.seek(offset)
+        rec = json.loads(self._rfh.read(length))
+        rec.setdefault("id", rec_id)
+        return rec
+
+    # ---- write
+    def _append_line(self, obj):
+        """Ghi 1 dòng, trả (offset, length) để đọc lại."""
+        data = (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+        offset = self._fh.tell()
+        self._fh.write(data)
+        self._fh.flush()
+        return offset, len(data)
+
+    def add(self, record: dict) -> dict:
+        record = dict(record)
+        record.setdefault("id", uuid4().hex)
+        with self.lock:
+            self._index_remove(record["id"])
+            self._index_add(record, *self._append_line(record))
+        return record
+
+    def delete(self, rec_id: str) -> bool:
+        with self.lock:
+            if not self._index_remove(rec_id):
+                return False
+            self._append_line({"id": rec_id, "deleted": True})
+            self._dead += 2
+            if self._dead >= self.compact_min_dead and self._dead > len(self._by_id):
+                self._compact()
+        return True
+
+    def compact(self):
+        with self.lock:
+            self._compact()
+
+    def _compact(self):
+        """Chép các dòng còn sống (bytes nguyên văn) sang file mới rồi cập nhật offset."""
+        tmp = self.path + ".tmp"
+        moved = {}
+        with open(tmp, "wb") as f:
+            for _, rec_id in self._order:
+                offset, length = self._by_id[rec_id][:2]
+                self._rfh.seek(offset)
+                moved[rec_id] = f.tell()
+                f.write(self._rfh.read(length))
+        self._fh.close()
+        self._rfh.close()
+        os.replace(tmp, self.path)
+        self._open()
+        for rec_id, offset in moved.items():
+            self._by_id[rec_id] = (offset,) + self._by_id[rec_id][1:]
+        self._dead = 0
+
+    # ---- read
+    def __len__(self):
+        return len(self._by_id)
+
+    def get(self, rec_id: str):
+        with self.lock:
+            return self._read(rec_id) if rec_id in self._by_id else None
+
+    def latest(self, limit: int = None, patient_code: str = None) -> list:
+        """Bản ghi mới nhất trước, lấy thẳng từ index đã sắp (không sort lại)."""
+        with self.lock:
+            keys = self._order if patient_code is None else self._by_patient.get(patient_code, [])
+            picked = keys[::-1] if limit is None else keys[:-limit - 1:-1]
+            return [self._read(rec_id) for _, rec_id in picked]
+
+    def page(self, cursor: str = None, limit: int = 50, patient_code: str = None,
+             exercise: str = None, ts_from: float = None, ts_to: float = None):
+        """1 trang bản ghi (mới nhất trước) + cursor cho trang sau (None nếu hết).
+
+        cursor = "<created_at_ts>:<id>" của bản ghi cuối trang trước. Lọc
+        patient/exercise đi thẳng vào index tương ứng; khoảng thời gian
+        [ts_from, ts_to) được cắt bằng bisect. Chỉ đọc từ file các bản ghi
+        của trang.
+        """
+        exercise = (exercise or "").strip().lower()
+        with self.lock:
+            if patient_code:
+                keys = self._by_patient.get(patient_code, [])
+            elif exercise:
+                keys = self._by_exercise.get(exercise, [])
+            else:
+                keys = self._order
+
+            lo = 0 if ts_from is None else bisect.bisect_left(keys, (ts_from, ""))
+            hi = len(keys) if ts_to is None else bisect.bisect_left(keys, (ts_to, ""))
+            if cursor:
+                ts, _, rec_id = cursor.partition(":")
+                hi = min(hi, bisect.bisect_left(keys, (float(ts), rec_id)))
+
+            # quét thêm tới khi gặp 1 bản khớp sau trang: chỉ có cursor khi trang sau không rỗng
+            picked, more = [], False
+            for i in range(hi - 1, lo - 1, -1):
+                key = keys[i]
+                if exercise and patient_code and exercise not in self._by_id[key[1]][4]:
+                    continue
+                if len(picked) == limit:
+                    more = True
+                    break
+                picked.append(key)
+
+            next_cursor = None
+            if more:
+                last = picked[-1]
+                next_cursor = f"{last[0]!r}:{last[1]}"
+            return [self._read(rec_id) for _, rec_id in picked], next_cursor
+
+class VasStore:
+    """Điểm VAS: append-only vas.jsonl + bảng vas_latest (SQLite) giữ bản mới nhất.
+
+    Mỗi bệnh nhân chỉ giữ bản VAS mới nhất theo (tên bài tập, phase) và
+    (vùng, phase). vas_latest là nơi lưu đầy đủ các bản đó; RAM chỉ cache
+    `max_patients` bệnh nhân gần dùng (LRU), hụt cache thì đọc lại từ
+    SQLite. Slot "" (VAS không gắn bệnh nhân, áp cho mọi bệnh nhân) luôn
+    nằm trong RAM. Khi khởi động chỉ đọc phần file sau offset đã ghi vào
+    meta; file được compact từ vas_latest khi số dòng gấp đôi số bản còn sống.
+    """
+
+    PHASES = ("before", "after")
+
+    def __init__(self, path=VAS_FILE, max_patients=5000, compact_min_lines=1000, db=get_db):
+        self.path = path
+        self.max_patients = max_patients
+        self.compact_min_lines = compact_min_lines
+        self.lock = threading.Lock()
+        self._db = db
+        self._meta_key = f"vas_offset:{os.path.basename(path)}"
+
+        # patient_code -> {"name": {(ex, ph): (seq, rec)}, "region": {(region, ph): (seq, rec)}}
+        self._patients = OrderedDict()           # cache LRU, không chứa ""
+        self._unassigned = {"name": {}, "region": {}}
+        self._any = {"name": {}, "region": {}}   # mới nhất trên mọi bệnh nhân
+        self._seq = 0
+        self._lines = 0
+        self._compact_at = compact_min_lines
+        self._fh = None
+
+        with self.lock:
+            self._load()
+
+    # ---- load
+    def _load(self):
+        conn = self._db()
+        row = conn.execute("SELECT value FROM meta WHERE key=?", (self._meta_key,)).fetchone()
+        offset, self._lines = (int(v) for v in row[0].split()) if row else (0, 0)
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if offset > size:
+            offset, self._lines = 0, 0   # file bị thay/cắt ngoài app -> dựng lại từ đầu
+            conn.execute("DELETE FROM vas_latest")
+        self._seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM vas_latest").fetchone()[0]
+
+        if size > offset:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                with open(self.path, "rb") as f:
+                    f.seek(offset)
+                    for raw in f:
+                        if not raw.endswith(b"\n"):
+                            break   # dòng ghi dở: đọc lại lần sau
+                        offset += len(raw)
+                        line = raw.strip()
+                        if not line:
+                            continue
+                        self._lines += 1
+                        try:
+                            self._store(conn, json.loads(line))
+                        except Exception:
+                            continue
+                self._save_offset(conn, offset)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        for kind, key, ph, seq, rec in conn.execute(
+            """SELECT kind, key, phase, seq, rec FROM vas_latest v
+               WHERE seq = (SELECT MAX(seq) FROM vas_latest
+                            WHERE kind=v.kind AND key=v.key AND phase=v.phase)"""
+        ):
+            self._any[kind][(key, ph)] = (seq, json.loads(rec))
+        self._unassigned = self._read_slot(conn, "")
+        self._compact_at = max(self.compact_min_lines, 2 * self._live_count(conn))
+        self._fh = open(self.path, "ab")
+
+    def _save_offset(self, conn, offset):
+        conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES(?, ?)",
+                     (self._meta_key, f"{offset} {self._lines}"))
+
+    @staticmethod
+    def _live_count(conn):
+        return conn.execute("SELECT COUNT(DISTINCT seq) FROM vas_latest").fetchone()[0]
+
+    # ---- index
+    def _read_slot(self, conn, pc):
+        slot = {"name": {}, "region": {}}
+        for kind, key, ph, seq, rec in conn.execute(
+            "SELECT kind, key, phase, seq, rec FROM vas_latest WHERE patient_code=?", (pc,)
+        ):
+            slot[kind][(key, ph)] = (seq, json.loads(rec))
+        return slot
+
+    def _slot(self, pc):
+        """Slot của bệnh nhân: cache LRU, hụt thì đọc vas_latest ("" luôn trong RAM)."""
+        if not pc:
+            return self._unassigned
+        slot = self._patients.get(pc)
+        if slot is not None:
+            self._patients.move_to_end(pc)
+            return slot
+        slot = self._patients[pc] = self._read_slot(self._db(), pc)
+        while len(self._patients) > self.max_patients:
+            self._patients.popitem(last=False)
+        return slot
+
+    def _store(self, conn, rec):
+        """Ghi rec vào vas_latest + cập nhật cache (slot bệnh nhân chưa cache thì bỏ qua)."""
+        ph = rec.get("phase")
+        if ph not in self.PHASES:
+            return
+        keys = []
+        ex = (rec.get("exercise_name") or "").strip()
+        if ex:
+            keys.append(("name", ex))
+        region = rec.get("exercise_region") or ""
+        if region:
+            keys.append(("region", region))
+        if not keys:
+            return
+
+        self._seq += 1
+        item = (self._seq, rec)
+        pc = (rec.get("patient_code") or "").strip()
+        data = json.dumps(rec, ensure_ascii=False)
+        conn.executemany(
+            "INSERT OR REPLACE INTO vas_latest(patient_code, kind, key, phase, seq, rec) VALUES(?, ?, ?, ?, ?, ?)",
+            [(pc, kind, key, ph, self._seq, data) for kind, key in keys],
+        )
+        slot = self._unassigned if not pc else self._patients.get(pc)
+        for kind, key in keys:
+            if slot is not None:
+                slot[kind][(key, ph)] = item
+            self._any[kind][(key, ph)] = item
+
+    # ---- write
+    def add(self, rec: dict) -> dict:
+        data = (json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8")
+        with self.lock:
+            self._fh.write(data)
+            self._fh.flush()
+            self._lines += 1
+            conn = self._db()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._store(conn, rec)
+                self._save_offset(conn, self._fh.tell())
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            if self._lines >= self._compact_at:
+                self._compact()
+        return rec
+
+    def _compact(self):
+        """Viết lại file chỉ với các bản còn trong vas_latest (đầy đủ, không phụ thuộc cache)."""
+        conn = self._db()
+        tmp = self.path + ".tmp"
+        live = 0
+        with open(tmp, "wb") as f:
+            for (rec,) in conn.execute(
+                "SELECT rec FROM vas_latest WHERE rowid IN (SELECT MIN(rowid) FROM vas_latest GROUP BY seq) ORDER BY seq"
+            ):
+                f.write((rec + "\n").encode("utf-8"))
+                live += 1
+        self._fh.close()
+        os.replace(tmp, self.path)
+        self._fh = open(self.path, "ab")
+        self._lines = live
+        self._save_offset(conn, self._fh.tell())
+        self._compact_at = max(self.compact_min_lines, 2 * live)
+
+    # ---- read
+    def summary(self, patient_code: str = "") -> dict:
+        """{exercise_name: {"before", "after"}} mới nhất; VAS không gắn bệnh nhân áp cho mọi bệnh nhân."""
+        with self.lock:
+            if patient_code:
+                merged = dict(self._unassigned["name"])
+                for key, item in self._slot(patient_code)["name"].items():
+                    if key not in merged or item[0] > merged[key][0]:
+                        merged[key] = item
+            else:
+                merged = self._any["name"]
+
+            out = {}
+            for (ex, ph), (_, rec) in merged.items():
+                out.setdefault(ex, {"before": None, "after": None})[ph] = rec.get("vas")
+            return out
+
+    def latest_for_region(self, region: str, patient_code: str = ""):
+        """(vas_before, vas_after) mới nhất của 1 vùng, theo bệnh nhân nếu có."""
+        with self.lock:
+            index = self._slot(patient_code)["region"] if patient_code else self._any["region"]
+            return tuple(
+                index[(region, ph)][1].get("vas") if (region, ph) in index else None
+                for ph in self.PHASES
+            )
 
 def gen_patient_code(full_name: str) -> str:
     last = (full_name.split()[-1] if full_name else "BN")
@@ -0,0 +1,70 @@
+import numpy as np
+
+
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: chỉ số n_out điểm giữ hình dạng đường (x, y).
+
+    Luôn giữ điểm đầu/cuối; mỗi bucket ở giữa chọn điểm tạo tam giác lớn nhất
+    với điểm đã chọn trước đó và trung bình bucket kế tiếp.
+    """
+    n = len(x)
+    if n_out >= n or n <= 2:
+        return np.arange(n)
+    n_out = max(int(n_out), 3)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # n_out-2 bucket giữa, chia đều [1, n-1); mỗi bucket có >= 1 điểm vì n > n_out
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    cx = np.concatenate(([0.0], np.cumsum(x)))
+    cy = np.concatenate(([0.0], np.cumsum(y)))
+    size = edges[1:] - edges[:-1]
+    avg_x = (cx[edges[1:]] - cx[edges[:-1]]) / size
+    avg_y = (cy[edges[1:]] - cy[edges[:-1]]) / size
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    last = n_out - 3
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        if b < last:
+            nx, ny = avg_x[b + 1], avg_y[b + 1]
+        else:
+            nx, ny = x[-1], y[-1]
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - nx) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (ny - ay))
+        a = lo + int(np.argmax(area))
+        out[b + 1] = a
+    return out
+
+
+def minmax_indices(y, n_out):
+    """Decimation min/max: mỗi bucket giữ điểm nhỏ nhất + lớn nhất (vector hoá hoàn toàn)."""
+    n = len(y)
+    buckets = max(int(n_out) // 2, 1)
+    if n_out >= n or n <= 2:
+        return np.arange(n)
+
+    size = -(-n // buckets)
+    y = np.asarray(y, dtype=np.float64)
+    padded = np.pad(y, (0, buckets * size - n), mode="edge").reshape(buckets, size)
+    base = np.arange(buckets) * size
+    idx = np.concatenate((base + padded.argmin(axis=1), base + padded.argmax(axis=1), [0, n - 1]))
+    return np.unique(np.minimum(idx, n - 1))
+
+
+def select_indices(x, ys, n_out, method="lttb"):
+    """Chỉ số chung cho nhiều series cùng trục x; ngân sách n_out chia đều cho các series."""
+    n = len(x)
+    ys = [y for y in ys if len(y) == n]
+    if n_out >= n or not ys:
+        return np.arange(n)
+
+    budget = max(int(n_out) // len(ys), 3)
+    if method == "minmax":
+        picked = [minmax_indices(y, budget) for y in ys]
+    else:
+        picked = [lttb_indices(x, y, budget) for y in ys]
+    return np.unique(np.concatenate(picked))
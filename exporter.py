@@ -0,0 +1,72 @@
+import os
+import zlib
+from urllib.parse import quote
+
+import numpy as np
+
+CSV_HEADER = "t_ms,hip,knee,ankle\r\n"
+CSV_ROW = "%d,%.4f,%.4f,%.4f\r\n"
+CSV_CHUNK_ROWS = 8192
+
+
+def iter_csv(snap, chunk_rows=CSV_CHUNK_ROWS):
+    """Sinh CSV (utf-8-sig) theo từng khối cột; bộ nhớ không phụ thuộc độ dài phiên."""
+    yield ("\ufeff" + CSV_HEADER).encode("utf-8")
+
+    cols = (snap.t_ms, snap.hip, snap.knee, snap.ankle)
+    for lo in range(0, len(snap), chunk_rows):
+        # xen kẽ 4 cột thành 1 tuple phẳng rồi format cả khối 1 lần
+        block = np.column_stack([c[lo:lo + chunk_rows] for c in cols])
+        yield ((CSV_ROW * len(block)) % tuple(block.ravel().tolist())).encode("utf-8")
+
+
+def iter_gzip(chunks, level=6):
+    comp = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31 -> định dạng gzip
+    for chunk in chunks:
+        out = comp.compress(chunk)
+        if out:
+            yield out
+    yield comp.flush()
+
+
+def iter_tee(chunks, disk_path):
+    """Vừa trả chunk cho response vừa ghi ra disk; file chỉ được đổi tên khi ghi xong."""
+    part_path = disk_path + ".part"
+    try:
+        f = open(part_path, "wb")
+    except Exception as e:
+        print("[WARN] cannot save export to disk:", e)
+        yield from chunks
+        return
+
+    done = False
+    try:
+        for chunk in chunks:
+            f.write(chunk)
+            yield chunk
+        done = True
+    finally:
+        f.close()
+        try:
+            if done:
+                os.replace(part_path, disk_path)
+            else:
+                os.remove(part_path)
+        except Exception as e:
+            print("[WARN] cannot finalize export file:", e)
+
+
+def pack_float32(arrays: dict, columns) -> bytes:
+    """Các cột nối tiếp nhau, mỗi cột float32 little-endian (Float32Array phía JS)."""
+    if not columns:
+        return b""
+    return np.stack([arrays[name] for name in columns]).astype("<f4").tobytes()
+
+
+def content_disposition(filename: str) -> str:
+    try:
+        filename.encode("ascii")
+        return f'attachment; filename="{filename}"'
+    except UnicodeEncodeError:
+        fallback = filename.encode("ascii", "ignore").decode("ascii") or "export"
+        return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename)}"
@@ -0,0 +1,23 @@
+"""Pipeline thu dữ liệu IMU/EMG từ thiết bị, chia theo stage:
+
+  reader     (reader.py)     : SerialHub / PortReader - đọc byte từ cổng serial
+  parser     (parser.py)     : FrameDecoder - ASCII hoặc binary frame -> record
+  timebase   (clock_sync.py) : ClockSync - ts thiết bị -> host ms
+  kinematics (kinematics.py) : hướng sensor -> góc khớp (quaternion / hiệu roll)
+  filter     (filter.py, fusion.py, sliding_rms.py) : resample IMU/EMG, RMS,
+                               hip sign + deadzone + clamp (process_block)
+  smoothing  (smoothing.py)  : JointFilters - EMA / One-Euro / Butterworth theo khớp
+  sink       : callable(block), thường là MeasureSession.append_block (đẩy vào SpscRing)
+
+IngestPipeline (pipeline.py) nối parser -> kinematics -> fusion -> sink cho 1 luồng byte.
+"""
+from .clock_sync import ClockSync
+from .filter import BLOCK_COLUMNS, ema_block, process_block, to_block
+from .fusion import FUSED_COLUMNS, FusionStage
+from .kinematics import SOLVERS, clamp, clamp_array, norm_deg, norm_deg_array
+from .parser import FrameDecoder, parse_serial_line
+from .pipeline import IngestPipeline
+from .reader import PORT_HINTS, PortReader, SerialHub
+from .ring import SeqDoubleBuffer, SpscRing
+from .sliding_rms import SlidingRms, block_rms
+from .smoothing import FILTERS, JointFilters, zero_phase_lowpass
@@ -0,0 +1,151 @@
+from collections import deque
+
+import numpy as np
+
+U32 = 1 << 32
+
+
+class SenderClock:
+    """Ánh xạ timestamp thiết bị -> host time (ms) cho 1 sender.
+
+    Hồi quy tuyến tính host = drift * dev + offset trên cửa sổ trượt các cặp
+    (dev, host) quan sát được; tổng được cập nhật tăng dần nên mỗi mẫu O(1).
+    Thời gian trả về là điểm trên đường hồi quy nên không mang jitter của
+    host/USB batching, và không giảm (monotonic) theo từng sender.
+    """
+
+    REBASE_MS = 600_000.0
+
+    def __init__(self, unit_ms=1.0, window=4096, wrap=U32, reset_ms=2000.0):
+        self.unit_ms = float(unit_ms)      # 1 đơn vị ts thiết bị = bao nhiêu ms (IMU: 1, EMG us: 0.001)
+        self.window = max(int(window), 2)
+        self.wrap = wrap                   # counter u32 của thiết bị quay vòng
+        self.reset_ms = float(reset_ms)    # ts lùi quá ngưỡng này -> thiết bị khởi động lại
+        self.reset()
+
+    def reset(self):
+        self._pairs = deque()
+        self._sx = self._sy = self._sxx = self._sxy = 0.0
+        self._dev0 = None      # gốc trục dev (ms, đã unwrap) để tổng không mất chính xác
+        self._host0 = None
+        self._raw_last = None
+        self._wraps = 0
+        self.drift = 1.0
+        self.offset = 0.0
+        self.last_out = float("-inf")
+        self.resets = 0
+
+    @property
+    def n(self):
+        return len(self._pairs)
+
+    def _unwrap(self, raw):
+        """Counter thô -> ms liên tục (xử lý quay vòng u32)."""
+        last = self._raw_last
+        if last is not None and raw < last:
+            if self.wrap and last - raw > self.wrap // 2:
+                self._wraps += 1
+            elif (last - raw) * self.unit_ms > self.reset_ms:
+                return None
+        self._raw_last = raw
+        return (raw + self._wraps * (self.wrap or 0)) * self.unit_ms
+
+    def _rebase(self, dev, host_ms):
+        """Dời gốc trục về mẫu hiện tại để tổng bình phương không mất chính xác khi chạy lâu."""
+        dx, dy = dev - self._dev0, host_ms - self._host0
+        self._dev0, self._host0 = dev, host_ms
+        self._pairs = deque((x - dx, y - dy) for x, y in self._pairs)
+        self._sx = sum(x for x, _ in self._pairs)
+        self._sy = sum(y for _, y in self._pairs)
+        self._sxx = sum(x * x for x, _ in self._pairs)
+        self._sxy = sum(x * y for x, y in self._pairs)
+        self.offset -= dy - self.drift * dx
+
+    def _fit(self):
+        n = len(self._pairs)
+        if n < 2:
+            x, y = self._pairs[-1]
+            self.drift, self.offset = 1.0, y - x
+            return
+        var = n * self._sxx - self._sx * self._sx
+        if var <= 1e-9:
+            self.drift = 1.0
+        else:
+            self.drift = (n * self._sxy - self._sx * self._sy) / var
+        self.offset = (self._sy - self.drift * self._sx) / n
+
+    def update(self, dev_ts, host_ms) -> float:
+        """Thêm 1 quan sát (ts thiết bị, host ms lúc nhận); trả host time đã đồng bộ."""
+        dev = self._unwrap(dev_ts)
+        if dev is None:
+            resets, last_out = self.resets + 1, self.last_out
+            self.reset()
+            self.resets, self.last_out = resets, last_out
+            dev = self._unwrap(dev_ts)
+        if self._dev0 is None:
+            self._dev0, self._host0 = dev, host_ms
+        elif dev - self._dev0 > self.REBASE_MS:
+            self._rebase(dev, host_ms)
+
+        x, y = dev - self._dev0, host_ms - self._host0
+        self._pairs.append((x, y))
+        self._sx += x
+        self._sy += y
+        self._sxx += x * x
+        self._sxy += x * y
+        if len(self._pairs) > self.window:
+            ox, oy = self._pairs.popleft()
+            self._sx -= ox
+            self._sy -= oy
+            self._sxx -= ox * ox
+            self._sxy -= ox * oy
+        self._fit()
+
+        t = self._host0 + self.offset + self.drift * x
+        if t < self.last_out:
+            t = self.last_out
+        self.last_out = t
+        return t
+
+    def to_host_block(self, dev_ts) -> np.ndarray:
+        """Quy đổi mảng ts thiết bị (cùng vòng quay counter) sang host ms, không cập nhật mô hình."""
+        if self._dev0 is None:
+            raise ValueError("clock chưa có quan sát nào")
+        raw = np.asarray(dev_ts, dtype=np.float64) + self._wraps * (self.wrap or 0)
+        return self._host0 + self.offset + self.drift * (raw * self.unit_ms - self._dev0)
+
+    def info(self) -> dict:
+        return {
+            "n": self.n,
+            "drift_ppm": round(float(self.drift - 1.0) * 1e6, 1),
+            # host = drift * dev + offset_ms
+            "offset_ms": (round(float(self._host0 + self.offset - self.drift * self._dev0), 3)
+                          if self._dev0 is not None else None),
+            "resets": self.resets,
+        }
+
+
+class ClockSync:
+    """SenderClock theo (kind, sender_id): IMU ts tính bằng ms, EMG ts bằng us."""
+
+    UNITS_MS = {"imu": 1.0, "emg": 0.001}
+
+    def __init__(self, window=4096):
+        self.window = window
+        self._clocks = {}
+
+    def clock(self, kind, sender_id) -> SenderClock:
+        key = (kind, sender_id)
+        c = self._clocks.get(key)
+        if c is None:
+            c = self._clocks[key] = SenderClock(self.UNITS_MS.get(kind, 1.0), self.window)
+        return c
+
+    def update(self, kind, sender_id, dev_ts, host_ms) -> float:
+        return self.clock(kind, sender_id).update(dev_ts, host_ms)
+
+    def reset(self):
+        self._clocks.clear()
+
+    def info(self) -> dict:
+        return {f"{k}:{sid}": c.info() for (k, sid), c in self._clocks.items()}
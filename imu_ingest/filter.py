@@ -0,0 +1,94 @@
+import numpy as np
+
+try:
+    from scipy.signal import lfilter
+except Exception:
+    lfilter = None
+
+# Cột của 1 block mẫu góc (N x 5)
+COL_T, COL_HIP, COL_KNEE, COL_ANKLE, COL_PITCH2 = range(5)
+BLOCK_COLUMNS = ("t_ms", "hip", "knee", "ankle", "pitch2")
+
+HIP_LIMITS = (-30.1, 122.1)
+KNEE_LIMITS = (0, 134)
+ANKLE_LIMITS = (36, 113)
+
+
+def to_block(rows) -> np.ndarray:
+    """List tuple (t_ms, hip, knee, ankle, pitch2) -> ndarray float64 (N x 5)."""
+    block = np.asarray(rows, dtype=np.float64)
+    return block.reshape(-1, len(BLOCK_COLUMNS))
+
+
+def hip_sign_block(raw_hip, pitch2, mode, cross_th, pitch_mid, pitch_hys):
+    """Hysteresis front/back theo pitch2 cho cả block; trả (sign, mode cuối)."""
+    gate = np.abs(raw_hip) < cross_th
+    front = gate & (pitch2 <= (pitch_mid - pitch_hys))
+    back = gate & ~front & (pitch2 >= (pitch_mid + pitch_hys))
+
+    event = np.zeros(len(raw_hip), dtype=np.int8)
+    event[front] = 1
+    event[back] = -1
+
+    # forward-fill: mỗi mẫu lấy event gần nhất (hoặc mode trước block)
+    idx = np.where(event != 0, np.arange(len(event)), -1)
+    np.maximum.accumulate(idx, out=idx)
+    start = 1 if mode == "front" else -1
+    sign = np.where(idx >= 0, event[idx], start)
+
+    if len(sign):
+        mode = "front" if sign[-1] > 0 else "back"
+    return sign, mode
+
+
+def ema_block(x, prev, alpha):
+    """EMA dạng lọc đệ quy y = y_prev*(1-a) + x*a; prev=None -> lấy mẫu đầu."""
+    if len(x) == 0:
+        return x.copy(), prev
+
+    a = alpha
+    b = 1 - alpha
+    if prev is None:
+        y0 = float(x[0])
+        rest, last = ema_block(x[1:], y0, alpha)
+        return np.concatenate(([y0], rest)), last
+
+    if lfilter is not None:
+        y, _ = lfilter([a], [1.0, -b], x, zi=[b * prev])
+        return y, float(y[-1])
+
+    y = np.empty_like(x)
+    for i, v in enumerate(x.tolist()):
+        prev = prev * b + v * a
+        y[i] = prev
+    return y, prev
+
+
+def process_block(block, hip_mode, filters, *,
+                  cross_th, pitch_mid, pitch_hys, deadzone, signed_hip=False):
+    """Chạy hip sign + deadzone + clamp + làm mượt cho 1 block (N x 5).
+
+    signed_hip=True: hip đã có dấu (kinematics quaternion) -> bỏ qua
+    heuristic front/back theo pitch2.
+    `filters` là smoothing.JointFilters của nguồn dữ liệu, state cập nhật tại chỗ;
+    trả về (t, hip, knee, ankle, hip_mode).
+    """
+    t = block[:, COL_T]
+    raw_hip = block[:, COL_HIP]
+
+    if signed_hip:
+        hip = np.where(np.abs(raw_hip) < deadzone, 0.0, raw_hip)
+    else:
+        pitch2 = block[:, COL_PITCH2]
+        sign, hip_mode = hip_sign_block(raw_hip, pitch2, hip_mode, cross_th, pitch_mid, pitch_hys)
+        mag_hip = np.abs(raw_hip)
+        hip = np.where(mag_hip < deadzone, 0.0, sign * mag_hip)
+
+    hip = np.clip(hip, *HIP_LIMITS)
+    knee = np.clip(np.abs(block[:, COL_KNEE]), *KNEE_LIMITS)
+    ankle = np.clip(np.abs(block[:, COL_ANKLE]), *ANKLE_LIMITS)
+
+    hip = filters.block("hip", hip, t)
+    knee = filters.block("knee", knee, t)
+    ankle = filters.block("ankle", ankle, t)
+    return t, hip, knee, ankle, hip_mode
@@ -0,0 +1,129 @@
+import numpy as np
+
+from .filter import BLOCK_COLUMNS, COL_T, ema_block
+from .sliding_rms import SlidingRms
+
+# Block sau fusion (N x 8): 5 cột góc thô + EMG đã resample cùng lưới thời gian
+FUSED_COLUMNS = BLOCK_COLUMNS + ("emg", "emg_rms", "emg_env")
+COL_EMG, COL_EMG_RMS, COL_EMG_ENV = range(len(BLOCK_COLUMNS), len(FUSED_COLUMNS))
+
+
+class FusionStage:
+    """Đệm IMU (~100 Hz) và EMG (~1 kHz), resample lên lưới chung `rate_hz`.
+
+    Góc: nội suy tuyến tính; EMG: giá trị nội suy + RMS trượt `emg_rms_window`
+    mẫu EMG gốc (SlidingRms, mọi mẫu chứ không chỉ mẫu mới nhất) lấy tại
+    mẫu EMG cuối <= điểm lưới + envelope EMA của RMS.
+    Một điểm lưới chỉ được xuất khi cả 2 luồng đã có dữ liệu vượt qua nó;
+    EMG im lặng quá `emg_timeout_ms` thì không chờ nữa (cột EMG = NaN).
+    Thời gian đầu vào phải cùng timebase (host ms, xem clock_sync); hàng IMU
+    không cần tới theo thứ tự thời gian (nhiều sender), push() tự sắp lại.
+    """
+
+    def __init__(self, sink, rate_hz=100.0, emg_rms_window=200, emg_alpha=0.1, emg_timeout_ms=250.0):
+        self.sink = sink
+        self.dt = 1000.0 / max(float(rate_hz), 1.0)
+        self.rms = SlidingRms(emg_rms_window)
+        self.emg_alpha = emg_alpha
+        self.emg_timeout_ms = float(emg_timeout_ms)
+        self.reset()
+
+    def reset(self):
+        self._imu = np.empty((0, len(BLOCK_COLUMNS)))
+        self._emg_t = np.empty(0)
+        self._emg_v = np.empty(0)
+        self._emg_r = np.empty(0)  # RMS trượt tại từng mẫu EMG
+        self.rms.reset()
+        self._next = None          # thời điểm lưới kế tiếp (ms)
+        self._env = None           # trạng thái EMA envelope
+        self.frames = 0
+
+    def push(self, imu_block=None, emg_t=None, emg_v=None):
+        """Thêm block IMU (N x 5) và/hoặc mẫu EMG (t_ms, value); xuất các frame đã đủ dữ liệu."""
+        if imu_block is not None and len(imu_block):
+            imu = np.concatenate((self._imu, imu_block))
+            t = imu[:, COL_T]
+            if (t[1:] < t[:-1]).any():
+                # mỗi sender 1 SenderClock, hàng tới theo thứ tự nhận -> t không tăng dần;
+                # interp/searchsorted cần t tăng: sắp lại (stable giữ hàng nhận sau cùng ts ở cuối)
+                imu = imu[np.argsort(t, kind="stable")]
+            self._imu = imu
+        if emg_t is not None and len(emg_t):
+            self._emg_t = np.concatenate((self._emg_t, np.asarray(emg_t, dtype=np.float64)))
+            emg_v = np.asarray(emg_v, dtype=np.float64)
+            self._emg_v = np.concatenate((self._emg_v, emg_v))
+            self._emg_r = np.concatenate((self._emg_r, self.rms.push_block(emg_v)[:, 0]))
+
+        if len(self._imu) == 0:
+            return
+        imu_t = self._imu[:, COL_T]
+        if self._next is None:
+            self._next = np.ceil(imu_t[0] / self.dt) * self.dt
+
+        ready = imu_t[-1]
+        if len(self._emg_t) and self._emg_t[-1] > ready - self.emg_timeout_ms:
+            ready = min(ready, self._emg_t[-1])
+        self._emit_until(ready)
+
+    def drain(self):
+        """Dừng đo: xuất nốt các điểm lưới tới mẫu IMU cuối, không chờ EMG (thiếu EMG -> NaN)."""
+        if len(self._imu) and self._next is not None:
+            self._emit_until(self._imu[-1, COL_T])
+
+    def _emit_until(self, ready):
+        if ready < self._next:
+            return
+        k = int((ready - self._next) // self.dt) + 1
+        grid = self._next + self.dt * np.arange(k)
+        self._next = grid[-1] + self.dt
+        self.sink(self._resample(grid))
+        self.frames += k
+        self._trim()
+
+    def _resample(self, grid):
+        imu = self._imu
+        t = imu[:, COL_T]
+        # nhiều sender cùng 1 ts -> giữ hàng cuối (đã cập nhật đủ các đoạn chi)
+        last = np.append(t[1:] != t[:-1], True)
+        imu, t = imu[last], t[last]
+
+        out = np.empty((len(grid), len(FUSED_COLUMNS)))
+        out[:, COL_T] = grid
+        for c in range(1, len(BLOCK_COLUMNS)):
+            out[:, c] = np.interp(grid, t, imu[:, c])
+
+        et, ev = self._emg_t, self._emg_v
+        if len(et):
+            emg = np.interp(grid, et, ev)
+            rms = self._emg_r[np.maximum(np.searchsorted(et, grid, side="right") - 1, 0)]
+            # ngoài vùng có EMG -> NaN (không ngoại suy giá trị biên)
+            outside = (grid < et[0]) | (grid > et[-1])
+            emg[outside] = np.nan
+            rms[outside] = np.nan
+            out[:, COL_EMG] = emg
+            out[:, COL_EMG_RMS] = rms
+            out[:, COL_EMG_ENV] = self._envelope(rms)
+        else:
+            out[:, COL_EMG:] = np.nan
+        return out
+
+    def _envelope(self, rms):
+        env = np.full(len(rms), np.nan)
+        ok = ~np.isnan(rms)
+        if ok.any():
+            env[ok], self._env = ema_block(rms[ok], self._env, self.emg_alpha)
+        return env
+
+    def _trim(self):
+        """Bỏ mẫu không còn cần: giữ 1 mẫu IMU/EMG trước lưới kế tiếp (để nội suy)."""
+        t = self._imu[:, COL_T]
+        i = max(int(np.searchsorted(t, self._next, side="right")) - 1, 0)
+        # lùi về đầu nhóm cùng ts để giữ đủ hàng cho bước khử trùng lặp
+        while i > 0 and t[i - 1] == t[i]:
+            i -= 1
+        self._imu = self._imu[i:]
+
+        j = max(int(np.searchsorted(self._emg_t, self._next, side="right")) - 1, 0)
+        self._emg_t = self._emg_t[j:]
+        self._emg_v = self._emg_v[j:]
+        self._emg_r = self._emg_r[j:]
@@ -0,0 +1,137 @@
+import math
+
+import numpy as np
+
+# Quaternion (w, x, y, z), mảng (..., 4). Góc đầu vào theo độ.
+# Thứ tự sensor (sender_id 1..4): pelvis -> thigh -> shank -> foot
+N_SEGMENTS = 4
+JOINTS = (("hip", 0, 1), ("knee", 1, 2), ("ankle", 2, 3))   # (tên, segment cha, segment con)
+SAGITTAL_AXIS = np.array([1.0, 0.0, 0.0])                   # trục roll của sensor = trục gập/duỗi
+
+
+# =========================
+#   KERNELS: wrap góc / clamp (scalar + mảng)
+# =========================
+def norm_deg(x: float) -> float:
+    """Đưa góc (độ) về [-180, 180] bằng phép modulo (không vòng while)."""
+    if x > 180.0:
+        return x - 360.0 * math.ceil((x - 180.0) / 360.0)
+    if x < -180.0:
+        return x + 360.0 * math.ceil((-180.0 - x) / 360.0)
+    return x
+
+
+def norm_deg_array(x) -> np.ndarray:
+    """norm_deg cho cả mảng, cùng kết quả với bản scalar (kể cả biên ±180)."""
+    x = np.asarray(x, dtype=np.float64)
+    k = np.ceil(np.maximum(x - 180.0, 0.0) / 360.0) - np.ceil(np.maximum(-180.0 - x, 0.0) / 360.0)
+    return x - 360.0 * k
+
+
+def clamp(val: float, lo: float, hi: float) -> float:
+    return lo if val < lo else hi if val > hi else val
+
+
+def clamp_array(x, lo, hi) -> np.ndarray:
+    return np.clip(np.asarray(x, dtype=np.float64), lo, hi)
+
+
+def quat_from_axis_angle(axis, deg) -> np.ndarray:
+    axis = np.asarray(axis, dtype=np.float64)
+    axis = axis / np.linalg.norm(axis)
+    half = np.radians(np.asarray(deg, dtype=np.float64)) / 2.0
+    return np.concatenate((np.cos(half)[..., None], np.sin(half)[..., None] * axis), axis=-1)
+
+
+def quat_from_euler(yaw, roll, pitch) -> np.ndarray:
+    """Euler ZYX (yaw quanh z, pitch quanh y, roll quanh x, độ) -> quaternion, vector hoá."""
+    hy = np.radians(np.asarray(yaw, dtype=np.float64)) / 2.0
+    hp = np.radians(np.asarray(pitch, dtype=np.float64)) / 2.0
+    hr = np.radians(np.asarray(roll, dtype=np.float64)) / 2.0
+    cy, sy = np.cos(hy), np.sin(hy)
+    cp, sp = np.cos(hp), np.sin(hp)
+    cr, sr = np.cos(hr), np.sin(hr)
+    return np.stack((
+        cr * cp * cy + sr * sp * sy,
+        sr * cp * cy - cr * sp * sy,
+        cr * sp * cy + sr * cp * sy,
+        cr * cp * sy - sr * sp * cy,
+    ), axis=-1)
+
+
+def quat_conj(q) -> np.ndarray:
+    return q * np.array([1.0, -1.0, -1.0, -1.0])
+
+
+def quat_mul(a, b) -> np.ndarray:
+    """Tích Hamilton a ⊗ b (broadcast theo các chiều đầu)."""
+    aw, ax, ay, az = np.moveaxis(a, -1, 0)
+    bw, bx, by, bz = np.moveaxis(b, -1, 0)
+    return np.stack((
+        aw * bw - ax * bx - ay * by - az * bz,
+        aw * bx + ax * bw + ay * bz - az * by,
+        aw * by - ax * bz + ay * bw + az * bx,
+        aw * bz + ax * by - ay * bx + az * bw,
+    ), axis=-1)
+
+
+def quat_normalize(q) -> np.ndarray:
+    return q / np.linalg.norm(q, axis=-1, keepdims=True)
+
+
+def twist_angle(q, axis=SAGITTAL_AXIS) -> np.ndarray:
+    """Góc quay (độ, (-180, 180]) quanh `axis` theo phân tách swing-twist.
+
+    Không qua Euler nên không có gimbal lock; dấu lấy trực tiếp từ hướng
+    quay quanh trục, không cần heuristic.
+    """
+    proj = q[..., 1:] @ np.asarray(axis, dtype=np.float64)
+    w = q[..., 0]
+    # q và -q cùng 1 phép quay: đưa về w >= 0 để góc nằm trong (-180, 180]
+    sign = np.where(w < 0, -1.0, 1.0)
+    return np.degrees(2.0 * np.arctan2(sign * proj, sign * w))
+
+
+# Hướng gắn sensor so với segment: foot gắn ngược (quay 180° quanh z) -> roll đổi dấu
+SENSOR_MOUNT = {3: quat_from_axis_angle([0.0, 0.0, 1.0], 180.0)}
+
+
+def segment_quats(euler) -> np.ndarray:
+    """euler (N, 4, 3) [yaw, roll, pitch] của 4 sensor -> quaternion segment (N, 4, 4)."""
+    euler = np.asarray(euler, dtype=np.float64)
+    q = quat_from_euler(euler[..., 0], euler[..., 1], euler[..., 2])
+    for seg, m in SENSOR_MOUNT.items():
+        # đổi hệ trục sensor -> segment: m* ⊗ q ⊗ m
+        q[:, seg] = quat_mul(quat_mul(quat_conj(m), q[:, seg]), m)
+    return q
+
+
+def joint_angles_block(euler) -> np.ndarray:
+    """Góc khớp sagittal (N, 3) hip/knee/ankle từ hướng đầy đủ của 4 sensor.
+
+    Quay tương đối q_rel = q_cha* ⊗ q_con rồi lấy twist quanh trục sagittal.
+    """
+    q = segment_quats(euler)
+    out = np.empty((len(q), len(JOINTS)))
+    for j, (_, parent, child) in enumerate(JOINTS):
+        rel = quat_mul(quat_conj(q[:, parent]), q[:, child])
+        out[:, j] = twist_angle(rel)
+    return out
+
+
+def angle_block_quat(euler) -> np.ndarray:
+    """(N, 4, 3) Euler sensor -> (N, 4) hip, knee, ankle, pitch2 cho process_block (hip đã có dấu)."""
+    euler = np.asarray(euler, dtype=np.float64)
+    return np.column_stack((joint_angles_block(euler), euler[:, 1, 2]))
+
+
+def angle_block_roll(euler) -> np.ndarray:
+    """Công thức cũ: hiệu roll giữa các sensor (dấu hip do process_block đoán theo pitch2)."""
+    euler = np.asarray(euler, dtype=np.float64)
+    roll = euler[..., 1]
+    p1, p2, p3, p4 = roll[:, 0], roll[:, 1], roll[:, 2], -roll[:, 3]
+    return np.column_stack((norm_deg_array(p2 - p1), norm_deg_array(p3 - p2), norm_deg_array(p4 - p3),
+                            euler[:, 1, 2]))
+
+
+SOLVERS = {"quat": angle_block_quat, "roll": angle_block_roll}
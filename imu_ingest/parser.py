@@ -0,0 +1,179 @@
+import struct
+
+# =========================
+#   WIRE FORMAT
+# =========================
+# ASCII (cũ, fallback):
+#   IMU,sender_id,timestamp_ms,yaw,roll,pitch\n
+#   EMG,sender_id,timestamp_us,emg_clean\n
+#
+# Binary frame (mới):
+#   0xAA 0x55 | type:u8 | length:u16le | payload[length] | checksum:u8
+#   payload = N bản ghi cùng loại, đóng gói liền nhau (little-endian)
+#   checksum = (type + length_lo + length_hi + sum(payload)) & 0xFF
+FRAME_MAGIC = b"\xAA\x55"
+FRAME_HEADER = struct.Struct("<2sBH")
+FRAME_MAX_PAYLOAD = 4096
+
+REC_IMU = 0x01
+REC_EMG = 0x02
+
+IMU_RECORD = struct.Struct("<BIfff")   # sender_id, ts_ms, yaw, roll, pitch
+EMG_RECORD = struct.Struct("<BIf")     # sender_id, ts_us, emg_clean
+
+_RECORDS = {
+    REC_IMU: ("imu", IMU_RECORD),
+    REC_EMG: ("emg", EMG_RECORD),
+}
+
+MAX_LINE = 256
+
+
+def parse_serial_line(line: str):
+    parts = [p.strip() for p in line.strip().split(",") if p.strip() != ""]
+    if not parts:
+        return None
+
+    tag = parts[0].upper()
+    try:
+        if tag == "IMU" and len(parts) >= 6:
+            return ("imu", int(parts[1]), int(float(parts[2])), float(parts[3]), float(parts[4]), float(parts[5]))
+        if tag == "EMG" and len(parts) >= 4:
+            return ("emg", int(parts[1]), int(float(parts[2])), float(parts[3]))
+    except Exception:
+        return None
+    return None
+
+
+def _checksum(rec_type: int, payload) -> int:
+    n = len(payload)
+    return (rec_type + (n & 0xFF) + (n >> 8) + sum(payload)) & 0xFF
+
+
+def encode_frame(rec_type: int, records) -> bytes:
+    """Đóng gói list bản ghi (không có tag) thành 1 frame binary."""
+    _, rec_struct = _RECORDS[rec_type]
+    payload = b"".join(rec_struct.pack(*r) for r in records)
+    if len(payload) > FRAME_MAX_PAYLOAD:
+        raise ValueError("payload too large")
+    header = FRAME_HEADER.pack(FRAME_MAGIC, rec_type, len(payload))
+    return header + payload + bytes([_checksum(rec_type, payload)])
+
+
+class FrameDecoder:
+    """Giải mã stream serial theo từng chunk; tự nhận ASCII hay binary."""
+
+    def __init__(self):
+        self.buf = bytearray()
+        self.mode = None          # None (chưa biết) / "ascii" / "binary"
+        self.frames = 0
+        self.bad_frames = 0
+
+    def reset(self):
+        self.buf.clear()
+        self.mode = None
+
+    def feed(self, chunk) -> list:
+        if chunk:
+            self.buf += chunk
+
+        if self.mode is None:
+            self._detect()
+        if self.mode == "binary":
+            return self._decode_binary()
+        if self.mode == "ascii":
+            return self._decode_ascii()
+        return []
+
+    # ---- auto-detect: frame hợp lệ -> binary, dòng IMU/EMG hợp lệ -> ascii
+    def _detect(self):
+        buf = self.buf
+        i = buf.find(FRAME_MAGIC)
+        while i >= 0 and len(buf) - i >= FRAME_HEADER.size:
+            _, rec_type, length = FRAME_HEADER.unpack_from(buf, i)
+            end = i + FRAME_HEADER.size + length
+            if rec_type in _RECORDS and length <= FRAME_MAX_PAYLOAD:
+                if len(buf) <= end:
+                    break
+                if buf[end] == _checksum(rec_type, buf[i + FRAME_HEADER.size:end]):
+                    del buf[:i]
+                    self.mode = "binary"
+                    return
+            i = buf.find(FRAME_MAGIC, i + 1)
+
+        start = 0
+        while True:
+            nl = buf.find(b"\n", start)
+            if nl < 0:
+                break
+            line = bytes(buf[start:nl]).decode("utf-8", errors="ignore")
+            if parse_serial_line(line):
+                del buf[:start]
+                self.mode = "ascii"
+                return
+            start = nl + 1
+
+        # chưa nhận ra: giữ lại đuôi buffer đủ để bắt frame/dòng tiếp theo
+        if len(buf) > FRAME_MAX_PAYLOAD + 2 * MAX_LINE:
+            del buf[:len(buf) - MAX_LINE]
+
+    def _decode_ascii(self) -> list:
+        buf = self.buf
+        nl = buf.rfind(b"\n")
+        if nl < 0:
+            if len(buf) > MAX_LINE:
+                buf.clear()
+            return []
+
+        text = bytes(buf[:nl]).decode("utf-8", errors="ignore")
+        del buf[:nl + 1]
+
+        out = []
+        for line in text.split("\n"):
+            parsed = parse_serial_line(line)
+            if parsed:
+                out.append(parsed)
+        return out
+
+    def _decode_binary(self) -> list:
+        buf = self.buf
+        out = []
+        pos = 0
+        hsize = FRAME_HEADER.size
+        n = len(buf)
+
+        while True:
+            i = buf.find(FRAME_MAGIC, pos)
+            if i < 0:
+                # giữ lại 1 byte cuối phòng khi magic bị cắt đôi
+                pos = max(pos, n - 1)
+                break
+            if n - i < hsize:
+                pos = i
+                break
+
+            _, rec_type, length = FRAME_HEADER.unpack_from(buf, i)
+            spec = _RECORDS.get(rec_type)
+            if spec is None or length > FRAME_MAX_PAYLOAD or length % spec[1].size:
+                self.bad_frames += 1
+                pos = i + 1
+                continue
+
+            end = i + hsize + length
+            if n <= end:
+                pos = i
+                break
+
+            payload = bytes(buf[i + hsize:end])
+            if buf[end] != _checksum(rec_type, payload):
+                self.bad_frames += 1
+                pos = i + 1
+                continue
+
+            tag = spec[0]
+            out.extend((tag, *rec) for rec in spec[1].iter_unpack(payload))
+            self.frames += 1
+            pos = end + 1
+
+        del buf[:pos]
+        return out
@@ -0,0 +1,122 @@
+import time
+
+import numpy as np
+
+from .filter import BLOCK_COLUMNS, COL_T
+from .kinematics import N_SEGMENTS, angle_block_quat
+from .parser import FrameDecoder
+
+
+class IngestPipeline:
+    """Chuỗi xử lý 1 luồng byte thiết bị: parser -> timebase -> kinematics -> fusion -> sink.
+
+    Mỗi stage truyền vào qua tham số nên thay/đo riêng được:
+      parser   : .feed(bytes) -> list record (FrameDecoder: ASCII hoặc binary frame)
+      clock    : ClockSync | None (None -> thời điểm nhận chunk)
+      solver   : (N, 4, 3) Euler sensor -> (N, 4) hip, knee, ankle, pitch2
+      fusion   : sink -> FusionStage | None (None -> block IMU thô N x 5)
+      sink     : callable(block), thường là MeasureSession.append_block
+    Thời gian CPU cộng dồn theo stage nằm trong stats()["stage_ms"].
+    """
+
+    STAGES = ("parser", "kinematics", "fusion", "sink")
+
+    def __init__(self, parser=None, clock=None, solver=angle_block_quat, fusion=None, sink=None):
+        self.parser = parser if parser is not None else FrameDecoder()
+        self.clock = clock
+        self.solver = solver
+        self.fusion = fusion(self._emit) if fusion is not None else None
+        self.sink = sink
+
+        self.records = 0
+        self.rows = 0
+        self.emg_samples = 0
+        self.rows_dropped = 0
+        self.stage_s = dict.fromkeys(self.STAGES, 0.0)
+        self._sink_s = 0.0
+
+        # hướng gần nhất (yaw, roll, pitch) của sensor 1..4
+        self._orient = [(0.0, 0.0, 0.0)] * N_SEGMENTS
+        self._emg_sid = None       # sender EMG đầu tiên gặp trên luồng
+
+    def feed(self, chunk, now):
+        """Đưa 1 chunk byte (nhận lúc `now`, giây epoch) qua toàn bộ pipeline."""
+        t0 = time.perf_counter()
+        # ASCII (IMU,...) hoặc binary frame: decoder tự nhận dạng
+        records = self.parser.feed(chunk)
+        if not records:
+            self.stage_s["parser"] += time.perf_counter() - t0
+            return
+        self.records += len(records)
+
+        now_ms = now * 1000.0  # ✅ timebase CHUNG
+        clock = self.clock
+        orient = self._orient
+        times, frames = [], []
+        emg_t, emg_v = [], []
+        for parsed in records:
+            if parsed[0] == "emg":
+                _, sid, ts, val = parsed
+                if self._emg_sid is None:
+                    self._emg_sid = sid
+                if sid == self._emg_sid:
+                    emg_t.append(clock.update("emg", sid, ts, now_ms) if clock is not None else now_ms)
+                    emg_v.append(val)
+                continue
+            if parsed[0] != "imu":
+                continue
+            _, sid, ts, yaw, roll, pitch = parsed
+            if not 1 <= sid <= N_SEGMENTS:
+                continue
+            orient[sid - 1] = (yaw, roll, pitch)
+            times.append(clock.update("imu", sid, ts, now_ms) if clock is not None else now_ms)
+            frames.append(tuple(orient))
+        t1 = time.perf_counter()
+        self.stage_s["parser"] += t1 - t0
+
+        rows = None
+        if frames:
+            rows = np.empty((len(frames), len(BLOCK_COLUMNS)))
+            rows[:, COL_T] = times
+            rows[:, 1:] = self.solver(np.array(frames))
+            self.rows += len(rows)
+        self.emg_samples += len(emg_v)
+        t2 = time.perf_counter()
+        self.stage_s["kinematics"] += t2 - t1
+
+        if self.fusion is not None:
+            if rows is not None or emg_v:
+                self._sink_s = 0.0
+                self.fusion.push(rows, emg_t, emg_v)
+                # sink được gọi bên trong fusion.push: không tính vào thời gian fusion
+                self.stage_s["fusion"] += time.perf_counter() - t2 - self._sink_s
+        elif rows is not None:
+            self._emit(rows)
+
+    def drain(self):
+        """Đẩy nốt frame fusion còn giữ (chờ EMG / điểm lưới kế) vào sink hiện tại."""
+        if self.fusion is not None:
+            self._sink_s = 0.0
+            self.fusion.drain()
+
+    def _emit(self, block):
+        sink = self.sink
+        if sink is None:
+            self.rows_dropped += len(block)
+            return
+        t0 = time.perf_counter()
+        sink(block)
+        dt = time.perf_counter() - t0
+        self.stage_s["sink"] += dt
+        self._sink_s += dt
+
+    def stats(self) -> dict:
+        return {
+            "records": self.records,
+            "rows": self.rows,
+            "rows_dropped": self.rows_dropped,
+            "emg_samples": self.emg_samples,
+            "fused_frames": self.fusion.frames if self.fusion is not None else None,
+            "clocks": self.clock.info() if self.clock is not None else None,
+            "stage_ms": {k: round(v * 1000.0, 3) for k, v in self.stage_s.items()},
+        }
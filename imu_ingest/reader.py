@@ -0,0 +1,321 @@
+import json
+import os
+import threading
+import time
+
+from .pipeline import IngestPipeline
+
+# Từ khoá nhận diện cổng USB-serial khi dò bằng comports()
+PORT_HINTS = ("USB", "ACM", "CP210", "CH340", "UART", "SERIAL")
+
+
+class PortReader:
+    """Stage reader: đọc byte từ 1 cổng serial và đưa vào IngestPipeline của cổng.
+
+    Có `runtime` và cổng có fileno() (POSIX) -> đọc bất đồng bộ: loop asyncio
+    được báo khi có byte (add_reader), không cần thread riêng hay timeout
+    poll. Không thì 1 thread đọc blocking (Windows).
+
+    `sink` (= pipeline.sink) là append_block của session đang gắn cổng;
+    None -> mẫu bị bỏ và đếm vào rows_dropped.
+    """
+
+    def __init__(self, ser, port, baud, persistent=False, runtime=None, pipeline=None):
+        self.ser = ser
+        self.port = port
+        self.baud = baud
+        self.persistent = persistent   # True: giữ cổng mở cả khi không có session
+        self.pipeline = pipeline if pipeline is not None else IngestPipeline()
+
+        self.bytes_in = 0
+        self.read_errors = 0
+        self.opened_at = time.time()
+        self.bytes_per_s = 0.0
+        self.rows_per_s = 0.0
+        self._rate_at = (self.opened_at, 0, 0)
+
+        self.runtime = runtime
+        self._fd = None
+        self._feed_lock = threading.Lock()    # feed (loop/thread đọc) vs drain (thread HTTP)
+        self._stop = threading.Event()
+        self.thread = None
+
+    @property
+    def sink(self):
+        return self.pipeline.sink
+
+    @sink.setter
+    def sink(self, sink):
+        self.pipeline.sink = sink
+
+    @property
+    def mode(self):
+        return "async" if self._fd is not None else "thread"
+
+    @property
+    def alive(self):
+        if self._stop.is_set():
+            return False
+        return self._fd is not None or (self.thread is not None and self.thread.is_alive())
+
+    def start(self):
+        print(f"📥 Đang đọc dữ liệu từ {self.port} @ {self.baud} ...")
+        fd = None
+        if self.runtime is not None:
+            try:
+                fd = self.ser.fileno()
+            except Exception:
+                fd = None
+        if fd is not None:
+            self.ser.timeout = 0          # loop chỉ gọi read khi fd đã sẵn sàng
+            self._fd = fd
+            self.runtime.call_sync(self.runtime.loop.add_reader, fd, self._on_readable)
+        else:
+            self.thread = threading.Thread(target=self._loop, daemon=True, name=f"serial:{self.port}")
+            self.thread.start()
+        return self
+
+    def stop(self):
+        """Dừng đọc rồi đóng port; không phải chờ hết timeout của read (< 10 ms).
+
+        Async: gỡ fd khỏi loop. Thread: huỷ read đang block bằng cancel_read()
+        (pipe abort trên POSIX, CancelIoEx trên Windows), join rồi mới close
+        (tránh ClearCommError / Access denied trên Windows).
+        """
+        self._stop.set()
+        self.sink = None
+        fd, self._fd = self._fd, None
+        if fd is not None:
+            try:
+                self.runtime.call_sync(self.runtime.loop.remove_reader, fd)
+            except Exception:
+                pass
+        thread = self.thread
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            try:
+                self.ser.cancel_read()
+            except Exception:
+                pass
+            thread.join(timeout=0.2)
+        try:
+            self.ser.close()
+        except Exception:
+            pass
+        print(f"🛑 Dừng đọc serial {self.port}")
+
+    def _update_rates(self, now):
+        t0, b0, r0 = self._rate_at
+        dt = now - t0
+        if dt >= 1.0:
+            rows = self.pipeline.rows
+            self.bytes_per_s = (self.bytes_in - b0) / dt
+            self.rows_per_s = (rows - r0) / dt
+            self._rate_at = (now, self.bytes_in, rows)
+
+    def _on_readable(self):
+        """Callback của loop khi fd có dữ liệu."""
+        try:
+            self._on_chunk(self.ser.read(self.ser.in_waiting or 1), time.time())
+        except Exception as e:
+            if self._stop.is_set():
+                return
+            self.read_errors += 1
+            print(f"Serial read error ({self.port}):", e)
+            # cổng bị rút ra: fd báo sẵn sàng nhưng không đọc được -> thôi theo dõi
+            fd, self._fd = self._fd, None
+            if fd is not None:
+                self.runtime.loop.remove_reader(fd)
+
+    def _loop(self):
+        ser = self.ser
+        while not self._stop.is_set():
+            try:
+                self._on_chunk(ser.read(ser.in_waiting or 1), time.time())
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                self.read_errors += 1
+                # nếu port bị rút ra hoặc bị close, thoát vòng lặp
+                msg = str(e)
+                print(f"Serial read error ({self.port}):", e)
+                if "ClearCommError" in msg or "Access is denied" in msg:
+                    break
+
+    def _on_chunk(self, chunk, now):
+        self._update_rates(now)
+        if not chunk:
+            return
+        self.bytes_in += len(chunk)
+        with self._feed_lock:
+            self.pipeline.feed(chunk, now)
+
+    def drain(self):
+        """Đẩy nốt dữ liệu pipeline đang giữ (fusion) vào sink trước khi gỡ sink."""
+        with self._feed_lock:
+            self.pipeline.drain()
+
+    def stats(self) -> dict:
+        self._update_rates(time.time())
+        return {
+            "port": self.port,
+            "baud": self.baud,
+            "alive": self.alive,
+            "mode": self.mode,
+            "bound": self.sink is not None,
+            "persistent": self.persistent,
+            "opened_at": self.opened_at,
+            "bytes_in": self.bytes_in,
+            "bad_frames": getattr(self.pipeline.parser, "bad_frames", None),
+            "read_errors": self.read_errors,
+            "bytes_per_s": round(self.bytes_per_s, 1),
+            "rows_per_s": round(self.rows_per_s, 1),
+            **self.pipeline.stats(),
+        }
+
+
+class PortBinding:
+    """Gắn 1 sink vào PortReader; stop() gỡ sink và trả cổng cho hub."""
+
+    def __init__(self, hub, reader, sink):
+        self.hub = hub
+        self.reader = reader
+        self.sink = sink
+
+    def stop(self):
+        if self.reader.sink is self.sink:
+            # frame fusion còn giữ thuộc về session này: xuất hết rồi mới gỡ sink
+            self.reader.drain()
+            self.reader.sink = None
+        self.hub.release(self.reader.port)
+
+
+class SerialHub:
+    """Quản lý N cổng serial, mỗi cổng 1 PortReader; session gắn vào cổng qua bind()."""
+
+    def __init__(self, serial_module, list_ports=None, baud=115200, runtime=None, linger_s=0.0,
+                 pipeline=IngestPipeline):
+        self.serial = serial_module
+        self.list_ports = list_ports
+        self.runtime = runtime          # AsyncRuntime: đọc cổng bằng event loop thay vì thread
+        self.baud = baud
+        # giữ cổng mở thêm linger_s giây sau khi session dừng: bài tập kế tiếp gắn lại
+        # ngay, không phải mở lại cổng (mở cổng thường reset board qua DTR)
+        self.linger_s = float(linger_s)
+        self.pipeline = pipeline        # () -> IngestPipeline mới cho mỗi cổng
+        self._lock = threading.Lock()
+        self._readers = {}
+        self._close_timers = {}
+
+    def open(self, port, baud=None, persistent=False):
+        """Mở cổng (dùng lại reader còn sống); None nếu không mở được."""
+        baud = baud or self.baud
+        with self._lock:
+            timer = self._close_timers.pop(port, None)
+            if timer is not None:
+                timer.cancel()
+            reader = self._readers.get(port)
+            if reader is not None and reader.alive:
+                reader.persistent = reader.persistent or persistent
+                return reader
+            if reader is not None:
+                reader.stop()       # reader đã chết (rút cáp...) -> đóng hẳn trước khi mở lại
+            try:
+                ser = self.serial.Serial(port, baud, timeout=0.5)
+                # clear buffers
+                try:
+                    ser.reset_input_buffer()
+                    ser.reset_output_buffer()
+                except Exception:
+                    pass
+                print(f"✅ Đã mở {port} @ {baud}")
+            except Exception as e:
+                print(f"❌ Không mở được cổng serial {port}:", e)
+                return None
+            reader = self._readers[port] = PortReader(
+                ser, port, baud, persistent, self.runtime, self.pipeline()).start()
+            return reader
+
+    def close(self, port):
+        with self._lock:
+            timer = self._close_timers.pop(port, None)
+            if timer is not None:
+                timer.cancel()
+            reader = self._readers.pop(port, None)
+        if reader is not None:
+            reader.stop()
+
+    def release(self, port):
+        """Cổng không còn session gắn: đóng ngay, hoặc sau linger_s nếu chưa ai gắn lại."""
+        reader = self._readers.get(port)
+        if reader is None or reader.persistent:
+            return
+        if self.linger_s <= 0:
+            self.close(port)
+            return
+        timer = threading.Timer(self.linger_s, lambda: self._close_idle(port, timer))
+        timer.daemon = True
+        with self._lock:
+            old = self._close_timers.pop(port, None)
+            if old is not None:
+                old.cancel()
+            self._close_timers[port] = timer
+        timer.start()
+
+    def _close_idle(self, port, timer):
+        with self._lock:
+            if self._close_timers.get(port) is not timer:
+                return      # đã được gắn lại / đóng trong lúc chờ
+            del self._close_timers[port]
+            reader = self._readers.get(port)
+            if reader is None or reader.sink is not None or reader.persistent:
+                return
+            del self._readers[port]
+        reader.stop()
+
+    def close_all(self):
+        for port in list(self._readers):
+            self.close(port)
+
+    def bind(self, port, sink, baud=None):
+        """Mở cổng nếu cần rồi gắn sink; trả PortBinding (None nếu không mở được)."""
+        reader = self.open(port, baud)
+        if reader is None:
+            return None
+        reader.sink = sink
+        return PortBinding(self, reader, sink)
+
+    def discover(self, config_path=None):
+        """[(port, baud)] từ file cấu hình (JSON) hoặc env SERIAL_PORTS, không thì dò comports()."""
+        config_path = config_path or os.environ.get("SERIAL_PORTS_FILE")
+        if config_path and os.path.exists(config_path):
+            with open(config_path, "r", encoding="utf-8") as f:
+                items = json.load(f)
+            out = []
+            for item in items:
+                if isinstance(item, dict):
+                    out.append((item["port"], int(item.get("baud") or self.baud)))
+                else:
+                    out.append((str(item), self.baud))
+            return out
+
+        env_ports = [p.strip() for p in os.environ.get("SERIAL_PORTS", "").split(",") if p.strip()]
+        if env_ports:
+            return [(p, self.baud) for p in env_ports]
+
+        if self.list_ports is None:
+            return []
+        return [
+            (p.device, self.baud) for p in self.list_ports.comports()
+            if any(x in (p.description or "").upper() for x in PORT_HINTS)
+        ]
+
+    def open_all(self, config_path=None):
+        """Mở mọi cổng tìm được (giữ mở cả khi chưa có session); trả list cổng đã mở."""
+        opened = []
+        for port, baud in self.discover(config_path):
+            if self.open(port, baud, persistent=True) is not None:
+                opened.append(port)
+        return opened
+
+    def stats(self) -> list:
+        return [r.stats() for r in list(self._readers.values())]
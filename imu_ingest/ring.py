@@ -0,0 +1,85 @@
+class SpscRing:
+    """Ring buffer 1 producer / 1 consumer, không lock.
+
+    Producer (thread đọc thiết bị) chỉ ghi `_tail`, consumer chỉ ghi `_head`;
+    slot được ghi trước rồi mới tăng `_tail` nên consumer không bao giờ thấy
+    slot dở dang. Đầy -> push() trả False và đếm `dropped` (producer không chờ).
+    Consumer peek() rồi commit() sau khi xử lý xong, nên len() == 0 nghĩa là
+    mọi item đã xử lý.
+    """
+
+    __slots__ = ("_slots", "_mask", "_head", "_tail", "dropped")
+
+    def __init__(self, capacity=1024):
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self._slots = [None] * size
+        self._mask = size - 1
+        self._head = 0
+        self._tail = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return self._tail - self._head
+
+    @property
+    def capacity(self):
+        return len(self._slots)
+
+    # ---- producer
+    def push(self, item) -> bool:
+        tail = self._tail
+        if tail - self._head >= len(self._slots):
+            self.dropped += 1
+            return False
+        self._slots[tail & self._mask] = item
+        self._tail = tail + 1
+        return True
+
+    # ---- consumer
+    def peek(self, limit=None) -> list:
+        head, tail = self._head, self._tail
+        if limit is not None:
+            tail = min(tail, head + limit)
+        slots, mask = self._slots, self._mask
+        return [slots[i & mask] for i in range(head, tail)]
+
+    def commit(self, n):
+        head = self._head
+        slots, mask = self._slots, self._mask
+        for i in range(head, head + n):
+            slots[i & mask] = None     # nhả tham chiếu block đã xử lý
+        self._head = head + n
+
+
+class SeqDoubleBuffer:
+    """Double buffer đánh số thứ tự: 1 writer publish(), nhiều reader read() không lock.
+
+    Writer ghi vào slot kia rồi mới tăng `seq`; reader đọc seq -> slot và đọc
+    lại seq để chắc giá trị khớp số thứ tự (writer publish xen giữa -> đọc lại).
+    Giá trị publish phải bất biến sau khi publish.
+    """
+
+    __slots__ = ("_slots", "_seq")
+
+    def __init__(self, value=None):
+        self._slots = [value, value]
+        self._seq = 0
+
+    @property
+    def seq(self):
+        return self._seq
+
+    def publish(self, value):
+        seq = self._seq + 1
+        self._slots[seq & 1] = value
+        self._seq = seq
+
+    def read(self):
+        """(seq, value) của lần publish gần nhất."""
+        while True:
+            seq = self._seq
+            value = self._slots[seq & 1]
+            if self._seq == seq:
+                return seq, value
@@ -0,0 +1,92 @@
+import numpy as np
+
+
+def block_rms(x, window):
+    """RMS cửa sổ trượt (trailing, `window` mẫu) cho cả mảng, vector hoá.
+
+    x: (N,) hoặc (N, C). Các mẫu đầu (chưa đủ cửa sổ) lấy RMS trên số mẫu
+    đang có. Dùng để tính lại emg_rms offline từ cột emg đã lưu.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    if len(x) == 0:
+        return x.copy()
+    flat = x.ndim == 1
+    x2 = x.reshape(len(x), -1)
+    window = max(int(window), 1)
+
+    cs = np.zeros((len(x2) + 1, x2.shape[1]))
+    np.cumsum(x2 * x2, axis=0, out=cs[1:])
+    end = np.arange(1, len(x2) + 1)
+    start = np.maximum(end - window, 0)
+    out = np.sqrt(np.maximum(cs[end] - cs[start], 0.0) / (end - start)[:, None])
+    return out[:, 0] if flat else out
+
+
+class SlidingRms:
+    """RMS cửa sổ trượt O(1)/mẫu cho nhiều kênh: tổng bình phương chạy có bù Kahan,
+    tính lại chính xác từ ring buffer sau mỗi `recompute_every` mẫu (và sau mỗi block).
+    """
+
+    def __init__(self, window=200, channels=1, recompute_every=None):
+        self.window = max(int(window), 1)
+        self.channels = int(channels)
+        self.recompute_every = int(recompute_every or 64 * self.window)
+        self.reset()
+
+    def reset(self):
+        self._sq = np.zeros((self.window, self.channels))    # ring bình phương
+        self._pos = 0
+        self._count = 0
+        self._sum = np.zeros(self.channels)
+        self._comp = np.zeros(self.channels)                 # phần bù Kahan
+        self._since = 0
+
+    def _recompute(self):
+        self._sum = self._sq.sum(axis=0)
+        self._comp[:] = 0.0
+        self._since = 0
+
+    def push(self, x) -> np.ndarray:
+        """Thêm 1 mẫu (scalar hoặc C kênh); trả RMS hiện tại của từng kênh."""
+        sq = np.square(np.asarray(x, dtype=np.float64).reshape(self.channels))
+        delta = sq - self._sq[self._pos]
+        self._sq[self._pos] = sq
+        self._pos = (self._pos + 1) % self.window
+        self._count = min(self._count + 1, self.window)
+
+        # Kahan: sum += delta
+        y = delta - self._comp
+        t = self._sum + y
+        self._comp = (t - self._sum) - y
+        self._sum = t
+
+        self._since += 1
+        if self._since >= self.recompute_every:
+            self._recompute()
+        return np.sqrt(np.maximum(self._sum, 0.0) / self._count)
+
+    def push_block(self, x) -> np.ndarray:
+        """Thêm N mẫu ((N,) hoặc (N, C)); trả RMS sau từng mẫu, shape (N, C)."""
+        x = np.asarray(x, dtype=np.float64).reshape(-1, self.channels)
+        n = len(x)
+        if n == 0:
+            return np.empty((0, self.channels))
+
+        # lịch sử trong ring theo thứ tự thời gian, nối với block mới rồi cumsum
+        hist = np.roll(self._sq, -self._pos, axis=0)[self.window - self._count:]
+        sq = np.concatenate((hist, x * x))
+        cs = np.zeros((len(sq) + 1, self.channels))
+        np.cumsum(sq, axis=0, out=cs[1:])
+        end = np.arange(len(hist) + 1, len(sq) + 1)
+        start = np.maximum(end - self.window, 0)
+        out = np.sqrt(np.maximum(cs[end] - cs[start], 0.0) / (end - start)[:, None])
+
+        # ghi lại ring bằng `window` mẫu cuối
+        tail = sq[-self.window:]
+        k = len(tail)
+        self._sq[:] = 0.0
+        self._sq[:k] = tail
+        self._pos = k % self.window
+        self._count = k
+        self._recompute()
+        return out
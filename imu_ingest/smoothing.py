@@ -0,0 +1,245 @@
+import math
+
+import numpy as np
+
+from .filter import ema_block
+
+try:
+    from scipy.signal import butter, filtfilt, lfilter, lfilter_zi
+except Exception:
+    butter = filtfilt = lfilter = lfilter_zi = None
+
+JOINT_NAMES = ("hip", "knee", "ankle")
+
+
+# =========================
+#   IIR helpers (scipy nếu có, không thì numpy / vòng lặp)
+# =========================
+def butter_lowpass(cutoff_hz, fs_hz, order=2):
+    """Hệ số (b, a) Butterworth thông thấp; không có scipy chỉ hỗ trợ order=2."""
+    wn = cutoff_hz / (fs_hz / 2.0)
+    if not 0.0 < wn < 1.0:
+        raise ValueError(f"cutoff {cutoff_hz} Hz ngoài (0, fs/2) với fs={fs_hz} Hz")
+    if butter is not None:
+        b, a = butter(order, wn)
+        return np.asarray(b, dtype=np.float64), np.asarray(a, dtype=np.float64)
+    if order != 2:
+        raise ValueError("Butterworth order != 2 cần scipy")
+    # bilinear có prewarp, giống scipy.signal.butter(2, wn)
+    k = math.tan(math.pi * cutoff_hz / fs_hz)
+    norm = 1.0 / (1.0 + math.sqrt(2.0) * k + k * k)
+    b0 = k * k * norm
+    b = np.array([b0, 2.0 * b0, b0])
+    a = np.array([1.0, 2.0 * (k * k - 1.0) * norm, (1.0 - math.sqrt(2.0) * k + k * k) * norm])
+    return b, a
+
+
+def steady_state_zi(b, a):
+    """zi sao cho đầu vào hằng 1 cho ra đầu ra hằng (như scipy lfilter_zi)."""
+    if lfilter_zi is not None:
+        return lfilter_zi(b, a)
+    n = len(a)
+    companion = np.zeros((n - 1, n - 1))
+    companion[0] = -a[1:] / a[0]
+    companion[1:, :-1] = np.eye(n - 2)
+    return np.linalg.solve(np.eye(n - 1) - companion.T, b[1:] - a[1:] * b[0])
+
+
+def lfilter_block(b, a, x, zi):
+    """lfilter dạng direct form II transposed, mang zi sang block sau; trả (y, zi)."""
+    if lfilter is not None:
+        return lfilter(b, a, x, zi=zi)
+    z = list(zi)
+    b, a = b.tolist(), a.tolist()
+    n = len(z)
+    y = np.empty(len(x))
+    for i, v in enumerate(np.asarray(x, dtype=np.float64).tolist()):
+        out = b[0] * v + z[0]
+        for j in range(n - 1):
+            z[j] = b[j + 1] * v + z[j + 1] - a[j + 1] * out
+        z[n - 1] = b[n] * v - a[n] * out
+        y[i] = out
+    return y, np.array(z)
+
+
+def zero_phase_lowpass(x, cutoff_hz, fs_hz, order=2):
+    """Butterworth 2 chiều (không trễ pha) cho dữ liệu offline; block ngắn trả nguyên."""
+    x = np.asarray(x, dtype=np.float64)
+    b, a = butter_lowpass(cutoff_hz, fs_hz, order)
+    pad = 3 * max(len(a), len(b))
+    if len(x) <= pad:
+        return x.copy()
+    if filtfilt is not None:
+        return filtfilt(b, a, x, padlen=pad)
+    # như filtfilt: kéo dài lẻ 2 đầu, chạy xuôi rồi ngược với zi trạng thái dừng
+    ext = np.concatenate((2 * x[0] - x[pad:0:-1], x, 2 * x[-1] - x[-2:-pad - 2:-1]))
+    zi = steady_state_zi(b, a)
+    y, _ = lfilter_block(b, a, ext, zi * ext[0])
+    y, _ = lfilter_block(b, a, y[::-1], zi * y[-1])
+    return y[::-1][pad:-pad]
+
+
+# =========================
+#   Bộ lọc 1 kênh (state riêng, block hoặc từng mẫu)
+# =========================
+class EmaFilter:
+    """EMA y = y_prev*(1-a) + x*a; mẫu đầu lấy nguyên."""
+
+    __slots__ = ("alpha", "y")
+
+    def __init__(self, alpha=0.3):
+        self.alpha = float(alpha)
+        self.y = None
+
+    def reset(self):
+        self.y = None
+
+    def step(self, x, t_ms=None):
+        y = x if self.y is None else self.y + self.alpha * (x - self.y)
+        self.y = y
+        return y
+
+    def block(self, x, t_ms=None):
+        y, self.y = ema_block(x, self.y, self.alpha)
+        return y
+
+
+class OneEuroFilter:
+    """One-Euro (Casiez 2012): cutoff tăng theo tốc độ -> ít trễ khi chuyển động, mượt khi đứng yên.
+
+    min_cutoff (Hz) chỉnh độ mượt lúc chậm, beta chỉnh độ trễ lúc nhanh;
+    dt lấy từ t_ms, thiếu thì dùng dt_s.
+    """
+
+    __slots__ = ("min_cutoff", "beta", "d_cutoff", "dt_s", "x_prev", "dx_prev", "t_prev")
+
+    def __init__(self, min_cutoff=1.0, beta=0.02, d_cutoff=1.0, dt_s=0.01):
+        self.min_cutoff = float(min_cutoff)
+        self.beta = float(beta)
+        self.d_cutoff = float(d_cutoff)
+        self.dt_s = float(dt_s)
+        self.reset()
+
+    def reset(self):
+        self.x_prev = None
+        self.dx_prev = 0.0
+        self.t_prev = None
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2.0 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def step(self, x, t_ms=None):
+        x_prev = self.x_prev
+        if x_prev is None:
+            self.x_prev, self.t_prev = x, t_ms
+            return x
+        if t_ms is None or self.t_prev is None:
+            dt = self.dt_s
+        else:
+            dt = max((t_ms - self.t_prev) / 1000.0, 1e-6)
+
+        dx = (x - x_prev) / dt
+        a_d = self._alpha(self.d_cutoff, dt)
+        dx_hat = self.dx_prev + a_d * (dx - self.dx_prev)
+        a = self._alpha(self.min_cutoff + self.beta * abs(dx_hat), dt)
+        y = x_prev + a * (x - x_prev)
+
+        self.x_prev, self.dx_prev, self.t_prev = y, dx_hat, t_ms
+        return y
+
+    def block(self, x, t_ms=None):
+        step = self.step
+        y = np.empty(len(x))
+        if t_ms is None:
+            for i, v in enumerate(x.tolist()):
+                y[i] = step(v)
+        else:
+            for i, (v, t) in enumerate(zip(x.tolist(), np.asarray(t_ms).tolist())):
+                y[i] = step(v, t)
+        return y
+
+
+class ButterworthFilter:
+    """Butterworth thông thấp nhân quả (live), zi mang qua từng block.
+
+    zi khởi tạo ở trạng thái dừng theo mẫu đầu nên không có quá độ lúc bắt đầu.
+    Cho chart offline dùng zero_phase_lowpass() (không trễ pha).
+    """
+
+    __slots__ = ("b", "a", "zi", "_zi1")
+
+    def __init__(self, cutoff_hz=6.0, fs_hz=100.0, order=2):
+        self.b, self.a = butter_lowpass(cutoff_hz, fs_hz, order)
+        self._zi1 = steady_state_zi(self.b, self.a)
+        self.zi = None
+
+    def reset(self):
+        self.zi = None
+
+    def step(self, x, t_ms=None):
+        return float(self.block(np.array([x]))[0])
+
+    def block(self, x, t_ms=None):
+        if len(x) == 0:
+            return np.asarray(x, dtype=np.float64).copy()
+        if self.zi is None:
+            self.zi = self._zi1 * float(x[0])
+        y, self.zi = lfilter_block(self.b, self.a, x, self.zi)
+        return y
+
+
+FILTERS = {
+    "ema": EmaFilter,
+    "one_euro": OneEuroFilter,
+    "butter": ButterworthFilter,
+}
+
+
+class FilterChain:
+    """Các bộ lọc nối tiếp trên 1 kênh, spec dạng "butter+one_euro"."""
+
+    __slots__ = ("filters",)
+
+    def __init__(self, spec="ema", params=None):
+        params = params or {}
+        names = [s.strip() for s in spec.split("+") if s.strip()]
+        unknown = [n for n in names if n not in FILTERS]
+        if unknown:
+            raise ValueError(f"bộ lọc không hỗ trợ: {unknown} (có: {sorted(FILTERS)})")
+        self.filters = tuple(FILTERS[n](**params.get(n, {})) for n in names)
+
+    def reset(self):
+        for f in self.filters:
+            f.reset()
+
+    def step(self, x, t_ms=None):
+        for f in self.filters:
+            x = f.step(x, t_ms)
+        return x
+
+    def block(self, x, t_ms=None):
+        for f in self.filters:
+            x = f.block(x, t_ms)
+        return x
+
+
+class JointFilters:
+    """1 FilterChain / khớp (hip, knee, ankle), state độc lập cho 1 nguồn dữ liệu."""
+
+    __slots__ = ("spec", "chains")
+
+    def __init__(self, spec="ema", params=None, joints=JOINT_NAMES):
+        self.spec = spec
+        self.chains = {j: FilterChain(spec, params) for j in joints}
+
+    def reset(self):
+        for chain in self.chains.values():
+            chain.reset()
+
+    def step(self, joint, x, t_ms=None):
+        return self.chains[joint].step(x, t_ms)
+
+    def block(self, joint, x, t_ms=None):
+        return self.chains[joint].block(x, t_ms)
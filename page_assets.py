@@ -0,0 +1,75 @@
+import hashlib
+import re
+
+from flask import Response, abort, request
+from jinja2 import ChoiceLoader, DictLoader
+
+# <script>/<style> inline; bỏ qua thẻ đã có src và các script không phải JS (importmap, json...)
+_BLOCK_RE = re.compile(r"<(script|style)\b([^>]*)>(.*?)</\1\s*>", re.S | re.I)
+_SRC_RE = re.compile(r"\bsrc\s*=", re.I)
+_TYPE_RE = re.compile(r"""\btype\s*=\s*["']?([\w/+.-]+)""", re.I)
+_JS_TYPES = ("", "text/javascript", "application/javascript", "module")
+_JINJA_MARKS = ("{{", "{%", "{#")
+
+MIN_ASSET_BYTES = 512
+ASSET_MIMETYPES = {"js": "text/javascript", "css": "text/css"}
+
+
+class PageAssets:
+    """Template HTML nội tuyến đăng ký 1 lần vào Jinja loader (compile + cache
+    bởi Jinja), CSS/JS tĩnh được tách ra thành file /assets/<tên>.<hash>.<ext>.
+
+    Chỉ tách các khối không chứa cú pháp Jinja, nên HTML render ra giống hệt
+    trước; tên file chứa hash nội dung nên trình duyệt cache vĩnh viễn và
+    hỏi lại bằng ETag/If-None-Match.
+    """
+
+    def __init__(self, url_prefix="/assets", min_bytes=MIN_ASSET_BYTES):
+        self.url_prefix = url_prefix.rstrip("/")
+        self.min_bytes = min_bytes
+        self.templates = {}
+        self.assets = {}    # filename -> (body bytes, mimetype, etag)
+        self.loader = DictLoader(self.templates)
+
+    def register(self, name: str, html: str):
+        self.templates[name] = self._split(name.rsplit(".", 1)[0], html)
+
+    def _split(self, stem, html):
+        def repl(m):
+            tag, attrs, body = m.group(1).lower(), m.group(2), m.group(3)
+            if len(body) < self.min_bytes or any(k in body for k in _JINJA_MARKS):
+                return m.group(0)
+            if tag == "script":
+                kind = _TYPE_RE.search(attrs)
+                if _SRC_RE.search(attrs) or (kind and kind.group(1).lower() not in _JS_TYPES):
+                    return m.group(0)
+
+            ext = "js" if tag == "script" else "css"
+            data = body.encode("utf-8")
+            etag = hashlib.sha1(data).hexdigest()[:16]
+            filename = f"{stem}.{etag}.{ext}"
+            self.assets[filename] = (data, ASSET_MIMETYPES[ext], etag)
+
+            url = f"{self.url_prefix}/{filename}"
+            if tag == "style":
+                return f'<link rel="stylesheet" href="{url}"{attrs}>'
+            return f'<script{attrs} src="{url}"></script>'
+
+        return _BLOCK_RE.sub(repl, html)
+
+    def serve(self, filename):
+        asset = self.assets.get(filename)
+        if asset is None:
+            abort(404)
+        data, mimetype, etag = asset
+        resp = Response(data, mimetype=mimetype)
+        resp.set_etag(etag)
+        resp.cache_control.public = True
+        resp.cache_control.max_age = 31536000
+        resp.cache_control.immutable = True
+        return resp.make_conditional(request)
+
+    def install(self, app):
+        """Gắn loader (ưu tiên template đã đăng ký) + route phục vụ asset."""
+        app.jinja_env.loader = ChoiceLoader([self.loader, app.jinja_env.loader])
+        app.add_url_rule(f"{self.url_prefix}/<path:filename>", "page_asset", self.serve)
@@ -0,0 +1,85 @@
+import json
+import os
+import re
+import time
+
+import numpy as np
+
+from session_store import SESSION_COLUMNS, SessionSnapshot
+
+# Mỗi phiên = <id>.npy (mảng cột 7 x N float64, mở bằng mmap) + <id>.json (metadata)
+SESSION_DIR = "sessions"
+ARCHIVE_VERSION = 1
+
+_ID_RE = re.compile(r"^[\w\-]+$")
+
+
+def _paths(session_id: str):
+    if not _ID_RE.match(session_id or ""):
+        raise ValueError(f"invalid session id: {session_id!r}")
+    base = os.path.join(SESSION_DIR, session_id)
+    return base + ".npy", base + ".json"
+
+
+def save_session(session_id: str, snap: SessionSnapshot, meta: dict) -> dict:
+    """Ghi snapshot + metadata ra SESSION_DIR (ghi file tạm rồi đổi tên)."""
+    os.makedirs(SESSION_DIR, exist_ok=True)
+    data_path, meta_path = _paths(session_id)
+
+    snap = snap.sorted()
+    t = snap.t_ms
+    meta = {
+        **meta,
+        "session_id": session_id,
+        "version": ARCHIVE_VERSION,
+        "columns": list(SESSION_COLUMNS),
+        "n_samples": len(snap),
+        "t_start_ms": float(t[0]) if len(t) else None,
+        "t_end_ms": float(t[-1]) if len(t) else None,
+        "saved_at_ts": time.time(),
+    }
+
+    with open(data_path + ".tmp", "wb") as f:
+        np.save(f, np.ascontiguousarray(snap.data))
+    os.replace(data_path + ".tmp", data_path)
+
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(meta_path + ".tmp", meta_path)
+    return meta
+
+
+def load_meta(session_id: str) -> dict:
+    _, meta_path = _paths(session_id)
+    with open(meta_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_session(session_id: str):
+    """Trả (SessionSnapshot memory-mapped, meta); dữ liệu chỉ đọc từ disk khi dùng tới."""
+    data_path, _ = _paths(session_id)
+    meta = load_meta(session_id)
+    data = np.load(data_path, mmap_mode="r")
+    if data.ndim != 2 or data.shape[0] != len(SESSION_COLUMNS):
+        raise ValueError(f"unexpected archive shape {data.shape}")
+    return SessionSnapshot(data), meta
+
+
+def list_sessions(patient_code: str = None) -> list:
+    """Metadata các phiên đã lưu (mới nhất trước), lọc theo patient_code nếu có."""
+    if not os.path.isdir(SESSION_DIR):
+        return []
+
+    out = []
+    for name in os.listdir(SESSION_DIR):
+        if not name.endswith(".json"):
+            continue
+        try:
+            meta = load_meta(name[:-5])
+        except Exception:
+            continue
+        if patient_code and meta.get("patient_code") != patient_code:
+            continue
+        out.append(meta)
+    out.sort(key=lambda m: m.get("saved_at_ts", 0), reverse=True)
+    return out
@@ -0,0 +1,295 @@
+import threading
+import time
+
+import numpy as np
+
+from imu_ingest.filter import process_block
+from imu_ingest.fusion import COL_EMG
+from imu_ingest.ring import SeqDoubleBuffer, SpscRing
+from session_store import SessionBuffer, SessionSnapshot
+
+
+class MeasureSession:
+    """State của 1 rig đo: buffer, trạng thái lọc, max góc, thiết bị gắn kèm và room Socket.IO.
+
+    Thread đọc thiết bị (producer) chỉ đẩy block vào SpscRing của nguồn
+    tương ứng qua append_block(), không lock và không chờ. 1 consumer
+    (SessionWorker) gọi process_pending(): lọc, ghi buffer, emit, rồi publish
+    snapshot vào SeqDoubleBuffer để HTTP đọc không lock. `lock` chỉ còn
+    giữa consumer và các thao tác vòng đời (begin/finish/reset_max).
+    """
+
+    SOURCES = ("serial", "http")
+    RING_SIZE = 1024    # block / nguồn (~10 s serial ở 100 block/s)
+
+    def __init__(self, key, broadcaster, filter_params, make_filters, owner=None, wake=None):
+        self.key = key
+        self.room = room_for(key)
+        self.owner = owner
+        self.broadcaster = broadcaster
+        # dict cross_th/pitch_mid/pitch_hys/deadzone/signed_hip (tuple nguồn có hip đã mang dấu)
+        # -> tham số process_block theo nguồn
+        params = dict(filter_params)
+        signed = params.pop("signed_hip", ())
+        self.filter_params = {source: {**params, "signed_hip": source in signed} for source in self.SOURCES}
+        self.make_filters = make_filters       # () -> JointFilters
+        self.wake = wake                       # báo consumer có dữ liệu; None -> xử lý ngay tại chỗ
+
+        self.lock = threading.Lock()
+        self.buffer = SessionBuffer()
+        self.last = SessionSnapshot.empty()    # snapshot phiên vừa dừng (không copy)
+        self.max_angles = {"hip": 0.0, "knee": 0.0, "ankle": 0.0}
+        self.published = SeqDoubleBuffer((SessionSnapshot.empty(), dict(self.max_angles)))
+
+        # serial: 1 reader / session -> SPSC thật; http: nhiều thread request -> lock phía producer
+        self.rings = {source: SpscRing(self.RING_SIZE) for source in self.SOURCES}
+        self._producer_locks = {"http": threading.Lock()}
+
+        self.hip_mode = "front"
+        # state làm mượt riêng theo nguồn ("serial", "http"): 2 luồng không trộn vào nhau
+        self.filters = {}
+
+        self.reader = None      # thiết bị đang gắn (có .stop())
+        self.device = None
+        self.started_at = None
+        self.last_data_at = None
+
+    # ---- vòng đời phiên
+    def begin(self):
+        with self.lock:
+            self.buffer.clear()
+            self._reset_max()
+            self.filters.clear()
+            self._publish()
+        self.started_at = time.time()
+
+    def finish(self) -> SessionSnapshot:
+        """Dừng thiết bị (reader xả nốt frame fusion vào ring), chờ consumer xử lý hết ring,
+        giữ snapshot phiên vừa đo vào self.last."""
+        self.detach()
+        self.flush()
+        with self.lock:
+            self.last = self.buffer.snapshot()
+            self.buffer.clear()
+            self._publish()
+        self.started_at = None
+        return self.last
+
+    def snapshot(self) -> SessionSnapshot:
+        """Phiên vừa dừng nếu có, không thì bản publish gần nhất của dữ liệu đang đo (không lock)."""
+        last = self.last
+        if len(last):
+            return last
+        _, (snap, _) = self.published.read()
+        return snap
+
+    def flush(self, timeout=1.0) -> bool:
+        """Chờ consumer xử lý hết các block đã nhận; False nếu quá timeout."""
+        deadline = time.monotonic() + timeout
+        while any(len(ring) for ring in self.rings.values()):
+            if time.monotonic() >= deadline:
+                return False
+            self._notify()
+            time.sleep(0.001)
+        return True
+
+    # ---- thiết bị
+    def attach(self, reader, device):
+        self.detach()
+        self.reader, self.device = reader, device
+
+    def detach(self):
+        reader, self.reader, self.device = self.reader, None, None
+        if reader is not None:
+            reader.stop()
+
+    # ---- dữ liệu
+    def _reset_max(self):
+        for k in self.max_angles:
+            self.max_angles[k] = 0.0
+
+    def reset_max(self):
+        with self.lock:
+            self._reset_max()
+            self._publish()
+
+    def _publish(self):
+        """Gọi khi giữ self.lock: snapshot (view không copy) + max góc cho HTTP."""
+        self.published.publish((self.buffer.snapshot(), dict(self.max_angles)))
+
+    def _notify(self):
+        if self.wake is not None:
+            self.wake()
+        else:
+            self.process_pending()
+
+    def append_block(self, block, source="serial"):
+        """Producer: đưa block (N x 5, hoặc N x 8 kèm EMG sau fusion) vào ring của `source`.
+
+        Không lock (serial) và không chờ consumer; ring đầy -> bỏ block, đếm vào dropped.
+        """
+        if len(block) == 0:
+            return
+        ring = self.rings[source]
+        lock = self._producer_locks.get(source)
+        if lock is None:
+            ring.push(block)
+        else:
+            with lock:
+                ring.push(block)
+        self._notify()
+
+    def process_pending(self):
+        """Consumer: xử lý mọi block đang chờ, publish snapshot rồi mới nhả slot ring."""
+        for source, ring in self.rings.items():
+            blocks = ring.peek()
+            if not blocks:
+                continue
+            try:
+                for block in blocks:
+                    self._process(block, source)
+            finally:
+                # block lỗi cũng nhả khỏi ring, không xử lý lại vô hạn
+                with self.lock:
+                    self._publish()
+                ring.commit(len(blocks))
+
+    def _process(self, block, source):
+        """Xử lý hip/knee/ankle cho cả block, lưu buffer, đẩy sang broadcaster.
+        `source` chọn state bộ lọc."""
+        emg = block[:, COL_EMG:].T if block.shape[1] > COL_EMG else ()
+        with self.lock:
+            filters = self.filters.get(source)
+            if filters is None:
+                filters = self.filters[source] = self.make_filters()
+            t, hip, knee, ankle, self.hip_mode = process_block(
+                block, self.hip_mode, filters, **self.filter_params[source]
+            )
+            self.buffer.append(t, hip, knee, ankle, *emg)
+
+            m = self.max_angles
+            m["hip"] = max(m["hip"], float(hip.max()))
+            m["knee"] = max(m["knee"], float(knee.max()))
+            m["ankle"] = max(m["ankle"], float(ankle.max()))
+            max_payload = {"maxHip": m["hip"], "maxKnee": m["knee"], "maxAnkle": m["ankle"]}
+        self.last_data_at = time.time()
+
+        latest = {"t": float(t[-1]), "hip": float(hip[-1]), "knee": float(knee[-1]),
+                  "ankle": float(ankle[-1]), **max_payload}
+        if len(emg) and not np.isnan(emg[1][-1]):
+            latest["emg_rms"] = float(emg[1][-1])
+            latest["emg_env"] = float(emg[2][-1])
+
+        t, hip, knee, ankle = t.tolist(), hip.tolist(), knee.tolist(), ankle.tolist()
+        self.broadcaster.push(latest, [list(r) for r in zip(t, hip, knee, ankle)])
+
+    def info(self) -> dict:
+        return {
+            "rig": self.key,
+            "owner": self.owner,
+            "device": self.device,
+            "running": self.started_at is not None,
+            "started_at": self.started_at,
+            "last_data_at": self.last_data_at,
+            "n_samples": len(self.published.read()[1][0]),
+            "n_last": len(self.last),
+            "seq": self.published.seq,
+            "pending": {source: len(ring) for source, ring in self.rings.items()},
+            "dropped": {source: ring.dropped for source, ring in self.rings.items()},
+        }
+
+
+def room_for(key: str) -> str:
+    return f"rig:{key}"
+
+
+class SessionWorker:
+    """Consumer duy nhất cho mọi session: chờ wake(), rút ring từng session.
+
+    Xử lý (lọc, ghi buffer, đẩy broadcaster) chạy trên thread này nên thread
+    đọc thiết bị không bao giờ chờ lock mà request HTTP đang giữ.
+    """
+
+    def __init__(self, sessions, idle_s=0.5):
+        self._sessions = sessions       # callable -> list MeasureSession
+        self.idle_s = idle_s
+        self._wake = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+
+    def wake(self):
+        self._wake.set()
+        if self._thread is None:
+            self.start()
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="session-worker", daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        while True:
+            self._wake.wait(self.idle_s)
+            self._wake.clear()
+            for sess in self._sessions():
+                try:
+                    sess.process_pending()
+                except Exception as e:
+                    print("[WARN] session worker", sess.key, e)
+            self.batches += 1
+
+
+class SessionManager:
+    """Danh sách MeasureSession theo key (rig); mỗi thiết bị chỉ gắn với 1 session."""
+
+    def __init__(self, broadcaster_factory, filter_params, filter_factory):
+        self._broadcaster_factory = broadcaster_factory   # room -> ImuBroadcaster
+        self._filter_params = filter_params               # callable -> dict
+        self._filter_factory = filter_factory             # callable -> JointFilters
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._devices = {}     # device -> key
+        self.worker = SessionWorker(lambda: list(self._sessions.values()))
+
+    def get(self, key):
+        return self._sessions.get(key)
+
+    def get_or_create(self, key, owner=None) -> MeasureSession:
+        with self._lock:
+            sess = self._sessions.get(key)
+            if sess is None:
+                sess = MeasureSession(key, self._broadcaster_factory(room_for(key)),
+                                      self._filter_params(), self._filter_factory,
+                                      owner=owner, wake=self.worker.wake)
+                self._sessions[key] = sess
+            return sess
+
+    def active(self):
+        """Session bắt đầu gần nhất còn đang chạy (cho dữ liệu không ghi rõ rig)."""
+        running = [s for s in list(self._sessions.values()) if s.started_at is not None]
+        return max(running, key=lambda s: s.started_at) if running else None
+
+    def device_owner(self, device):
+        """Key của session đang giữ thiết bị (None nếu rảnh)."""
+        with self._lock:
+            key = self._devices.get(device)
+            sess = self._sessions.get(key)
+            if sess is None or sess.device != device:
+                self._devices.pop(device, None)
+                return None
+            return key
+
+    def bind_device(self, sess: MeasureSession, device, reader) -> bool:
+        """Gắn thiết bị cho session; False nếu thiết bị đang thuộc session khác."""
+        owner = self.device_owner(device)
+        if owner is not None and owner != sess.key:
+            return False
+        sess.attach(reader, device)
+        with self._lock:
+            self._devices[device] = sess.key
+        return True
+
+    def sessions(self) -> list:
+        return [s.info() for s in list(self._sessions.values())]
@@ -0,0 +1,199 @@
+import numpy as np
+
+import downsample
+from imu_ingest.filter import ema_block
+from imu_ingest.sliding_rms import block_rms
+from imu_ingest.smoothing import zero_phase_lowpass
+
+SESSION_COLUMNS = ("t_ms", "hip", "knee", "ankle", "emg", "emg_rms", "emg_env")
+EMG_COLUMNS = ("emg", "emg_rms", "emg_env")
+
+
+class SessionSnapshot:
+    """View read-only (không copy) lên các cột của 1 phiên đo."""
+
+    __slots__ = ("_data",) + SESSION_COLUMNS
+
+    def __init__(self, data):
+        data = data.view()
+        data.flags.writeable = False
+        self._data = data
+        for i, name in enumerate(SESSION_COLUMNS):
+            setattr(self, name, data[i])
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty((len(SESSION_COLUMNS), 0)))
+
+    def __len__(self):
+        return self._data.shape[1]
+
+    @property
+    def data(self):
+        """Mảng 2 chiều (cột x mẫu), thứ tự theo SESSION_COLUMNS."""
+        return self._data
+
+    def column(self, name):
+        return getattr(self, name)
+
+    def sorted(self):
+        """Snapshot theo thứ tự t_ms; không copy nếu đã tăng dần."""
+        t = self.t_ms
+        if len(t) < 2 or bool(np.all(t[1:] >= t[:-1])):
+            return self
+        return SessionSnapshot(self._data[:, np.argsort(t, kind="stable")])
+
+    @property
+    def missing_emg_rms(self) -> bool:
+        """Có cột emg nhưng chưa có emg_rms (phiên cũ / nhập ngoài serial)."""
+        return bool(np.isnan(self.emg_rms).all() and not np.isnan(self.emg).all())
+
+    def with_emg_rms(self, window_ms, alpha):
+        """Snapshot mới với emg_rms/emg_env tính lại từ cột emg (RMS trượt window_ms + EMA alpha).
+
+        Snapshot phải đã sorted; mẫu không có EMG giữ NaN.
+        """
+        emg = self.emg
+        ok = ~np.isnan(emg)
+        data = np.array(self._data)
+        if not ok.any():
+            return SessionSnapshot(data)
+
+        t = self.t_ms[ok]
+        dt = float(np.median(np.diff(t))) if len(t) > 1 else 1.0
+        rms = block_rms(emg[ok], max(int(round(window_ms / max(dt, 1e-6))), 1))
+        env, _ = ema_block(rms, None, alpha)
+
+        i_rms, i_env = SESSION_COLUMNS.index("emg_rms"), SESSION_COLUMNS.index("emg_env")
+        data[i_rms:i_env + 1] = np.nan
+        data[i_rms, ok] = rms
+        data[i_env, ok] = env
+        return SessionSnapshot(data)
+
+    def with_lowpass(self, cutoff_hz, order=2):
+        """Snapshot mới với hip/knee/ankle lọc Butterworth 2 chiều (không trễ pha).
+
+        Snapshot phải đã sorted; fs lấy theo trung vị khoảng cách t_ms.
+        """
+        data = np.array(self._data)
+        t = self.t_ms
+        if len(t) < 2:
+            return SessionSnapshot(data)
+        fs_hz = 1000.0 / max(float(np.median(np.diff(t))), 1e-6)
+        for name in ("hip", "knee", "ankle"):
+            i = SESSION_COLUMNS.index(name)
+            data[i] = zero_phase_lowpass(data[i], cutoff_hz, fs_hz, order)
+        return SessionSnapshot(data)
+
+    @property
+    def duration_s(self) -> float:
+        t = self.t_ms
+        return float(t.max() - t.min()) / 1000.0 if len(t) else 0.0
+
+    def time_range(self, t_from=None, t_to=None):
+        """(lo, hi) chỉ số mẫu trong [t_from, t_to) giây tính từ mẫu đầu (snapshot đã sorted)."""
+        t = self.t_ms
+        if not len(t):
+            return 0, 0
+        lo = 0 if t_from is None else int(np.searchsorted(t, t[0] + t_from * 1000.0, "left"))
+        hi = len(t) if t_to is None else int(np.searchsorted(t, t[0] + t_to * 1000.0, "left"))
+        return lo, max(hi, lo)
+
+    def chart_arrays(self, max_points=None, t_from=None, t_to=None, method="lttb") -> dict:
+        """Dict ndarray cho chart: t_ms (giây, từ mẫu đầu) + góc + EMG (NaN -> 0).
+
+        t_from/t_to (giây, nửa mở [t_from, t_to)) cắt khung nhìn; nếu khung có
+        nhiều hơn max_points mẫu thì downsample (LTTB/min-max) theo các cột có dữ liệu.
+        """
+        snap = self.sorted()
+        if not len(snap):
+            return {name: np.empty(0) for name in SESSION_COLUMNS}
+
+        t = snap.t_ms
+        t0 = t[0]
+        lo, hi = snap.time_range(t_from, t_to)
+
+        cols = {}
+        for name in SESSION_COLUMNS[1:]:
+            col = snap.column(name)[lo:hi]
+            if name in EMG_COLUMNS:
+                col = np.nan_to_num(col, nan=0.0)
+            cols[name] = col
+        t = t[lo:hi]
+
+        if max_points and len(t) > max_points:
+            drivers = [cols[name] for name in SESSION_COLUMNS[1:]
+                       if name not in EMG_COLUMNS or np.any(cols[name])]
+            keep = downsample.select_indices(t, drivers, max_points, method)
+            t = t[keep]
+            cols = {name: col[keep] for name, col in cols.items()}
+
+        return {"t_ms": np.round((t - t0) / 1000.0, 3), **cols}
+
+    def chart_series(self, max_points=None, t_from=None, t_to=None, method="lttb") -> dict:
+        """Như chart_arrays nhưng trả list (cho tojson/jsonify)."""
+        arrays = self.chart_arrays(max_points, t_from, t_to, method)
+        return {name: col.tolist() for name, col in arrays.items()}
+
+
+class SessionBuffer:
+    """Buffer cột (float64) cho phiên đang đo; tự nới dung lượng x2 khi đầy.
+
+    ~56 byte/mẫu (7 cột). snapshot() trả view không copy; clear() cấp
+    mảng mới nên các snapshot cũ không bao giờ bị ghi đè.
+    """
+
+    __slots__ = ("_data", "_n", "_initial")
+
+    def __init__(self, capacity=4096):
+        self._initial = max(int(capacity), 16)
+        self._data = self._alloc(self._initial)
+        self._n = 0
+
+    @staticmethod
+    def _alloc(capacity):
+        data = np.empty((len(SESSION_COLUMNS), capacity))
+        data[SESSION_COLUMNS.index("emg"):] = np.nan  # EMG mặc định "không có"
+        return data
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def capacity(self):
+        return self._data.shape[1]
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes
+
+    def _reserve(self, extra):
+        need = self._n + extra
+        cap = self.capacity
+        if need <= cap:
+            return
+        while cap < need:
+            cap *= 2
+        data = self._alloc(cap)
+        data[:, :self._n] = self._data[:, :self._n]
+        self._data = data
+
+    def append(self, t_ms, hip, knee, ankle, emg=None, emg_rms=None, emg_env=None):
+        """Ghi 1 block mẫu (array/list cùng độ dài); cột EMG thiếu để NaN."""
+        n = len(t_ms)
+        if n == 0:
+            return
+        self._reserve(n)
+        lo, hi = self._n, self._n + n
+        cols = (t_ms, hip, knee, ankle, emg, emg_rms, emg_env)
+        for i, col in enumerate(cols):
+            if col is not None:
+                self._data[i, lo:hi] = col
+        self._n = hi
+
+    def clear(self):
+        self._data = self._alloc(self._initial)
+        self._n = 0
+
+    def snapshot(self) -> SessionSnapshot:
+        return SessionSnapshot(self._data[:, :self._n])
@@ -0,0 +1,37 @@
+// Tải series phiên đo từ /api/session/<id>/series (float32 little-endian, các cột nối tiếp)
+(function(){
+  async function fetchSeries(url, params){
+    const q = new URLSearchParams(Object.assign({ format: "bin" }, params || {}));
+    const res = await fetch(url + (url.includes("?") ? "&" : "?") + q.toString(),
+                            { credentials: "same-origin" });
+    if (!res.ok) throw new Error("series HTTP " + res.status);
+
+    const columns = (res.headers.get("X-Series-Columns") || "").split(",").filter(Boolean);
+    const n = parseInt(res.headers.get("X-Series-Length") || "0", 10);
+    const view = new DataView(await res.arrayBuffer());
+
+    const out = { _length: n, _samples: parseInt(res.headers.get("X-Series-Samples") || "0", 10) };
+    columns.forEach((name, c) => {
+      const arr = new Array(n);
+      const base = c * n * 4;
+      for (let i = 0; i < n; i++) arr[i] = view.getFloat32(base + i * 4, true);
+      out[name] = arr;
+    });
+    // float32 -> làm tròn t về ms cho nhãn trục x gọn
+    if (out.t_ms) out.t_ms = out.t_ms.map(v => Math.round(v * 1000) / 1000);
+    return out;
+  }
+
+  // Tải bản thô (ít điểm) trước để vẽ ngay, sau đó bản chi tiết; onData gọi sau mỗi bước
+  async function loadProgressive(url, steps, onData, params){
+    for (const points of steps){
+      let s;
+      try { s = await fetchSeries(url, Object.assign({}, params, { points })); }
+      catch (e) { console.warn("[series]", e); return; }
+      onData(s);
+      if (s._length >= s._samples) return;   // đã đủ toàn bộ mẫu
+    }
+  }
+
+  window.SessionSeries = { fetch: fetchSeries, progressive: loadProgressive };
+})();
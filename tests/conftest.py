@@ -0,0 +1,17 @@
+import os
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def web(tmp_path_factory):
+    """webgiaodien chạy trong thư mục tạm (db, journal, sessions/ ghi theo cwd)."""
+    pytest.importorskip("flask")
+    pytest.importorskip("socketio")
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("web"))
+    try:
+        import webgiaodien
+        yield webgiaodien
+    finally:
+        os.chdir(cwd)
@@ -0,0 +1,20 @@
+"""/api/imu gửi hiệu roll: hip luôn qua heuristic dấu theo pitch2, kể cả khi serial dùng quat solver."""
+import pytest
+
+
+@pytest.mark.parametrize("kinematics", ["quat", "roll"])
+def test_api_imu_hip_uses_pitch2_sign(web, monkeypatch, kinematics):
+    monkeypatch.setattr(web, "KINEMATICS", kinematics)
+    rig = f"api-imu-{kinematics}"
+    client = web.app.test_client()
+
+    # p2 - p1 = -30, pitch2 mặc định 0 (mode "front"): như bản gốc, hip = +30
+    r = client.post("/api/imu", json={"rig": rig, "p1": 0, "p2": -30, "p3": 0, "p4": 60, "t_ms": 1000})
+    assert r.get_json() == {"ok": True}
+    sess = web.SESSIONS.get(rig)
+    assert sess.flush()
+    snap = sess.snapshot()
+    assert snap.hip.tolist() == [30.0]
+
+    assert sess.filter_params["http"]["signed_hip"] is False
+    assert sess.filter_params["serial"]["signed_hip"] is (kinematics == "quat")
@@ -0,0 +1,18 @@
+"""/api/patients: không limit trả đủ (client cũ lọc tại chỗ), có limit/offset/q thì phân trang theo tên."""
+
+
+def test_api_patients_paging(web, monkeypatch):
+    monkeypatch.setitem(web.app.config, "LOGIN_DISABLED", True)
+    for i in range(5):
+        web.database.upsert_patient(f"PGT{i}", {"PatientCode": f"PGT{i}", "name": f"Paging {4 - i}", "ID": f"0790{i}"})
+    client = web.app.test_client()
+
+    full = client.get("/api/patients").get_json()
+    codes = [r["code"] for r in full["rows"]]
+    assert {f"PGT{i}" for i in range(5)} <= set(codes)
+    assert set(full["raw"]) == set(codes)
+
+    page = client.get("/api/patients?q=PGT&limit=2&offset=1").get_json()
+    assert [r["code"] for r in page["rows"]] == ["PGT3", "PGT2"]      # sắp theo tên
+    assert set(page["raw"]) == {"PGT3", "PGT2"}
+    assert len(client.get("/api/patients?q=paging").get_json()["rows"]) == 5
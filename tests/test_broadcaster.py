@@ -0,0 +1,88 @@
+"""ImuBroadcaster: queue có giới hạn ở mọi mode, "latest" gộp frame, bỏ qua client có hàng gói đầy."""
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from aio_runtime import AsyncRuntime
+from broadcaster import ImuBroadcaster, slow_clients
+
+
+class FakeServer:
+    """Server emit đồng bộ; client (sid -> eio_sid, số gói chưa gửi) giả lập manager/eio."""
+
+    def __init__(self, backlog=None):
+        self.emitted = []
+        backlog = backlog or {}
+        self.manager = SimpleNamespace(
+            get_participants=lambda ns, room: ((sid, "e" + sid) for sid in backlog))
+        self.eio = SimpleNamespace(sockets={
+            "e" + sid: SimpleNamespace(queue=SimpleNamespace(qsize=lambda n=n: n))
+            for sid, n in backlog.items()})
+
+    def emit(self, event, payload, to=None, skip_sid=None):
+        self.emitted.append((event, payload, to, skip_sid))
+
+
+@pytest.fixture(scope="module")
+def runtime():
+    return AsyncRuntime(name="test-aio")
+
+
+def wait_for(cond, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def put_many(runtime, b, items):
+    """Mọi _put chạy trong 1 callback của loop: _run chưa kịp lấy -> queue dồn như khi emit chậm.
+    Trả (số item, tổng cost) trong queue ngay sau đó."""
+    def run():
+        for latest, samples in items:
+            b._put(latest, samples)
+        return b._queue.qsize(), b._queued
+    return runtime.call_sync(run)
+
+
+def test_latest_mode_keeps_only_newest_frame(runtime):
+    server = FakeServer()
+    b = ImuBroadcaster(server, runtime, rate_hz=1000, mode="latest", max_pending=50)
+    assert put_many(runtime, b, [({"hip": i}, []) for i in range(1000)]) == (1, 1)
+    assert b.frames_coalesced == 999
+    wait_for(lambda: b.frames_sent == 1)
+    assert server.emitted[0][1] == {"hip": 999}
+    assert runtime.call_sync(lambda: b._queued) == 0
+
+
+def test_packed_mode_bounded_without_samples(runtime):
+    server = FakeServer()
+    b = ImuBroadcaster(server, runtime, rate_hz=1000, mode="packed", max_pending=50)
+    # frame không kèm mẫu vẫn chiếm chỗ: trước đây _queued không tăng và queue phình vô hạn
+    assert put_many(runtime, b, [({"hip": i}, []) for i in range(1000)]) == (50, 50)
+
+
+def test_packed_mode_drops_oldest_samples(runtime):
+    server = FakeServer()
+    b = ImuBroadcaster(server, runtime, rate_hz=1000, mode="packed", max_pending=100)
+    assert put_many(runtime, b, [({"hip": i}, [[i, 0, 0, 0]] * 10) for i in range(50)]) == (10, 100)
+    wait_for(lambda: b.frames_sent == 1)
+    payload = server.emitted[0][1]
+    assert payload["hip"] == 49
+    assert len(payload["samples"]) == 100
+    assert payload["samples"][0][0] == 40
+    assert payload["dropped"] == 400 == b.samples_dropped
+    assert runtime.call_sync(lambda: b._queued) == 0
+
+
+def test_slow_clients_are_skipped(runtime):
+    server = FakeServer({"fast": 0, "slow": 40, "busy": 15})
+    assert slow_clients(server, "rig:a", max_backlog=16) == ["slow"]
+    assert slow_clients(SimpleNamespace(emit=None), "rig:a") == []
+
+    b = ImuBroadcaster(server, runtime, rate_hz=1000, room="rig:a", max_client_backlog=16)
+    b.push({"hip": 1.0}, [[0, 1, 2, 3]])
+    wait_for(lambda: b.frames_sent == 1)
+    assert server.emitted[0][2:] == ("rig:a", ["slow"])
+    assert b.client_frames_skipped == 1
@@ -0,0 +1,78 @@
+"""SenderClock: quay vòng u32, reset khi thiết bị khởi động lại, đầu ra không giảm; ClockSync theo sender."""
+import numpy as np
+import pytest
+
+from imu_ingest.clock_sync import U32, ClockSync, SenderClock
+
+
+def feed(clock, dev, host):
+    return np.array([clock.update(d, h) for d, h in zip(dev, host)])
+
+
+def test_fits_offset_and_drift():
+    clock = SenderClock()
+    dev = np.arange(0, 60_000, 10)
+    host = 5_000.0 + dev * (1 + 100e-6)
+    out = feed(clock, dev.tolist(), host.tolist())
+    np.testing.assert_allclose(out[2:], host[2:], atol=1e-6)
+    assert clock.info()["drift_ppm"] == pytest.approx(100.0, abs=0.1)
+    assert clock.info()["offset_ms"] == pytest.approx(5_000.0, abs=1e-3)
+    np.testing.assert_allclose(clock.to_host_block(dev[-5:]), host[-5:], atol=1e-6)
+
+
+def test_u32_wrap_is_unwrapped():
+    clock = SenderClock()
+    # counter ms bắt đầu 2 s trước khi quay vòng u32
+    steps = np.arange(500) * 10
+    raw = (U32 - 2_000 + steps) % U32
+    host = 1_000.0 + steps
+    out = feed(clock, raw.tolist(), host.tolist())
+    assert raw[-1] < raw[0]            # có quay vòng thật
+    assert clock.resets == 0
+    np.testing.assert_allclose(np.diff(out), 10.0, atol=1e-6)
+    np.testing.assert_allclose(out, host, atol=1e-6)
+
+
+def test_reboot_resets_model_but_output_stays_monotonic():
+    clock = SenderClock()
+    out1 = feed(clock, range(100_000, 110_000, 10), np.arange(1_000) * 10.0 + 50_000)
+    # thiết bị khởi động lại: ts về gần 0, host vẫn đi tiếp
+    out2 = feed(clock, range(0, 5_000, 10), np.arange(500) * 10.0 + 60_000)
+    assert clock.resets == 1
+    assert clock.n == 500
+    assert out2[0] >= out1[-1]
+    np.testing.assert_allclose(out2[1:], np.arange(1, 500) * 10.0 + 60_000, atol=1e-6)
+
+    clock.update(4_000, 65_000.0)      # lùi < reset_ms: coi là jitter, không reset
+    assert clock.resets == 1
+
+
+def test_output_monotonic_under_host_jitter():
+    rng = np.random.default_rng(3)
+    clock = SenderClock()
+    dev = np.arange(0, 30_000, 10)
+    # USB gom gói: host nhận trễ 0..8 ms, có lúc nhiều mẫu cùng host time
+    host = np.floor((dev + rng.uniform(0, 8, len(dev))) / 4) * 4 + 1_000
+    out = feed(clock, dev.tolist(), host.tolist())
+    assert np.all(np.diff(out) >= 0)
+    # sau khi hội tụ, sai lệch so với đường thật (dev + trễ trung bình) nhỏ hơn jitter
+    err = out[500:] - (dev[500:] + 1_000 + 2.0)
+    assert np.abs(err).max() < 3.0
+
+
+def test_clock_sync_units_and_senders():
+    sync = ClockSync()
+    assert sync.clock("imu", 1).unit_ms == 1.0
+    assert sync.clock("emg", 1).unit_ms == 0.001
+    assert sync.clock("emg", 1) is sync.clock("emg", 1)
+    assert sync.clock("emg", 2) is not sync.clock("emg", 1)
+
+    for i in range(100):
+        t_emg = sync.update("emg", 1, 7_000_000 + i * 1_000, 200.0 + i)   # us
+        t_imu = sync.update("imu", 1, 90_000 + i, 200.0 + i)              # ms
+    assert t_emg == pytest.approx(299.0)
+    assert t_imu == pytest.approx(299.0)
+    assert set(sync.info()) == {"imu:1", "emg:1", "emg:2"}
+
+    sync.reset()
+    assert sync.info() == {}
@@ -0,0 +1,98 @@
+"""LTTB / min-max decimation: khớp thuật toán LTTB gốc, giữ đầu/cuối và điểm nhọn."""
+import math
+
+import numpy as np
+import pytest
+
+from downsample import lttb_indices, minmax_indices, select_indices
+
+
+def lttb_reference(x, y, n_out):
+    """LTTB gốc (Steinarsson 2013), vòng lặp thuần Python."""
+    n = len(x)
+    every = (n - 2) / (n_out - 2)
+    out = [0]
+    a = 0
+    for b in range(n_out - 2):
+        lo = math.floor(b * every) + 1
+        hi = math.floor((b + 1) * every) + 1
+        nlo, nhi = hi, min(math.floor((b + 2) * every) + 1, n)
+        if b == n_out - 3:
+            nx, ny = x[-1], y[-1]
+        else:
+            nx = sum(x[nlo:nhi]) / (nhi - nlo)
+            ny = sum(y[nlo:nhi]) / (nhi - nlo)
+        best, best_area = lo, -1.0
+        for i in range(lo, hi):
+            area = abs((x[a] - nx) * (y[i] - y[a]) - (x[a] - x[i]) * (ny - y[a]))
+            if area > best_area:
+                best, best_area = i, area
+        out.append(best)
+        a = best
+    out.append(n - 1)
+    return out
+
+
+@pytest.mark.parametrize("n, n_out", [(1000, 100), (1001, 37), (5000, 3), (257, 256)])
+def test_lttb_matches_reference(n, n_out):
+    rng = np.random.default_rng(n)
+    x = np.cumsum(rng.uniform(5, 15, n))
+    y = np.cumsum(rng.normal(0, 1, n)).round(3)
+    got = lttb_indices(x, y, n_out)
+    assert got.tolist() == lttb_reference(x.tolist(), y.tolist(), n_out)
+
+
+def test_lttb_shape():
+    x = np.arange(10_000.0)
+    y = np.sin(x / 300)
+    idx = lttb_indices(x, y, 500)
+    assert len(idx) == 500
+    assert idx[0] == 0 and idx[-1] == len(x) - 1
+    assert np.all(np.diff(idx) > 0)
+
+
+def test_lttb_keeps_spike():
+    x = np.arange(2000.0)
+    y = np.zeros(2000)
+    y[1234] = 50.0
+    y[777] = -20.0
+    idx = lttb_indices(x, y, 40)
+    assert 1234 in idx and 777 in idx
+
+
+def test_lttb_small_inputs():
+    assert lttb_indices([0, 1], [5, 6], 1).tolist() == [0, 1]
+    assert lttb_indices(np.arange(10.0), np.arange(10.0), 10).tolist() == list(range(10))
+    assert lttb_indices(np.arange(10.0), np.arange(10.0), 50).tolist() == list(range(10))
+    assert len(lttb_indices(np.arange(10.0), np.arange(10.0), 1)) == 3     # tối thiểu đầu/giữa/cuối
+
+
+def test_minmax_keeps_extremes():
+    rng = np.random.default_rng(4)
+    y = rng.normal(0, 1, 9999)
+    idx = minmax_indices(y, 100)
+    assert idx[0] == 0 and idx[-1] == len(y) - 1
+    assert np.all(np.diff(idx) > 0)
+    assert int(np.argmin(y)) in idx and int(np.argmax(y)) in idx
+    assert len(idx) <= 100 + 2
+    # mỗi bucket giữ đúng min và max của nó
+    size = -(-len(y) // 50)
+    for b in range(50):
+        seg = slice(b * size, min((b + 1) * size, len(y)))
+        assert b * size + int(np.argmin(y[seg])) in idx
+        assert b * size + int(np.argmax(y[seg])) in idx
+
+
+def test_select_indices_union_across_series():
+    x = np.arange(3000.0)
+    hip = np.zeros(3000)
+    hip[100] = 30.0
+    knee = np.zeros(3000)
+    knee[2900] = -10.0
+    idx = select_indices(x, [hip, knee, np.zeros(5)], 60)     # series sai độ dài bị bỏ qua
+    assert 100 in idx and 2900 in idx
+    assert np.all(np.diff(idx) > 0)
+    assert select_indices(x, [hip], 5000).tolist() == list(range(3000))
+    assert select_indices(x, [], 60).tolist() == list(range(3000))
+    mm = select_indices(x, [hip, knee], 60, method="minmax")
+    assert 100 in mm and 2900 in mm
@@ -0,0 +1,124 @@
+"""process_block (vector, theo block) phải ra đúng từng bit như vòng lặp từng mẫu cũ của append_samples."""
+import numpy as np
+import pytest
+
+from imu_ingest import filter as filter_mod
+from imu_ingest.filter import process_block, to_block
+from imu_ingest.smoothing import JointFilters
+
+# hằng số của bản cũ (webgiaodien, trước khi chia block)
+PITCH_MID = 90.0
+PITCH_HYS = 10.0
+HIP_CROSS_TH = 40.0
+DEADZONE = 2.0
+ALPHA = 0.3
+PARAMS = {"cross_th": HIP_CROSS_TH, "pitch_mid": PITCH_MID, "pitch_hys": PITCH_HYS, "deadzone": DEADZONE}
+
+
+class LoopReference:
+    """Bản cũ: hysteresis front/back theo pitch2, deadzone, clamp, EMA _last/ALPHA, từng mẫu."""
+
+    def __init__(self):
+        self.mode = "front"
+        self.last = {"hip": None, "knee": None, "ankle": None}
+
+    def smooth(self, key, val):
+        if self.last[key] is None:
+            self.last[key] = val
+        else:
+            self.last[key] = self.last[key] * (1 - ALPHA) + val * ALPHA
+        return self.last[key]
+
+    def run(self, rows):
+        out = []
+        for t_ms, raw_hip, knee, ankle, pitch2 in rows:
+            mode = self.mode
+            if abs(raw_hip) < HIP_CROSS_TH:
+                if pitch2 <= (PITCH_MID - PITCH_HYS):
+                    mode = "front"
+                elif pitch2 >= (PITCH_MID + PITCH_HYS):
+                    mode = "back"
+            self.mode = mode
+            sign_front = 1 if mode == "front" else -1
+
+            mag_hip = abs(raw_hip)
+            hip = 0.0 if mag_hip < DEADZONE else sign_front * mag_hip
+
+            hip = max(-30.1, min(122.1, hip))
+            knee = max(0, min(134, abs(knee)))
+            ankle = max(36, min(113, abs(ankle)))
+
+            out.append((t_ms, self.smooth("hip", hip), self.smooth("knee", knee), self.smooth("ankle", ankle)))
+        return out
+
+
+def stream(n=6000, seed=11):
+    """Hip đổi dấu qua 0, pitch2 dao động quanh 90; chèn đúng các biên hysteresis/deadzone/clamp."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(n) * 10.0
+    hip = 60 * np.sin(t / 900.0) + rng.normal(0, 1.5, n)
+    knee = 70 * np.sin(t / 700.0) + rng.normal(0, 1.0, n)
+    ankle = 75 + 50 * np.sin(t / 500.0)
+    pitch2 = 90 + 25 * np.sin(t / 1300.0) + rng.normal(0, 2.0, n)
+    rows = np.column_stack((t, hip, knee, ankle, pitch2))
+
+    edges = [
+        (39.999999, 80.0), (40.0, 80.0), (-40.0, 100.0), (-39.999999, 100.0),   # cross_th (<)
+        (10.0, PITCH_MID - PITCH_HYS), (10.0, PITCH_MID + PITCH_HYS),            # pitch (<= / >=)
+        (10.0, np.nextafter(80.0, 100.0)), (10.0, np.nextafter(100.0, 80.0)),
+        (2.0, 100.0), (-1.9999999, 80.0), (-2.0, 100.0), (0.0, 90.0),            # deadzone (<)
+        (-30.1, 100.0), (-31.0, 100.0), (122.1, 80.0), (130.0, 80.0),            # clamp hip
+    ]
+    idx = rng.choice(np.arange(10, n), size=len(edges) * 20, replace=False)
+    for k, i in enumerate(idx):
+        rows[i, 1], rows[i, 4] = edges[k % len(edges)]
+    rows[idx[:40], 2] = rng.choice([0.0, 134.0, -134.0, 140.0], 40)
+    rows[idx[40:80], 3] = rng.choice([36.0, 113.0, -36.0, 10.0], 40)
+    return rows
+
+
+def run_blocks(rows, sizes):
+    filters = JointFilters("ema", {"ema": {"alpha": ALPHA}})
+    mode = "front"
+    out = []
+    i = 0
+    k = 0
+    while i < len(rows):
+        n = sizes[k % len(sizes)]
+        t, hip, knee, ankle, mode = process_block(to_block(rows[i:i + n]), mode, filters, **PARAMS)
+        out.extend(zip(t.tolist(), hip.tolist(), knee.tolist(), ankle.tolist()))
+        i += n
+        k += 1
+    return out, mode
+
+
+@pytest.mark.parametrize("sizes", [[1], [7], [64], [1, 3, 250, 2, 64]])
+def test_process_block_matches_loop_bitwise(sizes):
+    rows = stream()
+    ref = LoopReference()
+    expected = ref.run(rows.tolist())
+    got, mode = run_blocks(rows, sizes)
+    assert got == expected
+    assert mode == ref.mode
+
+
+def test_process_block_matches_loop_without_scipy(monkeypatch):
+    monkeypatch.setattr(filter_mod, "lfilter", None)
+    rows = stream(seed=12)
+    assert run_blocks(rows, [5, 100])[0] == LoopReference().run(rows.tolist())
+
+
+def test_hysteresis_edges():
+    ref = LoopReference()
+    # (raw_hip, pitch2): biên pitch chuyển mode, |hip| >= cross_th giữ mode cũ
+    rows = [(0.0, 10.0, 0, 50, 80.0),      # <= 80 -> front
+            (10.0, 10.0, 0, 50, 99.999),   # vùng trễ: giữ front
+            (20.0, 10.0, 0, 50, 100.0),    # >= 100 -> back
+            (30.0, 40.0, 0, 50, 60.0),     # |hip| == cross_th: không đổi (vẫn back)
+            (40.0, 10.0, 0, 50, 80.001),   # vùng trễ: giữ back
+            (50.0, 10.0, 0, 50, 80.0)]     # -> front
+    expected = ref.run(rows)
+    got, mode = run_blocks(np.array(rows), [len(rows)])
+    assert got == expected
+    assert mode == "front"
+    assert [round(h, 6) for _, h, _, _ in got][:4] == [10.0, 10.0, 4.0, -6.23]   # -40 clamp về -30.1
@@ -0,0 +1,154 @@
+"""FusionStage: lưới thời gian đều, chờ EMG, EMG im lặng quá emg_timeout_ms -> cột EMG = NaN,
+hàng IMU nhiều sender tới không theo thứ tự thời gian."""
+import numpy as np
+
+from imu_ingest.clock_sync import ClockSync
+from imu_ingest.filter import COL_HIP, COL_T
+from imu_ingest.fusion import COL_EMG, COL_EMG_ENV, COL_EMG_RMS, FUSED_COLUMNS, FusionStage
+from imu_ingest.kinematics import SOLVERS
+from imu_ingest.parser import REC_IMU, encode_frame
+from imu_ingest.pipeline import IngestPipeline
+
+
+def imu_rows(t0, t1, step=10.0):
+    """Block IMU (N x 5) với hip = t/10 để kiểm tra nội suy."""
+    t = np.arange(t0, t1, step)
+    return np.column_stack((t, t / 10.0, np.zeros_like(t), np.full_like(t, 90.0), np.zeros_like(t)))
+
+
+def emg_samples(t0, t1):
+    t = np.arange(t0, t1, 1.0)
+    return t, np.sin(t / 5.0)
+
+
+class Collect:
+    def __init__(self):
+        self.blocks = []
+
+    def __call__(self, block):
+        self.blocks.append(block)
+
+    @property
+    def out(self):
+        return np.concatenate(self.blocks) if self.blocks else np.empty((0, len(FUSED_COLUMNS)))
+
+
+def assert_uniform_grid(t, dt):
+    assert len(t)
+    np.testing.assert_allclose(np.diff(t), dt)
+    np.testing.assert_allclose(t % dt, 0.0, atol=1e-9)
+
+
+def test_grid_waits_for_emg_then_catches_up():
+    sink = Collect()
+    fusion = FusionStage(sink, rate_hz=100.0)
+    t, v = emg_samples(0.0, 600.0)
+    fusion.push(emg_t=t, emg_v=v)
+    fusion.push(imu_block=imu_rows(3.0, 803.0, 7.0))
+    # IMU tới 801 ms, EMG mới tới 599 ms (chưa quá timeout) -> chỉ xuất tới 590
+    assert sink.out[-1, COL_T] == 590.0
+
+    t, v = emg_samples(600.0, 1100.0)
+    fusion.push(emg_t=t, emg_v=v)
+    assert sink.out[-1, COL_T] == 800.0
+    fusion.push(imu_block=imu_rows(808.0, 1010.0, 7.0))
+    out = sink.out
+    assert_uniform_grid(out[:, COL_T], 10.0)
+    assert out[0, COL_T] == 10.0 and out[-1, COL_T] == 1000.0
+    assert fusion.frames == len(out)
+    np.testing.assert_allclose(out[:, COL_HIP], out[:, COL_T] / 10.0)
+    np.testing.assert_allclose(out[:, COL_EMG], np.sin(out[:, COL_T] / 5.0), atol=1e-9)
+    assert not np.isnan(out[:, COL_EMG:]).any()
+
+
+def test_emg_timeout_emits_nan_columns():
+    sink = Collect()
+    fusion = FusionStage(sink, rate_hz=50.0, emg_timeout_ms=250.0)
+    t, v = emg_samples(0.0, 400.0)
+    fusion.push(emg_t=t, emg_v=v)
+    # IMU tới 1000 ms, EMG dừng ở 399 ms (< 1000 - 250) -> không chờ EMG nữa
+    fusion.push(imu_block=imu_rows(0.0, 1010.0))
+    out = sink.out
+    assert_uniform_grid(out[:, COL_T], 20.0)
+    assert out[-1, COL_T] == 1000.0
+    has_emg = out[:, COL_T] <= 399.0
+    assert not np.isnan(out[has_emg, COL_EMG:]).any()
+    assert np.isnan(out[~has_emg][:, [COL_EMG, COL_EMG_RMS, COL_EMG_ENV]]).all()
+    assert not np.isnan(out[:, :COL_EMG]).any()
+
+
+def test_imu_only_stream_has_nan_emg():
+    sink = Collect()
+    fusion = FusionStage(sink, rate_hz=100.0)
+    for t0 in range(0, 1000, 100):
+        fusion.push(imu_block=imu_rows(float(t0), t0 + 100.0))
+    out = sink.out
+    assert_uniform_grid(out[:, COL_T], 10.0)
+    assert out[-1, COL_T] == 990.0
+    assert np.isnan(out[:, COL_EMG:]).all()
+    # _trim giữ bộ đệm nhỏ, không phình theo thời gian đo
+    assert len(fusion._imu) <= 2
+
+
+def test_rows_out_of_time_order_are_sorted():
+    """4 sender, mỗi sender 1 clock: hàng tới theo thứ tự nhận, t lùi trong và giữa các chunk."""
+    rng = np.random.default_rng(5)
+    rows = imu_rows(0.0, 2000.0, 2.5)
+    order = np.arange(len(rows))
+    for i in range(0, len(rows), 40):
+        rng.shuffle(order[i:i + 40])
+    rows = rows[order]
+    assert (np.diff(rows[:, COL_T]) < 0).sum() > 100
+
+    sink = Collect()
+    fusion = FusionStage(sink, rate_hz=100.0)
+    for i in range(0, len(rows), 40):
+        fusion.push(imu_block=rows[i:i + 40])
+        assert np.all(np.diff(fusion._imu[:, COL_T]) >= 0)
+    out = sink.out
+    assert_uniform_grid(out[:, COL_T], 10.0)
+    assert out[-1, COL_T] == 1990.0
+    # hip = t/10 tuyến tính: nội suy trên hàng đã sắp phải trả đúng
+    np.testing.assert_allclose(out[:, COL_HIP], out[:, COL_T] / 10.0)
+
+
+def test_pipeline_multi_sender_clocks_feed_sorted_rows():
+    """IngestPipeline + ClockSync: mỗi sender lệch clock riêng, fusion vẫn ra lưới đều, không lùi."""
+    rows_in = []
+
+    class Spy(FusionStage):
+        def push(self, imu_block=None, emg_t=None, emg_v=None):
+            if imu_block is not None:
+                rows_in.append(imu_block.copy())
+            super().push(imu_block, emg_t, emg_v)
+
+    sink = Collect()
+    pipe = IngestPipeline(clock=ClockSync(), solver=SOLVERS["roll"], fusion=lambda s: Spy(s, 100.0),
+                          sink=sink)
+    rng = np.random.default_rng(9)
+    dev0 = {sid: int(rng.integers(0, 1_000_000)) for sid in range(1, 5)}
+    lag = {1: 0.0, 2: 6.0, 3: 12.0, 4: 3.0}     # ms trễ USB/gom gói theo sender
+    pending = []
+    for i in range(2000):
+        t = i * 10
+        for sid in range(1, 5):
+            pending.append((t + lag[sid], encode_frame(REC_IMU, [(sid, dev0[sid] + t, 0.0, sid * 10.0 + t / 100, 90.0)])))
+        if i % 3 == 2:
+            # gửi theo thời điểm tới host: sender trễ hơn tới sau
+            pending.sort(key=lambda p: p[0])
+            now = pending[-1][0]
+            pipe.feed(b"".join(f for _, f in pending), now / 1000.0)
+            pending = []
+
+    rows = np.concatenate(rows_in)
+    assert (np.diff(rows[:, COL_T]) < 0).sum() > 1000   # đúng tình huống: hàng tới fusion không theo t
+    out = sink.out
+    assert len(out) > 1500
+    assert_uniform_grid(out[:, COL_T], 10.0)
+
+    # chuẩn: cùng các hàng đó nhưng đã sắp theo t, đưa vào 1 lần
+    ref = Collect()
+    FusionStage(ref, 100.0).push(imu_block=rows[np.argsort(rows[:, COL_T], kind="stable")])
+    n = min(len(out), len(ref.out))
+    np.testing.assert_array_equal(out[:n, COL_T], ref.out[:n, COL_T])
+    np.testing.assert_allclose(out[:n, 1:COL_EMG], ref.out[:n, 1:COL_EMG], atol=1e-9)
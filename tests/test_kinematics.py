@@ -0,0 +1,144 @@
+"""Kernel góc (norm_deg/clamp) và solver góc khớp: tương đương bản cũ + benchmark.
+
+Benchmark: pytest tests/test_kinematics.py --benchmark-only
+(--benchmark-disable khi chỉ cần chạy test).
+"""
+import math
+
+import numpy as np
+import pytest
+
+from imu_ingest.kinematics import SOLVERS, clamp, clamp_array, norm_deg, norm_deg_array
+
+RATE_HZ = 100
+N_SENSORS = 4
+
+EDGES = [
+    0.0, -0.0, 180.0, -180.0, 360.0, -360.0, 540.0, -540.0, 720.0, -720.0,
+    math.nextafter(180.0, math.inf), math.nextafter(-180.0, -math.inf),
+    math.nextafter(180.0, 0.0), math.nextafter(-180.0, 0.0),
+    180.0 + 1e-13, -180.0 - 1e-13, 179.999999, -179.999999, 1e6 + 0.5, -1e6 - 0.5,
+]
+
+
+def norm_deg_loop(x):
+    """Bản cũ trong webgiaodien (vòng while) - chuẩn để so."""
+    while x > 180:
+        x -= 360
+    while x < -180:
+        x += 360
+    return x
+
+
+def clamp_minmax(val, lo, hi):
+    return max(lo, min(hi, val))
+
+
+def imu_stream(seconds, seed=0):
+    """Euler (N, 4, 3) giả lập: roll random walk quấn ±180, yaw trôi chậm, pitch quanh 90."""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * RATE_HZ)
+    euler = np.empty((n, N_SENSORS, 3))
+    euler[..., 0] = np.cumsum(rng.normal(0, 0.05, (n, N_SENSORS)), axis=0)
+    euler[..., 1] = np.cumsum(rng.normal(0, 2.0, (n, N_SENSORS)), axis=0) + rng.uniform(-180, 180, N_SENSORS)
+    euler[..., 1] = norm_deg_array(euler[..., 1])
+    euler[..., 2] = 90 + 20 * np.sin(np.linspace(0, 20, n))[:, None]
+    return euler
+
+
+@pytest.fixture(scope="module")
+def angle_diffs():
+    """100k hiệu roll giữa 2 sensor kề nhau (như hip/knee thực tế)."""
+    roll = imu_stream(500.0)[..., 1]
+    diffs = np.concatenate((roll[:, 1] - roll[:, 0], roll[:, 2] - roll[:, 1]))
+    assert len(diffs) == 100_000
+    return diffs
+
+
+# ---- tương đương
+@pytest.mark.parametrize("span", [360.0, 1080.0, 1e5])
+def test_norm_deg_matches_loop_bitwise(span):
+    x = np.random.default_rng(1).uniform(-span, span, 100_000).tolist() + EDGES
+    expected = [norm_deg_loop(v) for v in x]
+    assert [norm_deg(v) for v in x] == expected
+    assert norm_deg_array(x).tolist() == expected
+
+
+def test_norm_deg_edges():
+    assert norm_deg(180.0) == 180.0
+    assert norm_deg(-180.0) == -180.0
+    assert norm_deg(540.0) == 180.0
+    assert norm_deg(-540.0) == -180.0
+    assert norm_deg(math.nextafter(180.0, math.inf)) == norm_deg_loop(math.nextafter(180.0, math.inf))
+    out = norm_deg_array(EDGES)
+    assert np.all((out >= -180.0) & (out <= 180.0))
+
+
+def test_norm_deg_stream_matches_loop(angle_diffs):
+    x = angle_diffs.tolist()
+    expected = [norm_deg_loop(v) for v in x]
+    assert [norm_deg(v) for v in x] == expected
+    assert norm_deg_array(angle_diffs).tolist() == expected
+
+
+def test_clamp_matches_minmax(angle_diffs):
+    x = angle_diffs.tolist() + [-40.0, 140.0]
+    expected = [clamp_minmax(v, -40, 140) for v in x]
+    assert [clamp(v, -40, 140) for v in x] == expected
+    assert clamp_array(x, -40, 140).tolist() == expected
+
+
+def test_solvers_agree_on_pure_roll():
+    euler = imu_stream(10.0)
+    euler[..., 0] = 0.0
+    euler[..., 2] = 0.0
+    quat = SOLVERS["quat"](euler)
+    roll = SOLVERS["roll"](euler)
+    assert quat.shape == roll.shape == (len(euler), 4)
+    # hip, knee, ankle: quaternion tương đối == hiệu roll khi chỉ quay quanh trục sagittal
+    np.testing.assert_allclose(norm_deg_array(quat[:, :3] - roll[:, :3]), 0.0, atol=1e-9)
+
+
+# ---- benchmark
+@pytest.mark.benchmark(group="norm_deg")
+def test_bench_norm_deg_loop(benchmark, angle_diffs):
+    x = angle_diffs.tolist()
+    benchmark(lambda: [norm_deg_loop(v) for v in x])
+
+
+@pytest.mark.benchmark(group="norm_deg")
+def test_bench_norm_deg_scalar(benchmark, angle_diffs):
+    x = angle_diffs.tolist()
+    benchmark(lambda: [norm_deg(v) for v in x])
+
+
+@pytest.mark.benchmark(group="norm_deg")
+def test_bench_norm_deg_array(benchmark, angle_diffs):
+    benchmark(norm_deg_array, angle_diffs)
+
+
+@pytest.mark.benchmark(group="clamp")
+def test_bench_clamp_minmax(benchmark, angle_diffs):
+    x = angle_diffs.tolist()
+    benchmark(lambda: [clamp_minmax(v, -40, 140) for v in x])
+
+
+@pytest.mark.benchmark(group="clamp")
+def test_bench_clamp_scalar(benchmark, angle_diffs):
+    x = angle_diffs.tolist()
+    benchmark(lambda: [clamp(v, -40, 140) for v in x])
+
+
+@pytest.mark.benchmark(group="clamp")
+def test_bench_clamp_array(benchmark, angle_diffs):
+    benchmark(clamp_array, angle_diffs, -40, 140)
+
+
+@pytest.mark.parametrize("name", sorted(SOLVERS))
+@pytest.mark.parametrize("chunk", [1, 64])
+@pytest.mark.benchmark(group="solver")
+def test_bench_solver(benchmark, name, chunk):
+    euler = imu_stream(20.0)
+    blocks = [euler[i:i + chunk] for i in range(0, min(len(euler), 200 * chunk), chunk)]
+    solver = SOLVERS[name]
+    benchmark(lambda: [solver(b) for b in blocks])
@@ -0,0 +1,107 @@
+"""FrameDecoder: frame binary bị cắt giữa chunk, bắt lại sau rác, checksum sai; ASCII và tự nhận dạng."""
+import pytest
+
+from imu_ingest.parser import (
+    FRAME_MAGIC, FRAME_MAX_PAYLOAD, IMU_RECORD, REC_EMG, REC_IMU, FrameDecoder, encode_frame,
+    parse_serial_line,
+)
+
+
+def imu_records(n, t0=0):
+    # giá trị biểu diễn đúng ở float32 để so sánh bằng ==
+    return [(1 + i % 4, t0 + i, 0.5 * i, -1.25 * i, 90.0) for i in range(n)]
+
+
+def emg_records(n, t0=0):
+    return [(5, t0 + 1000 * i, 0.25 * i) for i in range(n)]
+
+
+def tagged(tag, records):
+    return [(tag, *r) for r in records]
+
+
+def feed_all(dec, data, step):
+    out = []
+    for i in range(0, len(data), step):
+        out.extend(dec.feed(data[i:i + step]))
+    return out
+
+
+def test_parse_serial_line():
+    assert parse_serial_line("IMU,2,1500,1.5,-20,88\n") == ("imu", 2, 1500, 1.5, -20.0, 88.0)
+    assert parse_serial_line("emg, 5, 123456.0, -0.5") == ("emg", 5, 123456, -0.5)
+    assert parse_serial_line("IMU,2,1500,1.5") is None          # thiếu trường
+    assert parse_serial_line("IMU,x,1500,1,2,3") is None        # số sai
+    assert parse_serial_line("HELLO,1,2,3") is None
+    assert parse_serial_line("") is None
+
+
+def test_binary_roundtrip_any_chunk_size():
+    data = (encode_frame(REC_IMU, imu_records(8)) + encode_frame(REC_EMG, emg_records(10))
+            + encode_frame(REC_IMU, imu_records(3, t0=100)))
+    expected = tagged("imu", imu_records(8)) + tagged("emg", emg_records(10)) + tagged("imu", imu_records(3, 100))
+    for step in (1, 2, 5, 17, len(data)):
+        dec = FrameDecoder()
+        assert feed_all(dec, data, step) == expected
+        assert dec.mode == "binary"
+        assert dec.frames == 3 and dec.bad_frames == 0
+        assert len(dec.buf) == 0
+
+
+def test_split_frame_waits_for_rest():
+    frame = encode_frame(REC_IMU, imu_records(2))
+    dec = FrameDecoder()
+    assert dec.feed(encode_frame(REC_IMU, imu_records(1))) == tagged("imu", imu_records(1))
+    # cắt ngay giữa magic, rồi giữa header, rồi trước checksum
+    for cut in (1, 3, len(frame) - 1):
+        assert dec.feed(frame[:cut]) == []
+        assert dec.feed(frame[cut:]) == tagged("imu", imu_records(2))
+    assert dec.bad_frames == 0
+
+
+def test_resync_after_garbage():
+    good = encode_frame(REC_IMU, imu_records(4))
+    # rác có cả magic giả (type lạ, length lẻ so với record) giữa các frame
+    fake_type = FRAME_MAGIC + bytes([0x7F, 4, 0]) + b"abcd" + b"\x00"
+    fake_len = FRAME_MAGIC + bytes([REC_IMU, 5, 0]) + b"12345" + b"\x00"
+    data = b"\x00\xffnoise\xaa" + good + fake_type + b"\x55\xaa" + fake_len + good
+    dec = FrameDecoder()
+    assert feed_all(dec, data, 7) == tagged("imu", imu_records(4)) * 2
+    assert dec.frames == 2
+    assert dec.bad_frames >= 2
+
+
+def test_checksum_failure_skips_frame():
+    first = encode_frame(REC_IMU, imu_records(2))
+    bad = bytearray(encode_frame(REC_IMU, imu_records(2, t0=50)))
+    bad[5 + 3] ^= 0x01                      # 1 bit trong payload
+    last = encode_frame(REC_EMG, emg_records(3))
+    dec = FrameDecoder()
+    out = feed_all(dec, first + bytes(bad) + last, 4)
+    assert out == tagged("imu", imu_records(2)) + tagged("emg", emg_records(3))
+    assert dec.frames == 2
+    assert dec.bad_frames == 1
+
+
+def test_detect_skips_garbage_before_first_frame():
+    dec = FrameDecoder()
+    assert dec.feed(b"boot log...\r\n\xaa\x55\x01") == []
+    assert dec.mode is None
+    out = dec.feed(encode_frame(REC_IMU, imu_records(1)))
+    assert dec.mode == "binary"
+    assert out == tagged("imu", imu_records(1))
+
+
+def test_ascii_lines_split_across_chunks():
+    text = b"garbage\nIMU,1,10,0,5,90\nEMG,5,10000,0.5\nIMU,2,10,0,6"
+    dec = FrameDecoder()
+    assert feed_all(dec, text, 9) == [("imu", 1, 10, 0.0, 5.0, 90.0), ("emg", 5, 10000, 0.5)]
+    assert dec.mode == "ascii"
+    assert dec.feed(b",91\nIMU,bad\n") == [("imu", 2, 10, 0.0, 6.0, 91.0)]
+
+
+def test_encode_frame_limits():
+    max_records = FRAME_MAX_PAYLOAD // IMU_RECORD.size
+    assert len(encode_frame(REC_IMU, imu_records(max_records))) == 5 + max_records * IMU_RECORD.size + 1
+    with pytest.raises(ValueError):
+        encode_frame(REC_IMU, imu_records(max_records + 1))
@@ -0,0 +1,59 @@
+"""RecordJournal: dòng cũ thiếu id có id ổn định, nên xoá vẫn còn hiệu lực sau khi mở lại."""
+import json
+
+import pytest
+
+
+@pytest.fixture
+def journal_cls(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)          # database tạo exports/ theo cwd khi import
+    import database
+    return database.RecordJournal
+
+
+def write_lines(path, recs):
+    with open(path, "w", encoding="utf-8") as f:
+        for rec in recs:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+
+def open_journal(cls, tmp_path, **kw):
+    return cls(path=str(tmp_path / "records.jsonl"), legacy_path=str(tmp_path / "missing.json"), **kw)
+
+
+def test_legacy_line_without_id_delete_survives_reload(journal_cls, tmp_path):
+    write_lines(tmp_path / "records.jsonl", [
+        {"patient_code": "BN1", "created_at_ts": 1.0, "note": "cũ, không id"},
+        {"patient_code": "BN1", "created_at_ts": 2.0, "note": "cũ 2, không id"},
+        {"id": "abc", "patient_code": "BN2", "created_at_ts": 3.0},
+    ])
+    j = open_journal(journal_cls, tmp_path)
+    ids = [r["id"] for r in j.latest()]
+    assert len(ids) == 3 and ids[0] == "abc"
+    assert ids == [r["id"] for r in open_journal(journal_cls, tmp_path).latest()]   # cùng id mỗi lần load
+
+    legacy = ids[2]
+    assert j.get(legacy)["note"] == "cũ, không id"
+    assert j.delete(legacy)
+
+    j = open_journal(journal_cls, tmp_path)
+    assert j.get(legacy) is None
+    assert [r["id"] for r in j.latest()] == ids[:2]
+
+
+def test_legacy_id_stable_across_compaction(journal_cls, tmp_path):
+    write_lines(tmp_path / "records.jsonl", [
+        {"patient_code": "BN1", "created_at_ts": float(i), "n": i} for i in range(6)
+    ])
+    j = open_journal(journal_cls, tmp_path)
+    ids = [r["id"] for r in j.latest()]
+    for rec_id in ids[:3]:
+        assert j.delete(rec_id)
+    j.compact()
+    assert [r["id"] for r in j.latest()] == ids[3:]
+    assert j.get(ids[4])["n"] == 1
+
+    j = open_journal(journal_cls, tmp_path)
+    assert [r["id"] for r in j.latest()] == ids[3:]
+    assert j.delete(ids[3])
+    assert [r["id"] for r in open_journal(journal_cls, tmp_path).latest()] == ids[4:]
@@ -0,0 +1,145 @@
+"""SpscRing (push/peek/commit, quay vòng, đầy -> bỏ) và SeqDoubleBuffer (đọc ổn định khi đang publish)."""
+import sys
+import threading
+import time
+
+import pytest
+
+from imu_ingest.ring import SeqDoubleBuffer, SpscRing
+
+
+@pytest.fixture
+def fast_switch():
+    """Đổi thread thường hơn để producer/consumer xen kẽ nhiều."""
+    old = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    yield
+    sys.setswitchinterval(old)
+
+
+def test_capacity_rounds_up_to_power_of_two():
+    assert SpscRing(1).capacity == 1
+    assert SpscRing(3).capacity == 4
+    assert SpscRing(1024).capacity == 1024
+    assert SpscRing(1025).capacity == 2048
+
+
+def test_push_peek_commit_across_wraparound():
+    ring = SpscRing(4)
+    expected = 0
+    pushed = 0
+    # 3 item/vòng trên ring 4 slot -> head/tail vượt qua mép mảng nhiều lần
+    for _ in range(25):
+        for _ in range(3):
+            assert ring.push(pushed)
+            pushed += 1
+        assert len(ring) == 3
+        assert ring.peek(limit=2) == [expected, expected + 1]
+        items = ring.peek()
+        assert items == list(range(expected, expected + 3))
+        assert len(ring) == 3          # peek không lấy ra
+        ring.commit(len(items))
+        expected += len(items)
+        assert len(ring) == 0
+    assert ring.dropped == 0
+    assert ring._tail == ring._head == 75
+
+
+def test_partial_commit_keeps_order():
+    ring = SpscRing(4)
+    for i in range(4):
+        ring.push(i)
+    ring.commit(1)
+    assert ring.push(4)
+    assert ring.peek() == [1, 2, 3, 4]
+    ring.commit(2)
+    assert ring.peek() == [3, 4]
+
+
+def test_commit_releases_slots():
+    ring = SpscRing(4)
+    for i in range(3):
+        ring.push([i])
+    ring.commit(3)
+    assert ring._slots == [None] * 4
+
+
+def test_drop_when_full_counts_and_keeps_old_items():
+    ring = SpscRing(4)
+    assert all(ring.push(i) for i in range(4))
+    assert not ring.push(4)
+    assert not ring.push(5)
+    assert ring.dropped == 2
+    assert ring.peek() == [0, 1, 2, 3]
+    ring.commit(1)
+    assert ring.push(6)
+    assert not ring.push(7)
+    assert ring.dropped == 3
+    assert ring.peek() == [1, 2, 3, 6]
+
+
+def test_spsc_threads_deliver_in_order(fast_switch):
+    ring = SpscRing(64)
+    n = 20_000
+    got = []
+
+    def produce():
+        i = 0
+        while i < n:
+            if ring.push(i):
+                i += 1
+
+    t = threading.Thread(target=produce)
+    t.start()
+    while len(got) < n:
+        items = ring.peek()
+        got.extend(items)
+        ring.commit(len(items))
+    t.join()
+    assert got == list(range(n))
+
+
+def test_double_buffer_initial_value():
+    buf = SeqDoubleBuffer(("a", 0))
+    assert buf.read() == (0, ("a", 0))
+    buf.publish(("b", 1))
+    assert buf.seq == 1
+    assert buf.read() == (1, ("b", 1))
+
+
+def test_double_buffer_read_is_seq_stable_while_publishing(fast_switch):
+    buf = SeqDoubleBuffer((0, 0))
+    n = 20_000
+    stop = threading.Event()
+    bad = []
+    seen = []
+    ready = threading.Barrier(4)
+
+    def reader():
+        last, distinct = 0, 0
+        ready.wait()
+        while not stop.is_set():
+            seq, value = buf.read()
+            # value publish lần thứ seq là (seq, -seq): lệch nghĩa là đọc slot đang ghi dở
+            if value != (seq, -seq) or seq < last:
+                bad.append((seq, value, last))
+                return
+            distinct += seq != last
+            last = seq
+        seen.append(distinct)
+
+    readers = [threading.Thread(target=reader) for _ in range(3)]
+    for t in readers:
+        t.start()
+    ready.wait()
+    for i in range(1, n + 1):
+        buf.publish((i, -i))
+        if i % 64 == 0:
+            time.sleep(0)          # nhường GIL cho reader
+
+    stop.set()
+    for t in readers:
+        t.join()
+    assert bad == []
+    assert min(seen) > 10       # reader thật sự đọc xen giữa các lần publish
+    assert buf.read() == (n, (n, -n))
@@ -0,0 +1,29 @@
+"""Metadata phiên lưu trữ ghi đúng bộ lọc làm mượt đang dùng."""
+import numpy as np
+import pytest
+
+from session_archive import load_meta
+from session_store import SessionBuffer
+
+
+def recorded_snapshot():
+    buf = SessionBuffer()
+    t = np.arange(5) * 10.0
+    buf.append(t, t, t + 1, t + 40)
+    return buf.snapshot()
+
+
+@pytest.mark.parametrize("smoothing, stages", [
+    ("ema", ["ema"]),
+    ("one_euro", ["one_euro"]),
+    ("butter+one_euro", ["butter", "one_euro"]),
+])
+def test_archive_records_active_smoother(web, monkeypatch, smoothing, stages):
+    monkeypatch.setattr(web, "SMOOTHING", smoothing)
+    session_id = web.archive_session(recorded_snapshot())
+    meta = load_meta(session_id)
+    assert meta["n_samples"] == 5
+    assert meta["filter"]["smoothing"] == smoothing
+    # chỉ tham số của các bộ lọc trong chuỗi, không còn ema_alpha cố định
+    assert meta["filter"]["smoothing_params"] == {n: web.SMOOTHING_PARAMS[n] for n in stages}
+    assert "ema_alpha" not in meta["filter"]
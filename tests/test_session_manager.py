@@ -0,0 +1,65 @@
+"""MeasureSession: dừng đo phải giữ đủ dữ liệu, kể cả frame fusion còn chờ EMG."""
+import numpy as np
+
+from imu_ingest.clock_sync import ClockSync
+from imu_ingest.fusion import FusionStage
+from imu_ingest.kinematics import SOLVERS
+from imu_ingest.parser import REC_EMG, REC_IMU, encode_frame
+from imu_ingest.pipeline import IngestPipeline
+from imu_ingest.reader import PortBinding, PortReader
+from imu_ingest.smoothing import JointFilters
+from session_manager import MeasureSession
+
+FILTER_PARAMS = {"cross_th": 10.0, "pitch_mid": 90.0, "pitch_hys": 5.0, "deadzone": 0.0}
+
+
+class NullBroadcaster:
+    def push(self, latest, samples):
+        pass
+
+
+class FakeHub:
+    def __init__(self):
+        self.released = []
+
+    def release(self, port):
+        self.released.append(port)
+
+
+def make_session(**params):
+    return MeasureSession("rig1", NullBroadcaster(), {**FILTER_PARAMS, **params},
+                          lambda: JointFilters("ema", {"ema": {"alpha": 1.0}}))
+
+
+def device_chunks(t1, emg_until):
+    """(t_ms, bytes) mỗi 10 ms: 4 IMU tới t1, EMG @ 1 kHz chỉ tới emg_until (ms)."""
+    for t in range(0, t1, 10):
+        chunk = encode_frame(REC_IMU, [(sid, t, 0.0, sid * 5.0, 90.0) for sid in range(1, 5)])
+        if t < emg_until:
+            chunk += encode_frame(REC_EMG, [(5, (t + k) * 1000, 1.0) for k in range(10)])
+        yield t, chunk
+
+
+def test_finish_drains_fusion_tail():
+    sess = make_session()
+    pipe = IngestPipeline(clock=ClockSync(), solver=SOLVERS["roll"],
+                          fusion=lambda sink: FusionStage(sink, 100.0))
+    reader = PortReader(ser=None, port="COM9", baud=115200, pipeline=pipe)
+    hub = FakeHub()
+    sess.begin()
+    reader.sink = sink = sess.append_block          # như SerialHub.bind
+    sess.attach(PortBinding(hub, reader, sink), "COM9")
+
+    # EMG dừng ở 909 ms, IMU tới 990 ms (< timeout): fusion giữ các frame sau 900 chờ EMG
+    for t_ms, chunk in device_chunks(1000, emg_until=910):
+        reader._on_chunk(chunk, t_ms / 1000.0)
+    assert pipe.fusion._next == 910.0
+
+    snap = sess.finish()
+    assert hub.released == ["COM9"]
+    assert reader.sink is None
+    np.testing.assert_allclose(snap.t_ms, np.arange(0.0, 1000.0, 10.0))
+    # frame sau mẫu EMG cuối: giữ góc, cột EMG = NaN
+    has_emg = snap.t_ms < 910.0
+    assert not np.isnan(snap.emg[has_emg]).any()
+    assert np.isnan(snap.emg[~has_emg]).all()
@@ -0,0 +1,71 @@
+"""SlidingRms (push / push_block, nhiều kênh) và block_rms khớp RMS cửa sổ trượt tính trực tiếp."""
+import numpy as np
+
+from imu_ingest.sliding_rms import SlidingRms, block_rms
+
+
+def naive_rms(x, window):
+    """RMS trailing `window` mẫu, các mẫu đầu lấy trên số mẫu đang có."""
+    x = np.asarray(x, dtype=np.float64).reshape(len(x), -1)
+    out = np.empty_like(x)
+    for i in range(len(x)):
+        seg = x[max(i + 1 - window, 0):i + 1]
+        out[i] = np.sqrt(np.mean(seg * seg, axis=0))
+    return out
+
+
+def emg(n, channels=1, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(n)[:, None]
+    return 200 * np.sin(2 * np.pi * 50 * t / 1000) * (1 + rng.uniform(0, 1, (n, channels))) + rng.normal(0, 5, (n, channels))
+
+
+def test_block_rms_matches_naive():
+    x = emg(1500, channels=3)
+    np.testing.assert_allclose(block_rms(x, 200), naive_rms(x, 200), rtol=1e-10)
+    np.testing.assert_allclose(block_rms(x[:, 0], 7), naive_rms(x[:, 0], 7)[:, 0], rtol=1e-10)
+    assert block_rms(x[:, 0], 7).shape == (1500,)
+    assert block_rms(np.empty(0), 10).shape == (0,)
+
+
+def test_push_matches_naive():
+    x = emg(800, seed=1)[:, 0]
+    rms = SlidingRms(window=50)
+    got = np.array([rms.push(v)[0] for v in x])
+    np.testing.assert_allclose(got, naive_rms(x, 50)[:, 0], rtol=1e-9)
+
+
+def test_push_block_any_split_matches_naive():
+    x = emg(3000, channels=2, seed=2)
+    expected = naive_rms(x, 200)
+    for bounds in ([1, 2, 3], [199, 200, 201], [37, 500, 1999, 2000], [2999]):
+        rms = SlidingRms(window=200, channels=2)
+        got = np.concatenate([rms.push_block(part) for part in np.split(x, bounds)])
+        np.testing.assert_allclose(got, expected, rtol=1e-9)
+
+
+def test_mixed_push_and_block():
+    x = emg(1000, seed=3)[:, 0]
+    rms = SlidingRms(window=64)
+    out = [rms.push_block(x[:10])[:, 0]]
+    out.append([rms.push(v)[0] for v in x[10:300]])
+    out.append(rms.push_block(x[300:900])[:, 0])
+    out.append([rms.push(v)[0] for v in x[900:]])
+    np.testing.assert_allclose(np.concatenate(out), naive_rms(x, 64)[:, 0], rtol=1e-9)
+    assert rms.push_block(np.empty(0)).shape == (0, 1)
+
+
+def test_long_run_does_not_drift():
+    # biên độ lớn rồi rất nhỏ: tổng chạy không được giữ sai số của đoạn lớn
+    x = np.concatenate((np.full(5000, 1e4), np.full(20_000, 1e-3)))
+    rms = SlidingRms(window=100, recompute_every=1000)
+    for v in x:
+        last = rms.push(v)[0]
+    assert abs(last - 1e-3) < 1e-9
+
+
+def test_reset():
+    rms = SlidingRms(window=10)
+    rms.push_block(np.full(50, 3.0))
+    rms.reset()
+    assert rms.push(4.0)[0] == 4.0
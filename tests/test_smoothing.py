@@ -0,0 +1,85 @@
+"""Nhánh không có scipy của smoothing/filter phải khớp scipy (hệ số, zi, lfilter theo block, filtfilt)."""
+import numpy as np
+import pytest
+
+from imu_ingest import filter as filter_mod
+from imu_ingest import smoothing
+
+scipy_signal = pytest.importorskip("scipy.signal")
+
+
+@pytest.fixture
+def no_scipy(monkeypatch):
+    for name in ("butter", "filtfilt", "lfilter", "lfilter_zi"):
+        monkeypatch.setattr(smoothing, name, None)
+    monkeypatch.setattr(filter_mod, "lfilter", None)
+
+
+@pytest.fixture(scope="module")
+def signal():
+    rng = np.random.default_rng(7)
+    t = np.arange(2_000) / 100.0
+    return 40 * np.sin(2 * np.pi * 0.8 * t) + 60 + rng.normal(0, 3, len(t))
+
+
+@pytest.mark.parametrize("cutoff", [1.0, 6.0, 20.0, 45.0])
+def test_butter_coefficients_match_scipy(no_scipy, cutoff):
+    b, a = smoothing.butter_lowpass(cutoff, 100.0)
+    sb, sa = scipy_signal.butter(2, cutoff / 50.0)
+    np.testing.assert_allclose(b, sb, rtol=1e-12, atol=1e-15)
+    np.testing.assert_allclose(a, sa, rtol=1e-12, atol=1e-15)
+
+
+def test_butter_without_scipy_rejects_other_orders(no_scipy):
+    with pytest.raises(ValueError):
+        smoothing.butter_lowpass(6.0, 100.0, order=4)
+    with pytest.raises(ValueError):
+        smoothing.butter_lowpass(60.0, 100.0)
+
+
+@pytest.mark.parametrize("order", [2, 4])
+def test_steady_state_zi_matches_scipy(no_scipy, order):
+    b, a = scipy_signal.butter(order, 0.12)
+    np.testing.assert_allclose(smoothing.steady_state_zi(b, a), scipy_signal.lfilter_zi(b, a),
+                               rtol=1e-10, atol=1e-12)
+    # đầu vào hằng + zi dừng -> đầu ra hằng ngay từ mẫu đầu
+    y, _ = smoothing.lfilter_block(b, a, np.full(50, 3.0), smoothing.steady_state_zi(b, a) * 3.0)
+    np.testing.assert_allclose(y, 3.0, rtol=1e-10)
+
+
+def test_lfilter_block_streams_like_scipy(no_scipy, signal):
+    b, a = smoothing.butter_lowpass(6.0, 100.0)
+    zi0 = smoothing.steady_state_zi(b, a) * signal[0]
+    expected, _ = scipy_signal.lfilter(b, a, signal, zi=zi0)
+
+    zi, parts = zi0, []
+    for block in np.array_split(signal, [1, 2, 64, 65, 700, 1999]):
+        y, zi = smoothing.lfilter_block(b, a, block, zi)
+        parts.append(y)
+    np.testing.assert_allclose(np.concatenate(parts), expected, rtol=1e-10, atol=1e-9)
+
+
+def test_butterworth_filter_blocks_equal_whole(no_scipy, signal):
+    whole = smoothing.ButterworthFilter(6.0, 100.0).block(signal)
+    f = smoothing.ButterworthFilter(6.0, 100.0)
+    parts = [f.block(b) for b in np.array_split(signal, 37)]
+    np.testing.assert_allclose(np.concatenate(parts), whole, rtol=1e-12)
+    assert f.block(np.empty(0)).shape == (0,)
+
+
+def test_zero_phase_lowpass_matches_filtfilt(no_scipy, signal):
+    b, a = scipy_signal.butter(2, 6.0 / 50.0)
+    expected = scipy_signal.filtfilt(b, a, signal, padlen=9)
+    np.testing.assert_allclose(smoothing.zero_phase_lowpass(signal, 6.0, 100.0), expected,
+                               rtol=1e-9, atol=1e-9)
+    short = signal[:9]
+    np.testing.assert_array_equal(smoothing.zero_phase_lowpass(short, 6.0, 100.0), short)
+
+
+def test_ema_block_fallback_matches_step(no_scipy, signal):
+    f = smoothing.EmaFilter(0.3)
+    steps = [f.step(v) for v in signal.tolist()]
+    g = smoothing.EmaFilter(0.3)
+    parts = [g.block(b) for b in np.array_split(signal, 13)]
+    np.testing.assert_allclose(np.concatenate(parts), steps, rtol=1e-12)
+    assert g.y == pytest.approx(f.y)
@@ -1,48 +1,54 @@
 
 # webgiaodien.py
-import os, json, time, math, io, csv, threading
+import os, time, base64
 from datetime import datetime, timezone, timedelta
 from uuid import uuid4
-from collections import defaultdict, deque
 
-from flask import Flask, request, jsonify, render_template_string, redirect, url_for, flash, send_file
+from flask import Flask, Response, request, jsonify, render_template, redirect, url_for, flash, send_file
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 
-from flask_socketio import SocketIO, emit
+import socketio
+
+import database
+from aio_runtime import AsyncRuntime
+from asgi_server import build_asgi, serve
+from broadcaster import ImuBroadcaster, SocketEmitter
+from exporter import content_disposition, iter_csv, iter_gzip, iter_tee, pack_float32
+from imu_ingest import (
+    PORT_HINTS, SOLVERS, ClockSync, FusionStage, IngestPipeline, SerialHub,
+    clamp, norm_deg, to_block,
+)
+from imu_ingest.smoothing import JointFilters
+from page_assets import PageAssets
+from session_archive import SESSION_DIR, list_sessions, load_session, save_session
+from session_manager import SessionManager, room_for
+from session_store import SESSION_COLUMNS, SessionSnapshot
 
 # =========================
 #   GLOBALS / CONSTANTS
 # =========================
 VN_TZ = timezone(timedelta(hours=7))
 
-DATA_LOCK = threading.Lock()
-MAX_LOCK  = threading.Lock()
-EMG_LOCK  = threading.Lock()
-VAS_LOCK  = threading.Lock()
-RECORD_LOCK = threading.Lock()
-
-data_buffer = []          # samples đang đo
-LAST_SESSION = []         # samples phiên gần nhất
+# State đo (buffer, lọc, max, thiết bị) nằm trong từng MeasureSession, xem SESSIONS
+DEFAULT_RIG = os.environ.get("DEFAULT_RIG", "default")
 
-MAX_ANGLES = {"hip": 0.0, "knee": 0.0, "ankle": 0.0}
+# EMG: đọc cùng cổng serial, resample + RMS/envelope trong fusion.FusionStage (FUSION_HZ)
 
-EMG_BUF = deque(maxlen=200)     # RMS window ~200 mẫu
-EMG_ENV = 0.0
-EMG_ALPHA = 0.1
+VAS_FILE  = "vas.jsonl"             # append-only, xem database.VasStore
+VAS = database.VasStore(VAS_FILE)
 
-LAST_EMG = {"emg": None}        # giữ EMG gần nhất (object {v,t_ms,sender_id})
+RECORD_FILE  = "records.json"       # file cũ, chỉ dùng để migrate
+RECORD_JOURNAL = "records.jsonl"    # append-only, xem database.RecordJournal
 
-VAS_STORE = []
-VAS_FILE  = "vas.json"
-
-RECORD_STORE = []
-RECORD_FILE  = "records.json"
-
-PATIENTS_FILE = "sample.json"
 EXPORT_DIR = "exports"
 os.makedirs(EXPORT_DIR, exist_ok=True)
 
+# Số điểm tối đa/series gửi cho chart (downsample LTTB phía server)
+CHART_MAX_POINTS = int(os.environ.get("CHART_MAX_POINTS", "2000"))
+CHART_PREVIEW_POINTS = int(os.environ.get("CHART_PREVIEW_POINTS", "300"))
+TILE_POINTS      = int(os.environ.get("CHART_TILE_POINTS", "500"))
+
 # ========== SERIAL ==========
 SERIAL_ENABLED = True
 
@@ -54,10 +60,6 @@ try:
 except Exception:
     SERIAL_ENABLED = False
 
-ser = None
-serial_thread = None
-stop_serial_thread = False
-
 
 # =========================
 #   SIMPLE HTML PLACEHOLDER
@@ -96,44 +98,21 @@ EMG_CHART_HTML = """<!doctype html><html><body><h3>EMG Charts</h3></body></html>
 # =========================
 #   HELPERS
 # =========================
-def _ensure_patients_file():
-    if not os.path.exists(PATIENTS_FILE):
-        with open(PATIENTS_FILE, "w", encoding="utf-8") as f:
-            json.dump({}, f, ensure_ascii=False, indent=2)
-
 def gen_patient_code(full_name: str) -> str:
     last = (full_name.split()[-1] if full_name else "BN")
     base = "".join(ch for ch in last if ch.isalnum())
     suffix = datetime.now().strftime("%m%d%H%M")
     return f"{base}{suffix}"
 
-def norm_deg(x: float) -> float:
-    while x > 180:
-        x -= 360
-    while x < -180:
-        x += 360
-    return x
-
-def clamp(val, lo, hi):
-    return max(lo, min(hi, val))
-
-def emg_rms(buf):
-    if not buf:
-        return 0.0
-    return math.sqrt(sum(x*x for x in buf) / len(buf))
-
-def reset_max_angles():
-    with MAX_LOCK:
-        MAX_ANGLES["hip"] = 0.0
-        MAX_ANGLES["knee"] = 0.0
-        MAX_ANGLES["ankle"] = 0.0
+def safe_code(s: str) -> str:
+    return "".join(ch for ch in (s or "") if ch.isalnum() or ch in ("-", "_"))
 
 def auto_detect_port():
     if not list_ports:
         return None
     ports = list(list_ports.comports())
     for p in ports:
-        if any(x in (p.description or "").upper() for x in ["USB", "ACM", "CP210", "CH340", "UART", "SERIAL"]):
+        if any(x in (p.description or "").upper() for x in PORT_HINTS):
             return p.device
     return ports[0].device if ports else None
 
@@ -141,318 +120,111 @@ def auto_detect_port():
 # =========================
 #   HIP STATE (pitch2)
 # =========================
-HIP_STATE    = {"mode": "front", "prev_pitch2": 0.0}
 PITCH_MID    = 90.0
 PITCH_HYS    = 10.0
 HIP_CROSS_TH = 40.0
 DEADZONE     = 2.0
 
+# Góc khớp từ serial: "quat" = quaternion tương đối giữa các segment (hip có dấu,
+# không cần heuristic pitch2 ở trên); "roll" = hiệu roll Euler như trước
+KINEMATICS = os.environ.get("KINEMATICS", "quat")
+
+def filter_params():
+    """Tham số process_block cho 1 session mới."""
+    return {
+        "cross_th": HIP_CROSS_TH,
+        "pitch_mid": PITCH_MID,
+        "pitch_hys": PITCH_HYS,
+        "deadzone": DEADZONE,
+        # nguồn có hip đã mang dấu (quat solver trên serial); /api/imu gửi hiệu roll -> heuristic pitch2
+        "signed_hip": ("serial",) if KINEMATICS == "quat" else (),
+    }
 
-# =========================
-#   SMOOTH FILTER
-# =========================
-_SMOOTH_STATE = {"hip": 0.0, "knee": 0.0, "ankle": 0.0}
-_SMOOTH_ALPHA = {"hip": 0.25, "knee": 0.25, "ankle": 0.25}
-
-def _smooth(key: str, x: float) -> float:
-    a = _SMOOTH_ALPHA.get(key, 0.25)
-    prev = _SMOOTH_STATE.get(key, x)
-    y = a * x + (1 - a) * prev
-    _SMOOTH_STATE[key] = y
-    return y
+# Làm mượt góc live: "ema" | "one_euro" (ít trễ khi chuyển động) | "butter",
+# nối chuỗi bằng "+", vd "butter+one_euro". Chart offline: ?lowpass=<Hz> (Butterworth 2 chiều)
+SMOOTHING = os.environ.get("SMOOTHING", "ema")
+ALPHA = float(os.environ.get("SMOOTH_ALPHA", "0.3"))
+SMOOTHING_PARAMS = {
+    "ema": {"alpha": ALPHA},
+    "one_euro": {
+        "min_cutoff": float(os.environ.get("ONE_EURO_MIN_CUTOFF", "1.0")),
+        "beta": float(os.environ.get("ONE_EURO_BETA", "0.02")),
+    },
+    "butter": {
+        "cutoff_hz": float(os.environ.get("BUTTER_CUTOFF_HZ", "6")),
+        "fs_hz": float(os.environ.get("BUTTER_FS_HZ", "100")),   # = FUSION_HZ khi bật fusion
+    },
+}
+LOWPASS_ORDER = 2
 
+def make_filters():
+    """State làm mượt hip/knee/ankle cho 1 nguồn dữ liệu của 1 session."""
+    return JointFilters(SMOOTHING, SMOOTHING_PARAMS)
 
-# =========================
-#   SERIAL PARSER
-# =========================
-def parse_serial_line(line: str):
-    # IMU,sender_id,timestamp_ms,yaw,roll,pitch
-    # EMG,sender_id,timestamp_us,emg_clean
-    parts = [p.strip() for p in line.strip().split(",") if p.strip() != ""]
-    if not parts:
-        return None
+def smoothing_params():
+    """Tham số của các bộ lọc trong chuỗi SMOOTHING đang dùng (ghi vào metadata phiên)."""
+    names = [s.strip() for s in SMOOTHING.split("+") if s.strip()]
+    return {name: dict(SMOOTHING_PARAMS.get(name, {})) for name in names}
 
-    tag = parts[0].upper()
-
-    try:
-        if tag == "IMU" and len(parts) >= 6:
-            sender_id = int(parts[1])
-            ts = int(float(parts[2]))  # đôi khi gửi "123.0"
-            yaw = float(parts[3])
-            roll = float(parts[4])
-            pitch = float(parts[5])
-            return ("imu", sender_id, ts, yaw, roll, pitch)
-
-        #if tag == "EMG" and len(parts) >= 4:
-            #sender_id = int(parts[1])
-            #ts_us = int(float(parts[2]))
-            #emg_clean = float(parts[3])
-            #return ("emg", sender_id, ts_us, emg_clean)
-    except Exception:
-        return None
-
-    return None
+# sender_id -> đoạn chi (hip = roll2-roll1, knee = roll3-roll2, ankle = -roll4-roll3)
+SENSOR_LAYOUT = {1: "pelvis", 2: "thigh", 3: "shank", 4: "foot", 5: "emg"}
 
 
 # =========================
-#   SERIAL START/STOP (FIX PermissionError)
+#   SERIAL HUB (1 reader / cổng, session gắn vào cổng khi đo)
 # =========================
-def stop_serial_reader():
-    global ser, serial_thread, stop_serial_thread
-    stop_serial_thread = True
-
-    # đóng port trước để tránh ClearCommError / Access denied
-    try:
-        if ser is not None:
-            try:
-                ser.close()
-            except Exception:
-                pass
-    finally:
-        ser = None
-
-    # join thread
-    try:
-        if serial_thread and serial_thread.is_alive():
-            serial_thread.join(timeout=1.0)
-    except Exception:
-        pass
-
-    serial_thread = None
-    return True
-
-
-def start_serial_reader(port=None, baud=115200):
-    """Đọc serial và gọi append_samples(); timestamp đồng nhất theo host time (ms)."""
-    global ser, serial_thread, stop_serial_thread
-
-    if not SERIAL_ENABLED or pyserial is None:
-        print("[SERIAL] pyserial not available")
-        return False
-
-    if not port:
-        port = os.environ.get("SERIAL_PORT") or auto_detect_port()
+# 1 event loop asyncio dùng chung: đọc serial (add_reader trên fd) + queue/emit imu_data
+RUNTIME = AsyncRuntime()
+SERIAL_ASYNC = os.environ.get("SERIAL_ASYNC", "1") in ("1", "true", "yes")
+
+SERIAL_LINGER_S = float(os.environ.get("SERIAL_LINGER_S", "30"))
+CLOCK_SYNC = os.environ.get("CLOCK_SYNC", "1") in ("1", "true", "yes")
+FUSION_HZ = float(os.environ.get("FUSION_HZ", "100"))     # 0 -> lưu mẫu IMU thô, bỏ EMG
+EMG_RMS_WINDOW = int(os.environ.get("EMG_RMS_WINDOW", "200"))   # mẫu EMG (~200 ms @ 1 kHz)
+EMG_ALPHA = float(os.environ.get("EMG_ALPHA", "0.1"))           # EMA envelope trên RMS
+EMG_RMS_WINDOW_MS = float(os.environ.get("EMG_RMS_WINDOW_MS", "200"))  # tính lại offline (chart)
+
+def make_fusion(sink):
+    return FusionStage(sink, FUSION_HZ, emg_rms_window=EMG_RMS_WINDOW, emg_alpha=EMG_ALPHA)
+
+def make_pipeline():
+    """1 IngestPipeline / cổng: parser -> clock -> kinematics -> fusion -> sink (gắn khi bind)."""
+    return IngestPipeline(
+        clock=ClockSync() if CLOCK_SYNC else None,
+        solver=SOLVERS[KINEMATICS],
+        fusion=make_fusion if FUSION_HZ > 0 else None,
+    )
 
-    if not port:
-        print("Không tìm thấy cổng serial nào.")
-        return False
+SERIAL_HUB = SerialHub(
+    pyserial, list_ports,
+    runtime=RUNTIME if SERIAL_ASYNC else None,
+    linger_s=SERIAL_LINGER_S,
+    pipeline=make_pipeline,
+) if SERIAL_ENABLED else None
 
-    # đảm bảo không mở chồng
-    stop_serial_reader()
-
-    try:
-        ser = pyserial.Serial(port, baud, timeout=0.5)
-        # clear buffers
-        try:
-            ser.reset_input_buffer()
-            ser.reset_output_buffer()
-        except Exception:
-            pass
-        print(f"✅ Đã mở {port} @ {baud}")
-    except Exception as e:
-        print("❌ Không mở được cổng serial:", e)
-        return False
-
-    stop_serial_thread = False
-    last_angles = defaultdict(lambda: {"yaw": 0.0, "roll": 0.0, "pitch": 0.0, "ts": 0.0})
-
-    def reader_loop():
-        print(f"📥 Đang đọc dữ liệu từ {port} @ {baud} ...")
-        global stop_serial_thread
-
-        while not stop_serial_thread:
-            try:
-                raw = ser.readline()
-                if not raw:
-                    continue
-
-                line = raw.decode("utf-8", errors="ignore").strip()
-                if not line:
-                    continue
-
-                parsed = parse_serial_line(line)
-                if not parsed:
-                    continue
-
-                ptype = parsed[0]
-                now_ms = time.time() * 1000.0  # ✅ timebase CHUNG
-
-                if ptype == "imu":
-                    _, sid, ts, yaw, roll, pitch = parsed
-
-                    last_angles[sid] = {
-                        "yaw": yaw, "roll": roll, "pitch": pitch, "ts": ts
-                    }
-
-                    p1 = last_angles.get(1, {}).get("roll", 0.0)
-                    p2 = last_angles.get(2, {}).get("roll", 0.0)
-                    p3 = last_angles.get(3, {}).get("roll", 0.0)
-                    p4 = -last_angles.get(4, {}).get("roll", 0.0)
-                    pitch2 = last_angles.get(2, {}).get("pitch", 0.0)
-
-                    raw_hip = norm_deg(p2 - p1)
-                    raw_knee = norm_deg(p3 - p2)
-                    raw_ankle = norm_deg(p4 - p3)
-
-                    append_samples([{
-                        "t_ms": now_ms,
-                        "hip": raw_hip,
-                        "knee": raw_knee,
-                        "ankle": raw_ankle,
-                        "pitch2": pitch2
-                    }])
-
-                #elif ptype == "emg":
-                    #_, sender_id, ts_us, emg_clean = parsed
-                    #emg_rect = abs(float(emg_clean))
-
-                    #emg_entry = {
-                        #"v": emg_rect,
-                        #"t_ms": now_ms,
-                        #"sender_id": int(sender_id)
-                    #}
-
-                    #with EMG_LOCK:
-                        #EMG_BUF.append(emg_rect)
-                        #LAST_EMG["emg"] = emg_entry
-
-            except Exception as e:
-                # nếu port bị rút ra hoặc bị close, thoát vòng lặp
-                msg = str(e)
-                print("Serial read error:", e)
-                if "ClearCommError" in msg or "Access is denied" in msg:
-                    break
-
-        print("🛑 Dừng đọc serial")
-
-    serial_thread = threading.Thread(target=reader_loop, daemon=True)
-    serial_thread.start()
-    return True
+if SERIAL_HUB is not None and os.environ.get("SERIAL_HUB_AUTOSTART", "0") in ("1", "true", "yes"):
+    SERIAL_HUB.open_all()
 
 
 # =========================
-#   APPEND SAMPLES + EMIT
+#   APPEND SAMPLES
 # =========================
-def append_samples(samples):
-    """Xử lý hip/knee/ankle + sync EMG, rồi emit socket 'imu_data'."""
-    global EMG_ENV, HIP_STATE
-
-    SYNC_WIN_MS = 80       # ✅ rộng hơn chút để chắc ăn khi PC lag
-    EMG_SENSOR_ID = 5
-
-    for s in samples:
-        t_ms = float(s.get("t_ms", time.time() * 1000.0))
-
-        raw_hip = float(s.get("hip", 0.0))
-        knee    = float(s.get("knee", 0.0))
-        ankle   = float(s.get("ankle", 0.0))
-        pitch2  = float(s.get("pitch2", 0.0))
-
-        # ---- hip sign theo pitch2
-        mode = HIP_STATE.get("mode", "front")
-        if abs(raw_hip) < HIP_CROSS_TH:
-            if pitch2 <= (PITCH_MID - PITCH_HYS):
-                mode = "front"
-            elif pitch2 >= (PITCH_MID + PITCH_HYS):
-                mode = "back"
-        HIP_STATE["mode"] = mode
-        sign_front = 1 if mode == "front" else -1
-
-        mag_hip = abs(raw_hip)
-        hip = 0.0 if mag_hip < DEADZONE else sign_front * mag_hip
-
-        hip   = clamp(hip,  -30.1, 122.1)
-        knee  = clamp(abs(knee),   0, 134)
-        ankle = clamp(abs(ankle), 36, 113)
-
-        hip   = _smooth("hip", hip)
-        knee  = _smooth("knee", knee)
-        ankle = _smooth("ankle", ankle)
-
-        # ---- max angles
-        with MAX_LOCK:
-            if hip   > MAX_ANGLES["hip"]:   MAX_ANGLES["hip"]   = hip
-            if knee  > MAX_ANGLES["knee"]:  MAX_ANGLES["knee"]  = knee
-            if ankle > MAX_ANGLES["ankle"]: MAX_ANGLES["ankle"] = ankle
-
-            max_payload = {
-                "maxHip":   MAX_ANGLES["hip"],
-                "maxKnee":  MAX_ANGLES["knee"],
-                "maxAnkle": MAX_ANGLES["ankle"],
-            }
-
-        # ---- sync EMG: lấy LAST_EMG gần nhất theo host-time
-        #emg_v = None
-        #emg_id = None
-
-        #with EMG_LOCK:
-            #emg = LAST_EMG.get("emg")
-
-        #if emg:
-            #try:
-                #emg_id = int(emg.get("sender_id", -1))
-                #if emg_id == EMG_SENSOR_ID:
-                    #if abs(float(emg.get("t_ms", 0)) - t_ms) <= SYNC_WIN_MS:
-                        #emg_v = float(emg.get("v", 0.0))
-            #except Exception:
-                #emg_v = None
-                #emg_id = None
-
-        # ---- RMS & envelope (nếu có emg_v)
-        #if emg_v is not None:
-            #rms = emg_rms(EMG_BUF)
-            #EMG_ENV = EMG_ALPHA * rms + (1 - EMG_ALPHA) * EMG_ENV
-            #max_payload["emg"] = emg_v                 # ✅ emg là SỐ (frontend vẽ được)
-            #max_payload["sender_id"] = emg_id          # ✅ cho JS lọc sensor 5
-            #max_payload["emg_id"] = emg_id
-            #max_payload["emg_rms"] = rms
-            #max_payload["emg_env"] = EMG_ENV
-
-        # ---- lưu buffer
-        with DATA_LOCK:
-            data_buffer.append({
-                "t_ms": t_ms,
-                "hip": hip,
-                "knee": knee,
-                "ankle": ankle,
-                #"emg": max_payload.get("emg"),
-                #"emg_id": max_payload.get("emg_id"),
-                #"emg_rms": max_payload.get("emg_rms"),
-                #"emg_env": max_payload.get("emg_env"),
-            })
-
-        # ---- emit ra UI
-        socketio.emit("imu_data", {
-            "t": t_ms,
-            "hip": hip,
-            "knee": knee,
-            "ankle": ankle,
-            **max_payload
-        })
-
-
-# =========================
-#   RECORDS LOAD/SAVE
-# =========================
-def load_records_from_file():
-    global RECORD_STORE
-    try:
-        with open(RECORD_FILE, "r", encoding="utf-8") as f:
-            RECORD_STORE = json.load(f)
-            if not isinstance(RECORD_STORE, list):
-                RECORD_STORE = []
-    except FileNotFoundError:
-        RECORD_STORE = []
-    except Exception as e:
-        print("[WARN] load_records_from_file error:", e)
-        RECORD_STORE = []
-
-def save_records_to_file():
-    try:
-        with open(RECORD_FILE, "w", encoding="utf-8") as f:
-            json.dump(RECORD_STORE, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        print("[WARN] save_records_to_file error:", e)
+def append_samples(sess, samples, source="http"):
+    """Gom list dict {t_ms,hip,knee,ankle,pitch2} thành 1 block rồi sess.append_block()."""
+    if not samples:
+        return
+
+    now_ms = time.time() * 1000.0
+    sess.append_block(to_block([
+        (
+            float(s.get("t_ms", now_ms)),
+            float(s.get("hip", 0.0)),
+            float(s.get("knee", 0.0)),
+            float(s.get("ankle", 0.0)),
+            float(s.get("pitch2", 0.0)),
+        )
+        for s in samples
+    ]), source)
 
 
 # =========================
@@ -461,18 +233,79 @@ def save_records_to_file():
 app = Flask(__name__)
 app.secret_key = "CHANGE_ME"
 
-socketio = SocketIO(
-    app,
+# Socket.IO chạy trong loop của RUNTIME (ASGI, xem asgi_server.py): mỗi kết nối là
+# 1 task asyncio, không giữ thread; view Flask chạy trong thread pool WEB_THREADS
+sio = socketio.AsyncServer(
+    async_mode="asgi",
     cors_allowed_origins="*",
     ping_interval=10,
     ping_timeout=30,
-    async_mode="threading",
 )
+SOCKETS = SocketEmitter(sio, RUNTIME)   # emit từ thread (view Flask)
+WEB_THREADS = int(os.environ.get("WEB_THREADS", "32"))
+asgi_app = build_asgi(app, sio, RUNTIME, workers=WEB_THREADS)
+
+# Mỗi rig 1 MeasureSession + 1 broadcaster emit vào room riêng của rig.
+# imu_data: tối đa IMU_EMIT_HZ frame/giây; "packed" gửi kèm mọi mẫu từ frame trước
+IMU_EMIT_HZ   = float(os.environ.get("IMU_EMIT_HZ", "30"))
+IMU_EMIT_MODE = os.environ.get("IMU_EMIT_MODE", "packed")
+# client còn >= IMU_CLIENT_BACKLOG gói chưa gửi (mạng chậm) -> bỏ qua client đó ở frame hiện tại
+IMU_CLIENT_BACKLOG = int(os.environ.get("IMU_CLIENT_BACKLOG", "16"))
+
+SESSIONS = SessionManager(
+    lambda room: ImuBroadcaster(sio, RUNTIME, rate_hz=IMU_EMIT_HZ, mode=IMU_EMIT_MODE, room=room,
+                                max_client_backlog=IMU_CLIENT_BACKLOG),
+    filter_params,
+    make_filters,
+)
+
+def rig_key():
+    """Rig của request: tham số 'rig' (query/JSON), mặc định là user đang đăng nhập."""
+    data = request.get_json(silent=True)
+    rig = request.args.get("rig") or (data.get("rig") if isinstance(data, dict) else None)
+    rig = safe_code(rig)
+    if rig:
+        return rig
+    if current_user.is_authenticated:
+        return current_user.id
+    return None
+
+def current_session():
+    """MeasureSession của request hiện tại (tạo mới nếu chưa có)."""
+    owner = current_user.id if current_user.is_authenticated else None
+    return SESSIONS.get_or_create(rig_key() or DEFAULT_RIG, owner=owner)
+
+def start_measurement(sess, port=None, baud=115200):
+    """Bắt đầu phiên cho sess, mở cổng serial nếu có; trả (ok, http_status, msg)."""
+    if not SERIAL_ENABLED:
+        sess.begin()
+        return True, 200, "noserial"
 
-@socketio.on("connect")
-def _on_connect():
-    print("[SOCKET] client connected")
-    emit("imu_data", {"t": time.time() * 1000, "hip": 0, "knee": 0, "ankle": 0})
+    port = port or os.environ.get("SERIAL_PORT") or auto_detect_port()
+    if not port:
+        return False, 500, "Không tìm thấy cổng serial nào."
+
+    owner = SESSIONS.device_owner(port)
+    if owner not in (None, sess.key):
+        return False, 409, f"Cổng {port} đang được rig '{owner}' sử dụng"
+
+    sess.detach()   # gỡ cổng cũ của session trước khi gắn lại
+    sess.begin()
+    binding = SERIAL_HUB.bind(port, sess.append_block, baud)
+    if binding is None:
+        sess.started_at = None
+        return False, 500, f"Không mở được cổng serial (port={port})"
+    SESSIONS.bind_device(sess, port, binding)
+    return True, 200, "serial"
+
+@sio.event
+async def connect(sid, environ, auth=None):
+    # environ của engineio đủ cho Flask: đọc ?rig= và cookie đăng nhập như 1 request thường
+    with app.request_context(environ):
+        key = rig_key() or DEFAULT_RIG
+    await sio.enter_room(sid, room_for(key))
+    print("[SOCKET] client connected, rig =", key)
+    await sio.emit("imu_data", {"t": time.time() * 1000, "hip": 0, "knee": 0, "ankle": 0}, to=sid)
 
 
 # =========================
@@ -513,7 +346,7 @@ def login():
             login_user(User(u))
             return redirect(url_for("dashboard"))
         error_message = "Sai tài khoản hoặc mật khẩu"
-    return render_template_string(LOGIN_HTML, error_message=error_message)
+    return render_template("login.html", error_message=error_message)
 
 @app.route("/logout")
 @login_required
@@ -524,18 +357,18 @@ def logout():
 @app.route("/")
 @login_required
 def dashboard():
-    return render_template_string(DASH_HTML, username=current_user.id, videos=EXERCISE_VIDEOS)
+    return render_template("dashboard.html", username=current_user.id, videos=EXERCISE_VIDEOS)
 
 @app.route("/settings")
 @login_required
 def settings_page():
-    return render_template_string(SETTINGS_HTML, username=current_user.id)
+    return render_template("settings.html", username=current_user.id)
 
 @app.route("/calibration")
 @login_required
 def calibration():
     open_guide = request.args.get("guide", "0") in ("1", "true", "yes")
-    return render_template_string(CALIBRATION_HTML, username=current_user.id, open_guide=open_guide)
+    return render_template("calibration.html", username=current_user.id, open_guide=open_guide)
 
 @app.route("/ports")
 @login_required
@@ -548,50 +381,218 @@ def ports():
 @app.post("/session/start")
 @login_required
 def session_start():
-    global data_buffer
-    data_buffer = []
-    reset_max_angles()
-
-    if SERIAL_ENABLED:
-        port = os.environ.get("SERIAL_PORT") or "/dev/ttyUSB0"
-        baud = int(os.environ.get("SERIAL_BAUD", "115200"))
-        ok = start_serial_reader(port=port, baud=baud)
-        if not ok:
-            return jsonify(ok=False, msg=f"Không mở được cổng serial (port={port})"), 500
-        return jsonify(ok=True, mode="serial", port=port, baud=baud)
+    sess = current_session()
+    data = request.get_json(silent=True) or {}
+    port = data.get("port") or os.environ.get("SERIAL_PORT") or "/dev/ttyUSB0"
+    baud = int(os.environ.get("SERIAL_BAUD", "115200"))
 
-    return jsonify(ok=True, mode="noserial")
+    ok, status, mode = start_measurement(sess, port=port, baud=baud)
+    if not ok:
+        return jsonify(ok=False, msg=mode), status
+    if mode == "serial":
+        return jsonify(ok=True, mode=mode, port=port, baud=baud, rig=sess.key)
+    return jsonify(ok=True, mode=mode, rig=sess.key)
 
 @app.post("/session/stop")
 @login_required
 def session_stop():
-    global LAST_SESSION
+    data = request.get_json(silent=True) or {}
+    sess = current_session()
+    snap = sess.finish()
+
+    print(f"[SESSION STOP] rig={sess.key} saved {len(snap)} samples")
+
+    session_id = None
+    if len(snap):
+        session_id = archive_session(
+            snap,
+            patient_code=(data.get("patient_code") or "").strip(),
+            exercise_name=(data.get("exercise_name") or "").strip(),
+        )
+    return jsonify(ok=True, msg="Đã kết thúc phiên đo", session_id=session_id, rig=sess.key)
+
+def archive_session(snap, patient_code="", exercise_name=""):
+    """Lưu phiên vừa dừng ra SESSION_DIR (.npy + .json) và ghi vào Exercise của bệnh nhân."""
+    now = datetime.now(VN_TZ)
+    ts = now.strftime("%Y%m%d_%H%M%S")
+    session_id = f"{safe_code(patient_code) or 'imu'}_{ts}_{uuid4().hex[:6]}"
+
+    try:
+        meta = save_session(session_id, snap, {
+            "patient_code": patient_code or None,
+            "exercise_name": exercise_name or None,
+            "exercise_region": _exercise_region_from_name(exercise_name),
+            "created_at": now.strftime("%Y-%m-%d %H:%M:%S"),
+            "sensor_layout": SENSOR_LAYOUT,
+            "filter": {
+                "smoothing": SMOOTHING,
+                "smoothing_params": smoothing_params(),
+                "deadzone": DEADZONE,
+                "hip_cross_th": HIP_CROSS_TH,
+                "pitch_mid": PITCH_MID,
+                "pitch_hys": PITCH_HYS,
+            },
+        })
+    except Exception as e:
+        print("[WARN] cannot archive session:", e)
+        return None
+
+    if patient_code:
+        try:
+            database.add_patient_exercise(patient_code, ts, {
+                "archive_file": os.path.join(SESSION_DIR, session_id + ".npy"),
+                "exercise_name": exercise_name,
+                "export_time": ts,
+                "n_samples": meta["n_samples"],
+                "session_id": session_id,
+            })
+        except Exception as e:
+            print("[WARN] cannot link session to patient:", e)
+
+    return session_id
+
+@app.get("/api/sessions")
+@login_required
+def api_sessions():
+    patient_code = request.args.get("patient_code", "").strip()
+    return jsonify(sessions=list_sessions(patient_code or None))
+
+@app.get("/api/rigs")
+@login_required
+def api_rigs():
+    return jsonify(rigs=SESSIONS.sessions())
+
+@app.get("/api/serial/hub")
+@login_required
+def api_serial_hub():
+    """Các cổng đang mở: throughput (bytes/s, rows/s) + bộ đếm drop/lỗi theo cổng."""
+    if SERIAL_HUB is None:
+        return jsonify(enabled=False, ports=[])
+    return jsonify(enabled=True, ports=SERIAL_HUB.stats())
+
+@app.post("/api/serial/hub/open")
+@login_required
+def api_serial_hub_open():
+    """Mở toàn bộ cổng (SERIAL_PORTS / SERIAL_PORTS_FILE / comports) và giữ mở."""
+    if SERIAL_HUB is None:
+        return jsonify(ok=False, msg="pyserial not available"), 500
+    data = request.get_json(silent=True) or {}
+    opened = SERIAL_HUB.open_all(data.get("config"))
+    return jsonify(ok=True, opened=opened, ports=SERIAL_HUB.stats())
+
+def session_snapshot(session_id=None):
+    """Snapshot phiên theo id (đọc từ archive, mmap) hoặc phiên vừa dừng của rig hiện tại."""
+    if not session_id:
+        return current_session().last
+    try:
+        snap, _ = load_session(session_id)
+        return snap
+    except Exception as e:
+        print("[WARN] cannot load session", session_id, e)
+        return SessionSnapshot.empty()
 
-    if SERIAL_ENABLED:
-        stop_serial_reader()
+@app.get("/api/session/tile")
+@login_required
+def api_session_tile():
+    """Tile chart theo mức zoom: phiên chia thành 2^z đoạn bằng nhau, trả đoạn thứ x."""
+    try:
+        z = min(max(int(request.args.get("z", 0)), 0), 24)
+        x = int(request.args.get("x", 0))
+        points = min(max(int(request.args.get("points", TILE_POINTS)), 3), 20000)
+    except ValueError:
+        return jsonify(ok=False, msg="z/x/points không hợp lệ"), 400
+    tiles = 1 << z
+    if not 0 <= x < tiles:
+        return jsonify(ok=False, msg="x ngoài khoảng [0, 2^z)"), 400
+
+    snap = session_snapshot(request.args.get("session", "").strip()).sorted()
+    span = snap.duration_s / tiles
+    t_from = x * span
+    t_to = None if x == tiles - 1 else (x + 1) * span  # tile cuối lấy cả mẫu cuối
+    series = snap.chart_series(max_points=points, t_from=t_from, t_to=t_to,
+                               method=request.args.get("method", "lttb"))
+    return jsonify(ok=True, z=z, x=x, t_from=t_from, t_to=(x + 1) * span,
+                   n_total=len(snap), **series)
+
+def series_page_args(session_id=None, **query):
+    """series_url + các bước tải (thô -> chi tiết) cho trang chart tải series bất đồng bộ."""
+    return {
+        "series_url": url_for("api_session_series", session_id=session_id or "last", **query),
+        "series_steps": [CHART_PREVIEW_POINTS, CHART_MAX_POINTS],
+    }
 
-    with DATA_LOCK:
-        LAST_SESSION = list(data_buffer)
-        data_buffer.clear()
+def _float_arg(name):
+    raw = request.args.get(name, "").strip()
+    return float(raw) if raw else None
 
-    print(f"[SESSION STOP] saved {len(LAST_SESSION)} samples")
-    return jsonify(ok=True, msg="Đã kết thúc phiên đo")
+@app.get("/api/session/<session_id>/series")
+@login_required
+def api_session_series(session_id):
+    """Series phiên dạng float32 little-endian: format=bin (mặc định) hoặc b64 (JSON).
+
+    session_id = "last" -> phiên vừa dừng. Lọc theo t_from/t_to (giây từ mẫu
+    đầu) hoặc tail (N giây cuối), points = số điểm tối đa (0 = tất cả),
+    columns = danh sách cột, cách nhau dấu phẩy. Với bin, các cột nối tiếp
+    nhau theo thứ tự header X-Series-Columns, mỗi cột X-Series-Length phần tử.
+    rms_window (ms) -> tính lại emg_rms/emg_env từ cột emg; cũng tự tính lại
+    (EMG_RMS_WINDOW_MS) khi phiên có emg nhưng thiếu emg_rms.
+    lowpass (Hz) -> lọc hip/knee/ankle bằng Butterworth 2 chiều (không trễ pha).
+    """
+    try:
+        t_from, t_to, tail = _float_arg("t_from"), _float_arg("t_to"), _float_arg("tail")
+        rms_window, lowpass = _float_arg("rms_window"), _float_arg("lowpass")
+        points = int(request.args.get("points", CHART_MAX_POINTS))
+    except ValueError:
+        return jsonify(ok=False, msg="t_from/t_to/tail/rms_window/lowpass/points không hợp lệ"), 400
+    columns = [c.strip() for c in request.args.get("columns", "").split(",") if c.strip()]
+    columns = columns or list(SESSION_COLUMNS)
+    if any(c not in SESSION_COLUMNS for c in columns):
+        return jsonify(ok=False, msg="cột không hợp lệ", columns=list(SESSION_COLUMNS)), 400
+
+    snap = session_snapshot(None if session_id == "last" else session_id).sorted()
+    if rms_window is None and snap.missing_emg_rms:
+        rms_window = EMG_RMS_WINDOW_MS
+    if rms_window:
+        snap = snap.with_emg_rms(rms_window, EMG_ALPHA)
+    if lowpass:
+        try:
+            snap = snap.with_lowpass(lowpass, LOWPASS_ORDER)
+        except ValueError as e:
+            return jsonify(ok=False, msg=str(e)), 400
+    if tail is not None:
+        t_from = max(snap.duration_s - tail, 0.0)
+    lo, hi = snap.time_range(t_from, t_to)
+    arrays = snap.chart_arrays(max_points=max(points, 0) or None, t_from=t_from, t_to=t_to)
+    n = len(arrays["t_ms"])
+    body = pack_float32(arrays, columns)
+
+    if request.args.get("format", "bin") == "b64":
+        return jsonify(ok=True, columns=columns, length=n, samples=hi - lo,
+                       dtype="float32le", data=base64.b64encode(body).decode("ascii"))
+    return Response(body, mimetype="application/octet-stream", headers={
+        "X-Series-Columns": ",".join(columns),
+        "X-Series-Length": str(n),
+        "X-Series-Samples": str(hi - lo),
+        "Cache-Control": "no-store",
+    })
 
 @app.post("/session/reset_max")
 @login_required
 def session_reset_max():
-    reset_max_angles()
-    socketio.emit("imu_data", {
+    sess = current_session()
+    sess.reset_max()
+    SOCKETS.emit("imu_data", {
         "t": time.time() * 1000,
         "maxHip": 0.0, "maxKnee": 0.0, "maxAnkle": 0.0
-    })
+    }, to=sess.room)
     return jsonify(ok=True)
 
 @app.post("/session/mock")
 @login_required
 def session_mock():
+    sess = current_session()
     for i in range(80):
-        append_samples([{
+        append_samples(sess, [{
             "t_ms": time.time() * 1000,
             "hip": 10 + i * 0.2,
             "knee": 20 + i * 0.15,
@@ -605,74 +606,43 @@ def session_mock():
 @login_required
 def session_export_csv():
     patient_code = request.args.get("patient_code", "").strip()
+    use_gzip = request.args.get("gzip", "0") in ("1", "true", "yes")
 
-    with DATA_LOCK:
-        rows = list(LAST_SESSION) if LAST_SESSION else list(data_buffer)
-
-    sio = io.StringIO()
-    w = csv.writer(sio)
-    # ✅ header đúng
-    w.writerow(["t_ms", "hip", "knee", "ankle"])
-
-    for r in rows:
-        w.writerow([
-            int(r.get("t_ms", 0)),
-            f'{float(r.get("hip", 0)):.4f}',
-            f'{float(r.get("knee", 0)):.4f}',
-            f'{float(r.get("ankle", 0)):.4f}',
-            #"" if r.get("emg") is None else f'{float(r.get("emg", 0)):.5f}',
-            #"" if r.get("emg_rms") is None else f'{float(r.get("emg_rms", 0)):.5f}',
-            #"" if r.get("emg_env") is None else f'{float(r.get("emg_env", 0)):.5f}',
-            #"" if r.get("emg_id") is None else str(r.get("emg_id")),
-        ])
-
-    csv_text = sio.getvalue()
-    data = io.BytesIO(csv_text.encode("utf-8-sig"))
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    snap = current_session().snapshot()
 
-    safe_code = "".join(ch for ch in patient_code if ch.isalnum() or ch in ("-", "_"))
-    filename = f"{safe_code}_{ts}_{len(rows)}rows.csv" if safe_code else f"imu_{ts}_{len(rows)}rows.csv"
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
 
-    # lưu ra disk
-    try:
-        disk_path = os.path.join(EXPORT_DIR, filename)
-        with open(disk_path, "w", encoding="utf-8-sig", newline="") as f:
-            f.write(csv_text)
-    except Exception as e:
-        print("[WARN] cannot save CSV to disk:", e)
-
-    data.seek(0)
-    return send_file(
-        data,
-        mimetype="text/csv",
-        as_attachment=True,
-        download_name=filename,
-        max_age=0,
+    code = safe_code(patient_code)
+    filename = f"{code}_{ts}_{len(snap)}rows.csv" if code else f"imu_{ts}_{len(snap)}rows.csv"
+
+    # stream từng khối CSV (tuỳ chọn gzip), đồng thời lưu ra disk
+    chunks = iter_csv(snap)
+    mimetype = "text/csv"
+    if use_gzip:
+        chunks = iter_gzip(chunks)
+        filename += ".gz"
+        mimetype = "application/gzip"
+    chunks = iter_tee(chunks, os.path.join(EXPORT_DIR, filename))
+
+    return Response(
+        chunks,
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": content_disposition(filename),
+            "Cache-Control": "no-cache",
+        },
     )
 
-# ========= Patients API (giữ như bạn đang dùng) =========
-def load_patients_rows():
-    _ensure_patients_file()
-    with open(PATIENTS_FILE, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    if not isinstance(data, dict):
-        data = {}
-    rows = []
-    for code, rec in data.items():
-        rows.append({
-            "code": code,
-            "full_name": rec.get("name", ""),
-            "dob": rec.get("DateOfBirth", ""),
-            "national_id": rec.get("ID", ""),
-            "sex": rec.get("Gender", ""),
-        })
-    rows = sorted(rows, key=lambda r: (r["full_name"] or "").lower())
-    return rows, data
-
+# ========= Patients API (SQLite, xem database.py) =========
 @app.get("/api/patients")
 @login_required
 def api_patients_all():
-    rows, raw = load_patients_rows()
+    # Không có limit -> trả đủ danh sách như cũ: modal chọn bệnh nhân và trang quản lý
+    # lọc phía client trên toàn bộ rows và tra DATA.raw[code]; trang mặc định sẽ cắt cụt chúng.
+    q = request.args.get("q", "").strip()
+    limit = request.args.get("limit", type=int)
+    offset = request.args.get("offset", 0, type=int)
+    rows, raw = database.load_patients_rows(q, limit, offset)
     return jsonify(rows=rows, raw=raw)
 
 @app.post("/api/patients")
@@ -684,7 +654,6 @@ def api_patients_save():
     if not full_name:
         return jsonify(ok=False, msg="Thiếu họ tên"), 400
 
-    _, raw = load_patients_rows()
     if not code:
         code = gen_patient_code(full_name)
 
@@ -694,18 +663,15 @@ def api_patients_save():
     elif sex.lower().startswith("f"):
         sex = "FeMale"
 
-    raw[code] = {
+    database.upsert_patient(code, {
         "DateOfBirth": data.get("dob") or "",
-        "Exercise": raw.get(code, {}).get("Exercise", {}),
         "Gender": sex,
         "Height": data.get("height") or "",
         "ID": data.get("national_id") or "",
         "PatientCode": code,
         "Weight": data.get("weight") or "",
         "name": full_name
-    }
-    with open(PATIENTS_FILE, "w", encoding="utf-8") as f:
-        json.dump(raw, f, ensure_ascii=False, indent=2)
+    })
 
     return jsonify(ok=True, patient_code=code)
 
@@ -736,19 +702,17 @@ def save_vas():
         "vas": vas,
         "ts": time.time(),
     }
-    with VAS_LOCK:
-        VAS_STORE.append(rec)
+    VAS.add(rec)
 
     print("== VAS saved ==", rec)
     return jsonify(ok=True)
 
 # ========= Records =========
-load_records_from_file()
+RECORDS = database.RecordJournal(RECORD_JOURNAL, legacy_path=RECORD_FILE)
 
 @app.post("/api/save_record")
 @login_required
 def api_save_record():
-    global RECORD_STORE
     data = request.get_json(force=True) or {}
 
     patient_code    = (data.get("patient_code") or "").strip()
@@ -756,20 +720,7 @@ def api_save_record():
     patient_info    = data.get("patient_info") or {}
     exercise_scores = data.get("exercise_scores") or {}
 
-    vas_summary = {}
-    with VAS_LOCK:
-        for row in VAS_STORE:
-            pc_row = (row.get("patient_code") or "").strip()
-            ex     = (row.get("exercise_name") or "").strip()
-            ph     = (row.get("phase") or "").strip()
-            val    = row.get("vas")
-
-            if patient_code and pc_row and pc_row != patient_code:
-                continue
-            if not ex or ph not in ("before", "after"):
-                continue
-            vas_summary.setdefault(ex, {"before": None, "after": None})
-            vas_summary[ex][ph] = val
+    vas_summary = VAS.summary(patient_code)
 
     now = datetime.now(VN_TZ)
     record = {
@@ -782,22 +733,71 @@ def api_save_record():
         "vas_summary": vas_summary,
     }
 
-    with RECORD_LOCK:
-        RECORD_STORE.append(record)
-        save_records_to_file()
-
+    record = RECORDS.add(record)
     return jsonify(ok=True, msg="saved", record=record)
 
+@app.post("/api/delete_record")
+@login_required
+def api_delete_record():
+    data = request.get_json(force=True) or {}
+    if not RECORDS.delete((data.get("id") or "").strip()):
+        return jsonify(ok=False, msg="Không tìm thấy bản ghi"), 404
+    return jsonify(ok=True)
+
+def _record_filters():
+    """Đọc filter + cursor cho /records và /api/records từ query string."""
+    args = request.args
+    filters = {
+        "patient_code": args.get("patient_code", "").strip(),
+        "exercise": args.get("exercise", "").strip(),
+        "date_from": args.get("date_from", "").strip(),
+        "date_to": args.get("date_to", "").strip(),
+    }
+
+    def day_ts(s, days=0):
+        try:
+            d = datetime.strptime(s, "%Y-%m-%d").replace(tzinfo=VN_TZ)
+        except ValueError:
+            return None
+        return (d + timedelta(days=days)).timestamp()
+
+    page_args = {
+        "cursor": args.get("cursor", "").strip() or None,
+        "limit": max(1, min(args.get("limit", 50, type=int) or 50, 500)),
+        "patient_code": filters["patient_code"] or None,
+        "exercise": filters["exercise"] or None,
+        "ts_from": day_ts(filters["date_from"]),
+        "ts_to": day_ts(filters["date_to"], days=1),  # date_to tính cả ngày đó
+    }
+    return filters, page_args
+
+@app.get("/api/records")
+@login_required
+def api_records():
+    _, page_args = _record_filters()
+    try:
+        rows, next_cursor = RECORDS.page(**page_args)
+    except ValueError:
+        return jsonify(ok=False, msg="cursor không hợp lệ"), 400
+    return jsonify(ok=True, records=rows, next_cursor=next_cursor)
+
 @app.route("/records")
 @login_required
 def records():
-    with RECORD_LOCK:
-        rows = list(RECORD_STORE)
-    rows.sort(key=lambda r: r.get("created_at_ts", 0), reverse=True)
-    for r in rows:
-        if "vas_summary" not in r or r["vas_summary"] is None:
-            r["vas_summary"] = {}
-    return render_template_string(RECORD_HTML, username=current_user.id, records=rows)
+    filters, page_args = _record_filters()
+    try:
+        rows, next_cursor = RECORDS.page(**page_args)
+    except ValueError:
+        rows, next_cursor = RECORDS.page(**{**page_args, "cursor": None})
+    return render_template(
+        "records.html",
+        username=current_user.id,
+        records=rows,
+        filters=filters,
+        next_cursor=next_cursor,
+        is_first_page=not page_args["cursor"],
+        limit=request.args.get("limit", type=int),  # giữ limit khác mặc định qua các trang
+    )
 
 
 # ========= Charts =========
@@ -811,8 +811,6 @@ def _exercise_region_from_name(name: str):
 @app.route("/charts")
 @login_required
 def charts():
-    global LAST_SESSION
-
     patient_code  = request.args.get("patient_code", "").strip()
     exercise_name = request.args.get("exercise", "").strip()
 
@@ -821,49 +819,13 @@ def charts():
     region = _exercise_region_from_name(exercise_name)
 
     if region is not None:
-        with VAS_LOCK:
-            for rec in reversed(VAS_STORE):
-                if rec.get("exercise_region") != region:
-                    continue
-                if patient_code and rec.get("patient_code") != patient_code:
-                    continue
-                ph = rec.get("phase")
-                if ph == "before" and vas_before is None:
-                    vas_before = rec.get("vas")
-                elif ph == "after" and vas_after is None:
-                    vas_after = rec.get("vas")
-                if vas_before is not None and vas_after is not None:
-                    break
-
-    if not LAST_SESSION:
-        return render_template_string(
-            CHARTS_HTML,
-            username=current_user.id,
-            t_ms=[], hip=[], knee=[], ankle=[],
-            emg=[], emg_rms=[], emg_env=[],
-            patient_code=patient_code,
-            exercise_name=exercise_name,
-            vas_before=vas_before, vas_after=vas_after,
-        )
+        vas_before, vas_after = VAS.latest_for_region(region, patient_code)
 
-    rows = list(LAST_SESSION)
-    rows.sort(key=lambda x: x["t_ms"])
-    raw_t = [r["t_ms"] for r in rows]
-    t0 = raw_t[0] if raw_t else 0
-    t_ms = [round((t - t0) / 1000.0, 3) for t in raw_t]
-
-    hipArr    = [r.get("hip", 0.0) for r in rows]
-    kneeArr   = [r.get("knee", 0.0) for r in rows]
-    ankleArr  = [r.get("ankle", 0.0) for r in rows]
-    emgArr    = [r.get("emg", 0.0) or 0.0 for r in rows]
-    emgRmsArr = [r.get("emg_rms", 0.0) or 0.0 for r in rows]
-    emgEnvArr = [r.get("emg_env", 0.0) or 0.0 for r in rows]
-
-    return render_template_string(
-        CHARTS_HTML,
+    return render_template(
+        "charts.html",
         username=current_user.id,
-        t_ms=t_ms, hip=hipArr, knee=kneeArr, ankle=ankleArr,
-        emg=emgArr, emg_rms=emgRmsArr, emg_env=emgEnvArr,
+        **series_page_args(request.args.get("session", "").strip(),
+                           lowpass=request.args.get("lowpass") or None),
         patient_code=patient_code,
         exercise_name=exercise_name,
         vas_before=vas_before, vas_after=vas_after,
@@ -1630,9 +1592,31 @@ body.sb-collapsed .sidebar *{
           Các bản ghi được lưu khi nhấn nút <strong>"Lưu kết quả"</strong> trên trang đo.
         </div>
 
+        <form class="row g-2 mt-2" method="get" action="/records">
+          <div class="col-md-3">
+            <input name="patient_code" class="form-control form-control-sm"
+                   placeholder="Mã bệnh nhân" value="{{ filters.patient_code }}">
+          </div>
+          <div class="col-md-3">
+            <input name="exercise" class="form-control form-control-sm"
+                   placeholder="Bài tập (vd. knee flexion)" value="{{ filters.exercise }}">
+          </div>
+          <div class="col-md-2">
+            <input name="date_from" type="date" class="form-control form-control-sm" value="{{ filters.date_from }}">
+          </div>
+          <div class="col-md-2">
+            <input name="date_to" type="date" class="form-control form-control-sm" value="{{ filters.date_to }}">
+          </div>
+          <div class="col-md-2 d-flex gap-1">
+            {% if limit %}<input type="hidden" name="limit" value="{{ limit }}">{% endif %}
+            <button class="btn btn-sm btn-primary flex-fill">Lọc</button>
+            <a class="btn btn-sm btn-outline-secondary" href="/records">×</a>
+          </div>
+        </form>
+
         <div class="mt-2">
           <input id="recordSearch" class="form-control form-control-sm"
-                 placeholder="Tìm theo tên, mã bệnh nhân, ngày đo...">
+                 placeholder="Tìm trong trang này theo tên, mã bệnh nhân, ngày đo...">
         </div>
       </div>
 
@@ -1705,7 +1689,7 @@ body.sb-collapsed .sidebar *{
                 <td>
                   <button type="button"
                           class="btn btn-sm btn-outline-danger"
-                          onclick="deleteRecord({{ loop.index0 }})">
+                          onclick="deleteRecord('{{ r.id }}')">
                     Xóa
                   </button>
                 </td>
@@ -1714,6 +1698,16 @@ body.sb-collapsed .sidebar *{
             </tbody>
           </table>
         </div>
+        <div class="d-flex justify-content-between mt-2">
+          {% if not is_first_page %}
+            <a class="btn btn-sm btn-outline-secondary"
+               href="{{ url_for('records', limit=limit, **filters) }}">« Mới nhất</a>
+          {% else %}<span></span>{% endif %}
+          {% if next_cursor %}
+            <a class="btn btn-sm btn-outline-primary"
+               href="{{ url_for('records', cursor=next_cursor, limit=limit, **filters) }}">Cũ hơn »</a>
+          {% endif %}
+        </div>
         {% else %}
           <div class="text-muted small">Chưa có bệnh án nào được lưu.</div>
         {% endif %}
@@ -1739,13 +1733,13 @@ if (inp){
 }
 
 // hàm xóa bản ghi
-function deleteRecord(index) {
+function deleteRecord(id) {
   if (!confirm("Bạn có chắc muốn xóa bản ghi này?")) return;
 
   fetch("/api/delete_record", {
     method: "POST",
     headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({ index })
+    body: JSON.stringify({ id })
   })
   .then(r => r.json())
   .then(res => {
@@ -3476,12 +3470,16 @@ socket.on("imu_data", (msg) => {
   if (msg.knee  != null) document.getElementById('liveKnee').textContent  = Number(msg.knee).toFixed(1);
   if (msg.ankle != null) document.getElementById('liveAnkle').textContent = Number(msg.ankle).toFixed(1);
 
-  // Thu mẫu ROM
+  // Thu mẫu ROM (msg.samples = [[t,hip,knee,ankle], ...] gom từ frame trước, IMU_EMIT_MODE=packed)
   if (isMeasuring){
-    const hip = Number(msg.hip ?? 0);
-    const knee = Number(msg.knee ?? 0);
-    const ankle = Number(msg.ankle ?? 0);
-    currentSamples.push({hip,knee,ankle});
+    if (Array.isArray(msg.samples)) {
+      for (const [, hip, knee, ankle] of msg.samples) currentSamples.push({hip, knee, ankle});
+    } else {
+      const hip = Number(msg.hip ?? 0);
+      const knee = Number(msg.knee ?? 0);
+      const ankle = Number(msg.ankle ?? 0);
+      currentSamples.push({hip,knee,ankle});
+    }
   }
 
   // 3D
@@ -3535,8 +3533,16 @@ async function reallyStartMeasurement(){
 async function reallyStopMeasurement(){
   if (!isMeasuring) return null;
 
-  const r = await fetch("/session/stop", { method: "POST" });
-  try { await r.json(); } catch(e){}
+  const r = await fetch("/session/stop", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({
+      patient_code: (document.getElementById("pat_code")?.value || "").trim(),
+      exercise_name: getCurrentExerciseName(),
+    })
+  });
+  let stopInfo = {};
+  try { stopInfo = await r.json(); } catch(e){}
 
   isMeasuring = false;
   stopHeartSim();
@@ -3580,6 +3586,7 @@ async function reallyStopMeasurement(){
   const pat = (document.getElementById("pat_code")?.value || "").trim();
   let url = "/charts?exercise=" + encodeURIComponent(exName);
   if (pat) url += "&patient_code=" + encodeURIComponent(pat);
+  if (stopInfo.session_id) url += "&session=" + encodeURIComponent(stopInfo.session_id);
   return url;
 }
 
@@ -4162,16 +4169,11 @@ document.addEventListener("DOMContentLoaded", ()=>{
 });
 </script>
 
+<script src="{{ url_for('static', filename='session_series.js') }}"></script>
 <script>
-// ===== DATA FROM SERVER (Jinja) =====
-const t_ms_raw    = {{ (t_ms    or []) | tojson }};
-const hip_raw     = {{ (hip     or []) | tojson }};
-const knee_raw    = {{ (knee    or []) | tojson }};
-const ankle_raw   = {{ (ankle   or []) | tojson }};
-
-const emg_raw     = {{ (emg     or []) | tojson }};
-const emg_rms_raw = {{ (emg_rms or []) | tojson }};
-const emg_env_raw = {{ (emg_env or []) | tojson }};
+// ===== DATA: series tải bất đồng bộ (float32) sau khi trang đã hiện =====
+const SERIES_URL   = {{ series_url | tojson }};
+const SERIES_STEPS = {{ series_steps | tojson }};
 
 const currentExerciseName = {{ (exercise_name or '') | tojson }};
 const patientCode         = {{ (patient_code  or '') | tojson }};
@@ -4201,19 +4203,28 @@ const STRENGTH_TEXT = {
        weak_label:"Weak", weak_desc:"Limited range of motion, needs more training and follow-up." }
 };
 
-// ====== COPY RA BIẾN CHẠY (không dùng trực tiếp raw) ======
-let t_ms     = (t_ms_raw    || []).slice();
-let hipArr   = (hip_raw     || []).slice();
-let kneeArr  = (knee_raw    || []).slice();
-let ankleArr = (ankle_raw   || []).slice();
+// ====== BIẾN CHẠY (điền khi tải xong series) ======
+let t_ms     = [];
+let hipArr   = [];
+let kneeArr  = [];
+let ankleArr = [];
 
-let emgArr    = (emg_raw     || []).slice();
-let emgRmsArr = (emg_rms_raw || []).slice();
-let emgEnvArr = (emg_env_raw || []).slice();
+let emgArr    = [];
+let emgRmsArr = [];
+let emgEnvArr = [];
 
 // ===== CLIP 6 GIÂY CUỐI (đồng bộ theo t_ms) =====
 const WINDOW_MS = 6000;
-(function clipLastWindow(){
+function applySeries(s){
+  t_ms      = s.t_ms    || [];
+  hipArr    = s.hip     || [];
+  kneeArr   = s.knee    || [];
+  ankleArr  = s.ankle   || [];
+  emgArr    = s.emg     || [];
+  emgRmsArr = s.emg_rms || [];
+  emgEnvArr = s.emg_env || [];
+
+  const nRaw = t_ms.length;
   if (!t_ms.length) return;
 
   const lastT = t_ms[t_ms.length - 1];
@@ -4229,11 +4240,11 @@ const WINDOW_MS = 6000;
     ankleArr = ankleArr.slice(startIdx);
 
     // emg arrays: nếu length khác t_ms, vẫn slice an toàn theo min length
-    if (emgArr.length === t_ms_raw.length)    emgArr    = emgArr.slice(startIdx);
-    if (emgRmsArr.length === t_ms_raw.length) emgRmsArr = emgRmsArr.slice(startIdx);
-    if (emgEnvArr.length === t_ms_raw.length) emgEnvArr = emgEnvArr.slice(startIdx);
+    if (emgArr.length === nRaw)    emgArr    = emgArr.slice(startIdx);
+    if (emgRmsArr.length === nRaw) emgRmsArr = emgRmsArr.slice(startIdx);
+    if (emgEnvArr.length === nRaw) emgEnvArr = emgEnvArr.slice(startIdx);
   }
-})();
+}
 
 // ====== EXPORT DEBUG (gõ _dbg() trong console) ======
 window._dbg = () => ({
@@ -4257,11 +4268,21 @@ const commonOptions = {
   }
 };
 
+const CHARTS = {};
+
 function makeChart(canvasId, labels, yArr){
   const el = document.getElementById(canvasId);
   if (!el) return;
 
-  new Chart(el, {
+  const old = CHARTS[canvasId];
+  if (old){
+    old.data.labels = labels;
+    old.data.datasets[0].data = yArr;
+    old.update("none");
+    return;
+  }
+
+  CHARTS[canvasId] = new Chart(el, {
     type: "line",
     data: {
       labels,
@@ -4279,14 +4300,17 @@ function makeChart(canvasId, labels, yArr){
 }
 
 
-makeChart("hipChart",   t_ms, hipArr);
-makeChart("kneeChart",  t_ms, kneeArr);
-makeChart("ankleChart", t_ms, ankleArr);
+function renderAngleCharts(){
+  makeChart("hipChart",   t_ms, hipArr);
+  makeChart("kneeChart",  t_ms, kneeArr);
+  makeChart("ankleChart", t_ms, ankleArr);
+}
 
 // ====== EMG CHART (3 đường) ======
-(function makeEmgChart(){
+function makeEmgChart(){
   const el = document.getElementById("emgChart");
   if (!el) return;
+  if (CHARTS.emgChart) CHARTS.emgChart.destroy();
 
   // Nếu không có EMG thì hiện chart rỗng (không crash)
   const hasAny = (emgArr && emgArr.length) || (emgRmsArr && emgRmsArr.length) || (emgEnvArr && emgEnvArr.length);
@@ -4304,7 +4328,7 @@ if (emgEnvArr && emgEnvArr.length) {
 }
 
 
-  new Chart(el, {
+  CHARTS.emgChart = new Chart(el, {
     type: "line",
     data: { labels, datasets: ds },
     options: {
@@ -4322,7 +4346,7 @@ if (emgEnvArr && emgEnvArr.length) {
   if (!hasAny) {
     console.warn("EMG is empty. Check route /charts to pass emg/emg_rms/emg_env.");
   }
-})();
+}
 
 // ====== FMA (demo) ======
 const evalBox = document.getElementById("evalContent");
@@ -4452,6 +4476,14 @@ function renderAllExercisesSummary(){
 showCurrentExerciseScore();
 renderAllExercisesSummary();
 
+// ====== TẢI SERIES: bản thô trước, bản chi tiết sau ======
+SessionSeries.progressive(SERIES_URL, SERIES_STEPS, s => {
+  applySeries(s);
+  renderAngleCharts();
+  makeEmgChart();
+  showCurrentExerciseScore();
+});
+
 // ===== Next exercise =====
 document.getElementById("btnNextEx").onclick = () => {
   const T = TEXT[CURRENT_LANG] || TEXT.vi;
@@ -4608,42 +4640,19 @@ document.getElementById("btnToggleSB").onclick = () =>
   document.body.classList.toggle("sb-collapsed");
 </script>
 
+<script src="{{ url_for('static', filename='session_series.js') }}"></script>
 <script>
-/* ===== DATA FROM SERVER (Jinja) ===== */
-const t_ms_raw    = {{ (t_ms    or []) | tojson }};
-const hip_raw     = {{ (hip     or []) | tojson }};
-const knee_raw    = {{ (knee    or []) | tojson }};
-const ankle_raw   = {{ (ankle   or []) | tojson }};
-
-const emg_raw     = {{ (emg     or []) | tojson }};
-const emg_rms_raw = {{ (emg_rms or []) | tojson }};
-const emg_env_raw = {{ (emg_env or []) | tojson }};
-
-/* ✅ EXPOSE TO WINDOW (để Console thấy) */
-window.t_ms_raw = t_ms_raw;
-window.hip_raw = hip_raw;
-window.knee_raw = knee_raw;
-window.ankle_raw = ankle_raw;
-
-window.emg_raw = emg_raw;
-window.emg_rms_raw = emg_rms_raw;
-window.emg_env_raw = emg_env_raw;
-
-/* ✅ DEBUG HELPER */
-window._dbg = function(){
-  return {
-    t_len: (window.t_ms_raw||[]).length,
-    hip_len: (window.hip_raw||[]).length,
-    emg_len: (window.emg_raw||[]).length,
-    rms_len: (window.emg_rms_raw||[]).length,
-    env_len: (window.emg_env_raw||[]).length,
-    t_first: (window.t_ms_raw||[])[0],
-    t_last:  (window.t_ms_raw||[]).at ? (window.t_ms_raw||[]).at(-1) : (window.t_ms_raw||[])[(window.t_ms_raw||[]).length-1],
-  };
-};
-
-/* ✅ LOG NGAY KHI LOAD (để khỏi phải gõ) */
-console.log("[DBG] injected:", window._dbg());
+/* ===== DATA: series tải bất đồng bộ (float32) sau khi trang đã hiện ===== */
+const SERIES_URL   = {{ series_url | tojson }};
+const SERIES_STEPS = {{ series_steps | tojson }};
+
+let t_ms     = [];
+let hipArr   = [];
+let kneeArr  = [];
+let ankleArr = [];
+let emgArr    = [];
+let emgRmsArr = [];
+let emgEnvArr = [];
 </script>
 
 
@@ -4652,7 +4661,16 @@ console.log("[DBG] injected:", window._dbg());
 // ===== CLIP 12–15 GIÂY CUỐI (t_ms của bạn đang là GIÂY) =====
 const WINDOW_SEC = 5; // đổi 12 hoặc 15 tùy bạn
 
-(function clipLastWindow(){
+function applySeries(s){
+  t_ms      = s.t_ms    || [];
+  hipArr    = s.hip     || [];
+  kneeArr   = s.knee    || [];
+  ankleArr  = s.ankle   || [];
+  emgArr    = s.emg     || [];
+  emgRmsArr = s.emg_rms || [];
+  emgEnvArr = s.emg_env || [];
+
+  const nRaw = t_ms.length;
   if (!t_ms.length) return;
 
   const lastT = t_ms[t_ms.length - 1];  // đơn vị: giây
@@ -4667,12 +4685,12 @@ const WINDOW_SEC = 5; // đổi 12 hoặc 15 tùy bạn
     kneeArr  = kneeArr.slice(startIdx);
     ankleArr = ankleArr.slice(startIdx);
 
-    // EMG: nếu cùng chiều với t_ms_raw thì slice theo index
-    if (emgArr.length === t_ms_raw.length)    emgArr    = emgArr.slice(startIdx);
-    if (emgRmsArr.length === t_ms_raw.length) emgRmsArr = emgRmsArr.slice(startIdx);
-    if (emgEnvArr.length === t_ms_raw.length) emgEnvArr = emgEnvArr.slice(startIdx);
+    // EMG: nếu cùng chiều với t_ms thì slice theo index
+    if (emgArr.length === nRaw)    emgArr    = emgArr.slice(startIdx);
+    if (emgRmsArr.length === nRaw) emgRmsArr = emgRmsArr.slice(startIdx);
+    if (emgEnvArr.length === nRaw) emgEnvArr = emgEnvArr.slice(startIdx);
   }
-})();
+}
 
 
 // ===== DEBUG HELPER (gõ _dbg() trong console) =====
@@ -4680,8 +4698,8 @@ window._dbg = () => ({
   url: location.pathname,
   t_len: t_ms.length,
   emg_len: emgArr.length,
-  rms_len: emgRms.length,
-  env_len: emgEnv.length,
+  rms_len: emgRmsArr.length,
+  env_len: emgEnvArr.length,
   last_t: t_ms.length ? t_ms[t_ms.length-1] : null
 });
 
@@ -4693,29 +4711,42 @@ const AXIS = {
 }[lang] || { x:"t (ms)", y:"EMG (a.u.)", empty:"No EMG data." };
 
 const hintBox = document.getElementById("hintBox");
+let emgChart = null;
 
-const datasets = [];
-if (emgArr && emgArr.length) datasets.push({ label:"raw", data: emgArr, borderWidth:1.5, tension:0.15 });
-if (emgRms && emgRms.length) datasets.push({ label:"rms", data: emgRms, borderWidth:2, tension:0.15 });
-if (emgEnv && emgEnv.length) datasets.push({ label:"env", data: emgEnv, borderWidth:2, tension:0.15 });
-
-if (!t_ms.length || !datasets.length) {
-  hintBox.textContent = AXIS.empty;
-  console.warn(AXIS.empty, window._dbg());
-}
-
-new Chart(document.getElementById("emgChart"), {
-  type:"line",
-  data:{ labels: t_ms, datasets },
-  options:{
-    responsive:true, maintainAspectRatio:false,
-    interaction:{ mode:"index", intersect:false },
-    plugins:{ legend:{ display:true } },
-    scales:{
-      x:{ title:{ display:true, text: AXIS.x } },
-      y:{ title:{ display:true, text: AXIS.y } }
-    }
+function drawEmg(){
+  const datasets = [];
+  if (emgArr && emgArr.length) datasets.push({ label:"raw", data: emgArr, borderWidth:1.5, tension:0.15 });
+  if (emgRmsArr && emgRmsArr.length) datasets.push({ label:"rms", data: emgRmsArr, borderWidth:2, tension:0.15 });
+  if (emgEnvArr && emgEnvArr.length) datasets.push({ label:"env", data: emgEnvArr, borderWidth:2, tension:0.15 });
+
+  if (!t_ms.length || !datasets.length) {
+    hintBox.textContent = AXIS.empty;
+    console.warn(AXIS.empty, window._dbg());
+  } else {
+    hintBox.textContent = "";
   }
+
+  if (emgChart) emgChart.destroy();
+  emgChart = new Chart(document.getElementById("emgChart"), {
+    type:"line",
+    data:{ labels: t_ms, datasets },
+    options:{
+      responsive:true, maintainAspectRatio:false,
+      interaction:{ mode:"index", intersect:false },
+      plugins:{ legend:{ display:true } },
+      scales:{
+        x:{ title:{ display:true, text: AXIS.x } },
+        y:{ title:{ display:true, text: AXIS.y } }
+      }
+    }
+  });
+}
+
+// ===== TẢI SERIES: bản thô trước, bản chi tiết sau =====
+SessionSeries.progressive(SERIES_URL, SERIES_STEPS, s => {
+  applySeries(s);
+  console.log("[DBG] loaded:", window._dbg());
+  drawEmg();
 });
 </script>
 
@@ -5052,6 +5083,23 @@ document.addEventListener("DOMContentLoaded", ()=>{
 </body></html>
 """
 
+# ===================== TEMPLATES =====================
+# Đăng ký 1 lần: Jinja compile + cache theo tên; CSS/JS tĩnh phục vụ qua /assets (ETag)
+PAGES = PageAssets()
+for _name, _html in (
+    ("login.html", LOGIN_HTML),
+    ("dashboard.html", DASH_HTML),
+    ("charts.html", CHARTS_HTML),
+    ("charts_emg.html", EMG_CHART_HTML),
+    ("calibration.html", CALIBRATION_HTML),
+    ("records.html", RECORD_HTML),
+    ("settings.html", SETTINGS_HTML),
+    ("patient_new.html", PATIENT_NEW_HTML),
+    ("patients_manage.html", PATIENTS_MANAGE_HTML),
+):
+    PAGES.register(_name, _html)
+PAGES.install(app)
+
 
 
 @app.route("/save_patient", methods=["POST"])
@@ -5068,37 +5116,6 @@ def save_patient():
         return {"ok": False, "error": str(e)}, 500
 
 
-def stop_serial_reader():
-    global stop_serial_thread, ser, serial_thread
-    stop_serial_thread = True
-    try:
-        if ser and ser.is_open:
-            ser.close()
-    except:
-        pass
-    ser = None
-    # chờ thread dừng (nhanh)
-    if serial_thread and serial_thread.is_alive():
-        try:
-            serial_thread.join(timeout=1.0)
-        except:
-            pass
-    serial_thread = None
-
-
-_last = {"hip": None, "knee": None, "ankle": None}
-ALPHA = 0.3
-
-
-def _smooth(key, val):
-    global _last
-    if _last[key] is None:
-        _last[key] = val
-    else:
-        _last[key] = _last[key] * (1 - ALPHA) + val * ALPHA
-    return _last[key]
-
-
 @app.post("/api/imu")  # <— ĐẶT NGAY TRƯỚC HÀM
 def api_receive_imu():
     data = request.get_json(force=True) or {}
@@ -5107,22 +5124,22 @@ def api_receive_imu():
         return {"ok": False, "msg": "Thiếu dữ liệu"}, 400
 
     # --- Giới hạn góc hợp lý theo sinh học ---
-    def clamp_local(val, lo, hi):
-        return max(lo, min(hi, val))
-
     raw_hip = norm_deg(p2 - p1)
     raw_knee = norm_deg(p3 - p2)
     raw_ankle = norm_deg(p4 - p3)
-    hip = clamp_local(raw_hip, -40, 140)
-    knee = clamp_local(raw_knee, -10, 160)
-    ankle = clamp_local(raw_ankle, 0, 100)
-
-    # --- Làm mượt ---
-    hip = _smooth("hip", hip)
-    knee = _smooth("knee", knee)
-    ankle = _smooth("ankle", ankle)
+    hip = clamp(raw_hip, -40, 140)
+    knee = clamp(raw_knee, -10, 160)
+    ankle = clamp(raw_ankle, 0, 100)
+
+    # --- Rig: "rig" trong payload, không có thì phiên đang chạy gần nhất ---
+    rig = safe_code(data.get("rig"))
+    if rig:
+        sess = SESSIONS.get_or_create(rig)
+    else:
+        sess = SESSIONS.active() or SESSIONS.get_or_create(DEFAULT_RIG)
 
-    append_samples([{
+    # --- Làm mượt: trong append_block, state bộ lọc riêng cho nguồn "http" ---
+    append_samples(sess, [{
         "t_ms": data.get("t_ms", time.time() * 1000),
         "hip": hip, "knee": knee, "ankle": ankle
     }])
@@ -5131,13 +5148,7 @@ def api_receive_imu():
 
 # ===================== Run =====================
 if __name__ == "__main__":
-    socketio.run(
-        app,
-        host="127.0.0.1",
-        port=int(os.environ.get("PORT", 8080)),
-        debug=True,
-        allow_unsafe_werkzeug=True
-    )
+    serve(asgi_app, RUNTIME, host="127.0.0.1", port=int(os.environ.get("PORT", 8080)))
 
 
 